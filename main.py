@@ -9,13 +9,24 @@ import sqlite3
 import pandas as pd
 import subprocess
 import os
-from typing import Optional, Dict, Any
+import sys
+import queue
+import logging
+import logging.handlers
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Optional, Dict, Any, List
 
 
 class App(tk.Tk):
     """Main application class managing the multi-frame interface."""
     
-    def __init__(self):
+    def __init__(self, storage_mode: Optional[str] = None):
         super().__init__()
         
         # Window configuration
@@ -27,7 +38,11 @@ class App(tk.Tk):
         self.current_user: Optional[Dict[str, Any]] = None
         
         # Initialize database
-        setup_database()
+        setup_database(storage_mode or DEFAULT_STORAGE_MODE)
+        db_worker.attach(self)
+        transfer_worker.attach(self)
+        # Files orphaned by deleted materials or failed uploads, once nobody can be storing them
+        threading.Thread(target=sweep_blobs, args=(db, blob_store), name='blob-sweep', daemon=True).start()
         
         # Create container frame for all pages
         self.container = tk.Frame(self)
@@ -75,11 +90,751 @@ class App(tk.Tk):
         self.show_frame(LoginFrame)
 
 
-def setup_database():
-    """Initialize SQLite database with required tables."""
-    conn = sqlite3.connect('academic_system.db')
-    cursor = conn.cursor()
+DB_PATH = 'academic_system.db'
+# Uploaded course files, stored by content hash (see BlobStore)
+BLOB_DIR = 'blobs'
+
+# Journal settings per storage mode. WAL lets readers keep going while a writer
+# commits, but every client must run on the same host as the database file, so
+# it is opt-in: the default 'rollback' is the one that is safe when
+# academic_system.db lives on a network share used by several clients.
+STORAGE_MODES = {
+    'wal': {'journal_mode': 'WAL', 'synchronous': 'NORMAL'},
+    'rollback': {'journal_mode': 'DELETE', 'synchronous': 'FULL'},
+}
+DEFAULT_STORAGE_MODE = 'rollback'
+BUSY_TIMEOUT_MS = 5000
+WRITE_RETRIES = 5
+
+# Filesystem types (as in /proc/mounts) that is_network_path treats as remote
+NETWORK_FILESYSTEMS = {'nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', '9p', 'afs', 'ceph', 'glusterfs',
+                       'fuse.glusterfs', 'fuse.sshfs'}
+
+
+def is_network_path(path: str) -> bool:
+    """Best-effort check whether path is on a network share; False when it cannot tell."""
+    path = os.path.abspath(path)
+    if os.name == 'nt':
+        if path.startswith('\\\\'):
+            return True  # UNC path
+        import ctypes
+        drive = os.path.splitdrive(path)[0] + '\\'
+        return ctypes.windll.kernel32.GetDriveTypeW(drive) == 4  # DRIVE_REMOTE
+    try:
+        with open('/proc/mounts', encoding='utf-8') as mounts:
+            entries = [line.split()[1:3] for line in mounts]
+    except OSError:
+        return False
+    directory = os.path.dirname(os.path.realpath(path))
+    mount_point, fs_type = '', ''
+    for point, fs in entries:
+        point = point.replace('\\040', ' ')
+        inside = directory == point or directory.startswith(point.rstrip('/') + '/')
+        if inside and len(point) > len(mount_point):
+            mount_point, fs_type = point, fs
+    return fs_type in NETWORK_FILESYSTEMS
+
+
+def is_busy_error(error: Exception) -> bool:
+    """Return True if an SQLite error means another connection holds the lock."""
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and ('locked' in message or 'busy' in message)
+
+
+class QueryMonitor:
+    """Collects wall time and row counts for SQL statements and C module calls.
+    
+    Every cursor handed out by Database reports here, tagged with the frame
+    method that ran it (e.g. TeacherFrame.on_course_selected). Statements
+    slower than slow_ms go to a rotating log file, with their EXPLAIN QUERY
+    PLAN when explain is on. The DirectorFrame performance panel reads
+    summary() and slow_queries().
+    
+    start() runs before every statement, so it stays cheap: statements are
+    normalized once per distinct string, callers are found through a map of
+    the frames' code objects built on first use, and parameters are only
+    kept while explain is on.
+    """
+    
+    def __init__(self, slow_ms: float = 100.0, log_path: str = 'slow_queries.log',
+                 keep: int = 200):
+        self.slow_ms = slow_ms
+        self.explain = False
+        self.log_path = log_path
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._slow = deque(maxlen=keep)
+        self._logger = None
+        self._callers = None
+    
+    def start(self, kind: str, statement: str, params=()) -> Dict[str, Any]:
+        """Open a record for a statement that is about to run."""
+        return {
+            'kind': kind,
+            'caller': self._caller(),
+            'statement': normalize_sql(statement),
+            'params': params if self.explain else None,
+            'elapsed': 0.0,
+            'rows': 0,
+            'plan': None,
+        }
+    
+    def finish(self, record: Dict[str, Any], connection: Optional[sqlite3.Connection] = None):
+        """Fold a completed record into the stats; log it if it was slow."""
+        elapsed_ms = record['elapsed'] * 1000
+        key = (record['caller'], record['kind'], record['statement'])
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0}
+            stats['count'] += 1
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+            stats['rows'] += record['rows']
+        
+        if elapsed_ms < self.slow_ms:
+            return
+        if (self.explain and connection is not None
+                and record['statement'].upper().startswith(('SELECT', 'WITH'))):
+            try:
+                plan = connection.execute('EXPLAIN QUERY PLAN ' + record['statement'],
+                                          record['params']).fetchall()
+                record['plan'] = ' | '.join(row[3] for row in plan)
+            except sqlite3.Error:
+                pass
+        record['at'] = time.strftime('%Y-%m-%d %H:%M:%S')
+        self._slow.append(record)
+        self._log(record, elapsed_ms)
+    
+    @contextmanager
+    def track(self, kind: str, label: str):
+        """Time an arbitrary block, e.g. a subprocess call, as one record."""
+        record = self.start(kind, label)
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['elapsed'] = time.perf_counter() - started
+            self.finish(record)
+    
+    def summary(self) -> List[Dict[str, Any]]:
+        """Per caller and statement totals, most expensive first."""
+        with self._lock:
+            rows = [dict(stats, caller=caller, kind=kind, statement=statement)
+                    for (caller, kind, statement), stats in self._stats.items()]
+        return sorted(rows, key=lambda row: row['total_ms'], reverse=True)
+    
+    def slow_queries(self) -> List[Dict[str, Any]]:
+        """Most recent slow records, newest first."""
+        return list(reversed(self._slow))
+    
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._slow.clear()
+    
+    def _log(self, record: Dict[str, Any], elapsed_ms: float):
+        if self._logger is None:
+            logger = logging.getLogger('academic.slow_queries')
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            handler = logging.handlers.RotatingFileHandler(
+                self.log_path, maxBytes=1_000_000, backupCount=3, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+            logger.addHandler(handler)
+            self._logger = logger
+        message = (f"{elapsed_ms:.1f}ms rows={record['rows']} {record['kind']} "
+                   f"{record['caller']} {record['statement']}")
+        if record['plan']:
+            message += f" PLAN: {record['plan']}"
+        self._logger.info(message)
+    
+    def _caller(self) -> str:
+        """Name the innermost *Frame method on the stack, nested functions included."""
+        callers = self._callers
+        if callers is None:
+            callers = self._callers = self._code_names()
+        frame = sys._getframe(2)
+        fallback = None
+        while frame is not None:
+            code = frame.f_code
+            name = callers.get(code)
+            if name:
+                return name
+            if fallback is None and name is None and code.co_filename == __file__:
+                fallback = code.co_name
+            frame = frame.f_back
+        return fallback or '-'
+    
+    @staticmethod
+    def _code_names() -> Dict[Any, str]:
+        """Map the code of every Frame method, and of the functions nested in it, to its name.
+        
+        Names read "Class.method.nested"; the monitor's own plumbing maps to
+        '' so it is never reported as a caller.
+        """
+        import types
+        
+        names = {}
+        
+        def add(code, name):
+            names[code] = name
+            for const in code.co_consts:
+                if isinstance(const, types.CodeType):
+                    add(const, f"{name}.{const.co_name}" if name else '')
+        
+        for cls in list(globals().values()):
+            if not isinstance(cls, type):
+                continue
+            if issubclass(cls, tk.Frame) and cls.__module__ == __name__:
+                prefix = cls.__name__
+            elif cls in (Database, InstrumentedCursor, QueryMonitor):
+                prefix = None
+            else:
+                continue
+            for attribute, member in vars(cls).items():
+                function = getattr(member, '__func__', member)
+                code = getattr(function, '__code__', None)
+                if code is not None:
+                    add(code, f"{prefix}.{attribute}" if prefix else '')
+        return names
+
+
+@lru_cache(maxsize=4096)
+def normalize_sql(statement: str) -> str:
+    """statement with its whitespace collapsed, as query_monitor keys it; memoized per string."""
+    return ' '.join(statement.split())
+
+
+# Shared monitor fed by every Database cursor
+query_monitor = QueryMonitor()
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """sqlite3 cursor that reports each statement to query_monitor.
+    
+    A statement's record stays open while its rows are fetched and is closed
+    by the next execute or by close(), so the time includes the fetches.
+    """
+    
+    _record = None
+    
+    def execute(self, sql, parameters=()):
+        self._finish()
+        record = query_monitor.start('sql', sql, parameters)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            record['elapsed'] += time.perf_counter() - started
+            self._record = record
+    
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        record = query_monitor.start('sql', sql)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            record['elapsed'] += time.perf_counter() - started
+            self._record = record
+    
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if row is not None and self._record is not None:
+            self._record['rows'] += 1
+        return row
+    
+    def fetchmany(self, size=None):
+        rows = self._timed(super().fetchmany, self.arraysize if size is None else size)
+        if self._record is not None:
+            self._record['rows'] += len(rows)
+        return rows
+    
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        if self._record is not None:
+            self._record['rows'] += len(rows)
+        return rows
+    
+    def close(self):
+        self._finish()
+        super().close()
+    
+    def _timed(self, fetch, *args):
+        started = time.perf_counter()
+        try:
+            return fetch(*args)
+        finally:
+            if self._record is not None:
+                self._record['elapsed'] += time.perf_counter() - started
+    
+    def _finish(self):
+        record = self._record
+        if record is None:
+            return
+        self._record = None
+        if not record['rows'] and self.rowcount > 0:
+            record['rows'] = self.rowcount  # INSERT/UPDATE/DELETE
+        query_monitor.finish(record, self.connection)
+
+
+def run_c_module(args: List[str], timeout: float) -> subprocess.CompletedProcess:
+    """Run academic_module.exe, timed by query_monitor under its command name."""
+    with query_monitor.track('module', f"{os.path.basename(args[0])} {args[1]}"):
+        return subprocess.run(args, capture_output=True, text=True, timeout=timeout)
+
+
+class Database:
+    """Central data access: one long-lived SQLite connection per thread.
+    
+    Frames never open connections themselves. Reads go through cursor() and
+    writes through transaction(), so the connection (and its warm page cache)
+    is reused across clicks instead of being reopened for every query.
+    
+    Write transactions in this process queue up on a single writer lock, and
+    the busy timeout plus retries absorb writers from other clients.
+    """
+    
+    def __init__(self, path: str = DB_PATH, storage_mode: str = DEFAULT_STORAGE_MODE):
+        self.path = path
+        self.storage_mode = storage_mode
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writer_lock = threading.RLock()
+        self._connections = []
+        self._check_storage_mode()
+    
+    def configure(self, storage_mode: str):
+        """Switch storage mode; connections are reopened with the new pragmas."""
+        if storage_mode not in STORAGE_MODES:
+            raise ValueError(f"Modo de armazenamento desconhecido: {storage_mode}")
+        self.close()
+        self.storage_mode = storage_mode
+        self._check_storage_mode()
+    
+    def _check_storage_mode(self):
+        # WAL's shared memory index does not work across hosts on a network share
+        if self.storage_mode == 'wal' and is_network_path(self.path):
+            logging.getLogger('academic.storage').warning(
+                "Modo WAL em pasta de rede (%s): clientes em outras máquinas podem corromper o banco; "
+                "use --storage-mode rollback", os.path.abspath(self.path))
+    
+    def connection(self) -> sqlite3.Connection:
+        """Return the calling thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit mode: transactions are opened explicitly by transaction()
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False,
+                                   timeout=BUSY_TIMEOUT_MS / 1000)
+            settings = STORAGE_MODES[self.storage_mode]
+            conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+            conn.execute(f"PRAGMA journal_mode = {settings['journal_mode']}")
+            conn.execute(f"PRAGMA synchronous = {settings['synchronous']}")
+            conn.execute('PRAGMA cache_size = -16000')  # ~16 MB page cache
+            # REPLACE deletes the conflicting row; only with this on do its DELETE
+            # triggers (users_fts, change counters, student stats) see it
+            conn.execute('PRAGMA recursive_triggers = ON')
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+    
+    @contextmanager
+    def cursor(self):
+        """Yield a cursor for reads that do not need a transaction."""
+        cursor = self.connection().cursor(InstrumentedCursor)
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+    
+    @contextmanager
+    def transaction(self, mode: str = 'IMMEDIATE'):
+        """Yield a cursor inside a transaction; commit on success, roll back on error.
+        
+        Write transactions (the default IMMEDIATE mode) take the writer lock
+        first; pass mode='DEFERRED' for a read-only snapshot. Nested calls
+        become savepoints, so helpers that write can be called from inside a
+        larger transaction.
+        """
+        conn = self.connection()
+        cursor = conn.cursor(InstrumentedCursor)
+        if conn.in_transaction:
+            savepoint = f'sp_{id(cursor)}'
+            cursor.execute(f'SAVEPOINT {savepoint}')
+            try:
+                yield cursor
+            except BaseException:
+                cursor.execute(f'ROLLBACK TO {savepoint}')
+                cursor.execute(f'RELEASE {savepoint}')
+                raise
+            else:
+                cursor.execute(f'RELEASE {savepoint}')
+            finally:
+                cursor.close()
+            return
+        
+        writer = mode != 'DEFERRED'
+        if writer:
+            self._writer_lock.acquire()
+        try:
+            self._begin(cursor, mode)
+            try:
+                yield cursor
+            except BaseException:
+                conn.rollback()
+                raise
+            else:
+                conn.commit()
+        finally:
+            cursor.close()
+            if writer:
+                self._writer_lock.release()
+    
+    def _begin(self, cursor, mode: str):
+        """Open a transaction, retrying with backoff while another client holds the lock."""
+        for attempt in range(WRITE_RETRIES):
+            try:
+                cursor.execute(f'BEGIN {mode}')
+                return
+            except sqlite3.OperationalError as e:
+                if not is_busy_error(e) or attempt == WRITE_RETRIES - 1:
+                    raise
+                time.sleep(0.05 * 2 ** attempt)
+    
+    def run_write(self, func, *args):
+        """Run func(cursor, *args) in a write transaction, retrying the whole unit when busy.
+        
+        Use this for writes that may collide with other clients at COMMIT
+        time; the function must be safe to run more than once.
+        """
+        for attempt in range(WRITE_RETRIES):
+            try:
+                with self.transaction() as cursor:
+                    return func(cursor, *args)
+            except sqlite3.OperationalError as e:
+                if not is_busy_error(e) or attempt == WRITE_RETRIES - 1:
+                    raise
+                time.sleep(0.05 * 2 ** attempt)
+    
+    def close(self):
+        """Close every connection opened through this manager."""
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+# Shared instance used by every frame
+db = Database()
+
+
+class DatabaseExecutor:
+    """Runs frame queries on worker threads so the Tk mainloop never waits on SQL.
+    
+    submit() returns a Future. Finished futures are queued and handed to
+    their callbacks by an App.after loop, since Tk widgets may only be touched
+    from the mainloop thread. Every request carries a key naming the screen
+    region it fills; a newer request with the same key makes the older one
+    stale, so it is cancelled if it has not started and its result is dropped
+    otherwise.
+    
+    Until attach() is called (scripts, benchmarks) requests run inline.
+    """
+    
+    POLL_MS = 25
+    
+    def __init__(self, database: Database, workers: int = 2, name: str = 'db-worker'):
+        self.database = database
+        self.workers = workers
+        self.name = name
+        self._pool = None
+        self._root = None
+        self._results = queue.Queue()
+        self._latest = {}
+        self._loading = {}
+    
+    def attach(self, root: tk.Misc):
+        """Start delivering results through root.after."""
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.name)
+        self._root = root
+        root.after(self.POLL_MS, self._drain)
+    
+    def submit(self, key: str, query, on_done, indicator: Optional[tk.Label] = None,
+               on_error=None) -> Future:
+        """Run query(cursor) on a worker and call on_done(result) on the Tk thread.
+        
+        indicator, when given, shows "Carregando..." until the request ends.
+        Errors go to on_error, or to an error dialog by default.
+        """
+        previous = self._latest.pop(key, None)
+        if previous is not None:
+            previous.cancel()
+        
+        if self._root is None:
+            future = Future()
+            try:
+                future.set_result(self._run(query))
+            except Exception as e:
+                future.set_exception(e)
+            self._deliver(future, on_done, on_error)
+            return future
+        
+        if indicator is not None:
+            self._loading[indicator] = self._loading.get(indicator, 0) + 1
+            self._show_loading(indicator, True)
+        future = self._pool.submit(self._run, query)
+        self._latest[key] = future
+        future.add_done_callback(
+            lambda f: self._results.put((key, f, on_done, on_error, indicator)))
+        return future
+    
+    def cancel(self, key: str):
+        """Drop the pending request for key, if any."""
+        future = self._latest.pop(key, None)
+        if future is not None:
+            future.cancel()
+    
+    def _run(self, query):
+        with self.database.cursor() as cursor:
+            return query(cursor)
+    
+    def _drain(self):
+        try:
+            while True:
+                try:
+                    key, future, on_done, on_error, indicator = self._results.get_nowait()
+                except queue.Empty:
+                    break
+                if indicator is not None:
+                    self._loading[indicator] -= 1
+                    if not self._loading[indicator]:
+                        del self._loading[indicator]
+                        self._show_loading(indicator, False)
+                if future.cancelled() or self._latest.get(key) is not future:
+                    continue  # superseded by a newer request for the same key
+                del self._latest[key]
+                self._deliver(future, on_done, on_error)
+        finally:
+            if self._root is not None:
+                self._root.after(self.POLL_MS, self._drain)
+    
+    def _deliver(self, future: Future, on_done, on_error):
+        error = future.exception()
+        try:
+            if error is None:
+                on_done(future.result())
+            elif on_error is not None:
+                on_error(error)
+            else:
+                messagebox.showerror("Erro", f"Falha ao carregar dados: {error}")
+        except tk.TclError:
+            pass  # The window was closed while the query ran
+    
+    @staticmethod
+    def _show_loading(indicator: tk.Label, loading: bool):
+        try:
+            indicator.config(text="Carregando..." if loading else "")
+        except tk.TclError:
+            pass
+    
+    def close(self):
+        """Cancel pending requests and stop the worker threads."""
+        for future in self._latest.values():
+            future.cancel()
+        self._latest.clear()
+        self._root = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+
+# Shared executor for the frames' load_* and refresh_* methods
+db_worker = DatabaseExecutor(db)
+
+# File uploads and downloads through blob_store run here, so a few large
+# transfers never hold up db_worker's screen loads. A transfer only touches
+# the database for its short metadata write (db.run_write) once the bytes
+# have moved.
+transfer_worker = DatabaseExecutor(db, name='file-transfer')
+
+
+# Secondary indexes for the joins the frames run most. ensure_indexes() creates
+# missing ones and drops those it created that are no longer listed here; it
+# runs as a MIGRATIONS step, so changing this dict needs a new step that calls
+# it again.
+INDEXES = {
+    'idx_users_role_name': 'users(role, first_name, last_name)',
+    'idx_users_role_sort_name': "users(role, COALESCE(first_name, ''), COALESCE(last_name, ''))",
+    'idx_courses_teacher': 'courses(teacher_id)',
+    'idx_enrollments_course_user': 'enrollments(course_id, user_id)',
+    'idx_assignments_course_due': 'assignments(course_id, due_date)',
+    'idx_submissions_student_assignment': 'submissions(student_id, assignment_id, grade)',
+    'idx_quiz_questions_assignment': 'quiz_questions(assignment_id)',
+    'idx_quiz_answers_submission': 'quiz_answers(submission_id, question_id, is_correct)',
+    'idx_student_classes_class_student': 'student_classes(class_id, student_id)',
+    'idx_announcements_class_created': 'announcements(target_class_id, created_at)',
+    'idx_announcements_created': 'announcements(created_at)',
+    'idx_announcements_class_id': 'announcements(target_class_id, id)',
+}
+
+# Small lookup tables the query plan check allows to be scanned whole
+REFERENCE_TABLES = {'classes', 'courses'}
+
+# Module-level classes and functions the frames reach their data through; the
+# query plan check explains their SQL too. Each lists the tables it reads
+# whole on purpose (RiskEngine scores every enrollment in one pass).
+PLAN_CHECKED_HELPERS = {
+    'RiskEngine': ('enrollments', 'assignments', 'submissions'),
+    'SubmissionListing': (),
+    'StudentDashboard': (),
+    'import_question_pool': (),
+    'export_question_pool': (),
+    'fetch_question_pools': (),
+    'create_quiz_from_pool': (),
+    'regrade_quiz': (),
+    'fetch_course_materials': (),
+    'add_course_material': (),
+    'save_course_text': (),
+    'delete_course_material': (),
+    'release_blob': (),
+    'add_submission_attachment': (),
+    'fetch_submission_attachments': (),
+}
+
+
+# Indexes earlier versions listed in INDEXES and later removed. Databases
+# from before managed_indexes have them unrecorded, so they count as ours.
+RETIRED_INDEXES = ('idx_submissions_assignment_student',)
+
+
+def ensure_indexes(cursor) -> int:
+    """Bring the managed index set up to date; return how many indexes were created.
+    
+    The names this function creates are recorded in managed_indexes, and
+    only those are ever dropped. Other idx_* indexes (added by hand or by
+    another tool) are left alone and logged.
+    """
+    cursor.execute('CREATE TABLE IF NOT EXISTS managed_indexes (name TEXT PRIMARY KEY) WITHOUT ROWID')
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+    existing = {row[0] for row in cursor.fetchall()}
+    cursor.execute('SELECT name FROM managed_indexes')
+    managed = {row[0] for row in cursor.fetchall()}
+    if not managed:
+        # First run since managed_indexes exists: indexes under our names are ours
+        managed = existing & (INDEXES.keys() | set(RETIRED_INDEXES))
+    
+    for name in managed - INDEXES.keys():
+        cursor.execute(f'DROP INDEX IF EXISTS {name}')
+        cursor.execute('DELETE FROM managed_indexes WHERE name = ?', (name,))
+    
+    created = 0
+    for name, target in INDEXES.items():
+        if name not in existing:
+            cursor.execute(f'CREATE INDEX {name} ON {target}')
+            created += 1
+    cursor.executemany('INSERT OR IGNORE INTO managed_indexes (name) VALUES (?)', [(name,) for name in INDEXES])
+    
+    unmanaged = sorted(name for name in existing - managed - INDEXES.keys() if name.startswith('idx_'))
+    if unmanaged:
+        logging.getLogger('academic.schema').info("Índices não gerenciados mantidos: %s", ', '.join(unmanaged))
+    return created
+
+
+def setup_database(storage_mode: str = DEFAULT_STORAGE_MODE):
+    """Initialize SQLite database with required tables.
+    
+    storage_mode selects the journaling setup from STORAGE_MODES and applies
+    to every connection the application opens afterwards. Schema changes go
+    through MIGRATIONS, so a database that is already current only costs one
+    PRAGMA read here.
+    """
+    db.configure(storage_mode)
+    migrate(db)
+
+
+def schema_version(database) -> int:
+    """Return the migration number stored in the database header."""
+    with database.cursor() as cursor:
+        cursor.execute('PRAGMA user_version')
+        return cursor.fetchone()[0]
+
+
+def migrate(database) -> int:
+    """Apply pending MIGRATIONS in order; return how many steps ran.
+    
+    Each step commits in its own transaction together with the new
+    user_version, so an interrupted upgrade resumes at the failed step.
+    Steps with a backfill commit their DDL first, run the backfill in short
+    batches and only then record the version.
+    """
+    if schema_version(database) >= len(MIGRATIONS):
+        return 0
+    
+    applied = 0
+    for version, (description, apply, backfill) in enumerate(MIGRATIONS, start=1):
+        with database.transaction() as cursor:
+            # Re-read under the write lock: another client may have migrated
+            cursor.execute('PRAGMA user_version')
+            if cursor.fetchone()[0] >= version:
+                continue
+            apply(cursor)
+            if backfill is None:
+                cursor.execute(f'PRAGMA user_version = {version}')
+        
+        if backfill is not None:
+            backfill(database)
+            with database.transaction() as cursor:
+                cursor.execute(f'PRAGMA user_version = {version}')
+        applied += 1
+    return applied
+
+
+def backfill_in_batches(database, table: str, assignments: str, pending: str,
+                        batch_size: int = 2000) -> int:
+    """Run UPDATE table SET assignments over rows matching pending, in rowid batches.
     
+    Every batch is its own short write transaction, so readers and other
+    writers get the database between batches even on very large tables.
+    pending must stop matching a row once it is updated; that keeps the
+    backfill resumable. Returns the number of rows updated.
+    """
+    updated = 0
+    last_rowid = 0
+    while True:
+        with database.transaction() as cursor:
+            cursor.execute(f'''
+                SELECT rowid FROM {table}
+                WHERE rowid > ? AND ({pending})
+                ORDER BY rowid LIMIT ?
+            ''', (last_rowid, batch_size))
+            rowids = [row[0] for row in cursor.fetchall()]
+            if not rowids:
+                return updated
+            cursor.execute(f'''
+                UPDATE {table} SET {assignments}
+                WHERE rowid BETWEEN ? AND ? AND ({pending})
+            ''', (rowids[0], rowids[-1]))
+            updated += cursor.rowcount
+        last_rowid = rowids[-1]
+
+
+def _column_names(cursor, table: str) -> set:
+    cursor.execute(f'PRAGMA table_info({table})')
+    return {row[1] for row in cursor.fetchall()}
+
+
+def _add_column(cursor, table: str, column: str, definition: str):
+    """ALTER TABLE ADD COLUMN unless the column is already there."""
+    if column not in _column_names(cursor, table):
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+
+def _migration_base_schema(cursor):
+    """Create the original tables; upgrades pre-versioning databases in place."""
     # Create users table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -128,172 +883,2233 @@ def setup_database():
         )
     ''')
     
-    # Add type column if it doesn't exist (for existing databases)
-    try:
-        cursor.execute('ALTER TABLE assignments ADD COLUMN type TEXT DEFAULT "assignment"')
-    except sqlite3.OperationalError:
-        pass  # Column already exists
+    # Add type column if it doesn't exist (for existing databases)
+    _add_column(cursor, 'assignments', 'type', "TEXT DEFAULT 'assignment'")
+    
+    # Create quiz questions table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS quiz_questions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            assignment_id INTEGER,
+            question_text TEXT NOT NULL,
+            option_a TEXT NOT NULL,
+            option_b TEXT NOT NULL,
+            option_c TEXT NOT NULL,
+            option_d TEXT NOT NULL,
+            correct_answer TEXT NOT NULL,
+            points INTEGER DEFAULT 1,
+            FOREIGN KEY (assignment_id) REFERENCES assignments (id)
+        )
+    ''')
+    
+    # Create quiz answers table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS quiz_answers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            submission_id INTEGER,
+            question_id INTEGER,
+            selected_answer TEXT NOT NULL,
+            is_correct BOOLEAN DEFAULT 0,
+            FOREIGN KEY (submission_id) REFERENCES submissions (id),
+            FOREIGN KEY (question_id) REFERENCES quiz_questions (id)
+        )
+    ''')
+    
+    # Create submissions table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS submissions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            assignment_id INTEGER,
+            student_id INTEGER,
+            submission_date TEXT,
+            grade REAL,
+            feedback TEXT,
+            FOREIGN KEY (assignment_id) REFERENCES assignments(id),
+            FOREIGN KEY (student_id) REFERENCES users(id)
+        )
+    ''')
+    
+    # Add content and submitted_at columns to submissions table if they don't exist
+    _add_column(cursor, 'submissions', 'content', 'TEXT')
+    _add_column(cursor, 'submissions', 'submitted_at', 'TEXT')
+    
+    # Create classes/turmas table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS classes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            description TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Create student_classes table (associação entre estudantes e turmas)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS student_classes (
+            student_id INTEGER,
+            class_id INTEGER,
+            assigned_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (student_id, class_id),
+            FOREIGN KEY (student_id) REFERENCES users(id),
+            FOREIGN KEY (class_id) REFERENCES classes(id)
+        )
+    ''')
+    
+    # Create announcements/avisos table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS announcements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            content TEXT NOT NULL,
+            target_class_id INTEGER,
+            created_by INTEGER,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            priority TEXT DEFAULT 'normal',
+            FOREIGN KEY (target_class_id) REFERENCES classes(id),
+            FOREIGN KEY (created_by) REFERENCES users(id)
+        )
+    ''')
+
+
+def _migration_seed_data(cursor):
+    """Seed sample users and default classes into a new database."""
+    # Insert sample data if tables are empty
+    cursor.execute('SELECT EXISTS (SELECT 1 FROM users)')
+    if not cursor.fetchone()[0]:
+        insert_sample_data(cursor)
+    
+    # Insert default classes if they don't exist
+    cursor.execute('SELECT EXISTS (SELECT 1 FROM classes)')
+    if not cursor.fetchone()[0]:
+        cursor.execute("INSERT INTO classes (name, description) VALUES ('Turma A', 'Primeira turma')")
+        cursor.execute("INSERT INTO classes (name, description) VALUES ('Turma B', 'Segunda turma')")
+
+
+def _backfill_submitted_at(database):
+    """Copy submission_date into submitted_at for homework submitted before it existed."""
+    backfill_in_batches(database, 'submissions', 'submitted_at = submission_date',
+                        'submitted_at IS NULL AND submission_date IS NOT NULL')
+
+
+# Statements that recompute student_course_stats rows from submissions. The
+# WHERE clause is filled in by the caller and limits which students are redone.
+STUDENT_COURSE_STATS_SELECT = '''
+    SELECT s.student_id, a.course_id, COUNT(*), COUNT(s.grade), COALESCE(SUM(s.grade), 0),
+           AVG(s.grade), MAX(COALESCE(s.submitted_at, s.submission_date))
+    FROM submissions s
+    JOIN assignments a ON a.id = s.assignment_id
+    WHERE {where}
+    GROUP BY s.student_id, a.course_id
+'''
+
+STUDENT_COURSE_STATS_TRIGGERS = {
+    # A new submission only adds to the running totals
+    'trg_submissions_stats_insert': '''
+        AFTER INSERT ON submissions
+        BEGIN
+            INSERT INTO student_course_stats (student_id, course_id, submission_count, graded_count,
+                                              grade_sum, grade_avg, last_submitted_at)
+            SELECT NEW.student_id, a.course_id, 1, NEW.grade IS NOT NULL, COALESCE(NEW.grade, 0),
+                   NEW.grade, COALESCE(NEW.submitted_at, NEW.submission_date)
+            FROM assignments a WHERE a.id = NEW.assignment_id
+            ON CONFLICT (student_id, course_id) DO UPDATE SET
+                submission_count = submission_count + 1,
+                graded_count = graded_count + excluded.graded_count,
+                grade_sum = grade_sum + excluded.grade_sum,
+                grade_avg = CASE WHEN graded_count + excluded.graded_count > 0
+                                 THEN (grade_sum + excluded.grade_sum) / (graded_count + excluded.graded_count)
+                            END,
+                last_submitted_at = CASE WHEN excluded.last_submitted_at > COALESCE(last_submitted_at, '')
+                                         THEN excluded.last_submitted_at ELSE last_submitted_at END;
+        END
+    ''',
+    # Grade changes and deletes recompute the affected student/course rows,
+    # which only touches that student's submissions
+    'trg_submissions_stats_update': '''
+        AFTER UPDATE OF assignment_id, student_id, grade, submitted_at, submission_date ON submissions
+        BEGIN
+            DELETE FROM student_course_stats
+            WHERE (student_id = OLD.student_id
+                   AND course_id = (SELECT course_id FROM assignments WHERE id = OLD.assignment_id))
+               OR (student_id = NEW.student_id
+                   AND course_id = (SELECT course_id FROM assignments WHERE id = NEW.assignment_id));
+            INSERT OR REPLACE INTO student_course_stats ''' + STUDENT_COURSE_STATS_SELECT.format(where='''
+                s.student_id IN (OLD.student_id, NEW.student_id)
+                AND a.course_id IN (SELECT course_id FROM assignments
+                                    WHERE id IN (OLD.assignment_id, NEW.assignment_id))''') + ''';
+        END
+    ''',
+    'trg_submissions_stats_delete': '''
+        AFTER DELETE ON submissions
+        BEGIN
+            DELETE FROM student_course_stats
+            WHERE student_id = OLD.student_id
+              AND course_id = (SELECT course_id FROM assignments WHERE id = OLD.assignment_id);
+            INSERT INTO student_course_stats ''' + STUDENT_COURSE_STATS_SELECT.format(where='''
+                s.student_id = OLD.student_id
+                AND a.course_id = (SELECT course_id FROM assignments WHERE id = OLD.assignment_id)''') + ''';
+        END
+    ''',
+}
+
+
+def create_student_course_stats_triggers(cursor):
+    for name, body in STUDENT_COURSE_STATS_TRIGGERS.items():
+        cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {body}')
+
+
+def drop_student_course_stats_triggers(cursor):
+    for name in STUDENT_COURSE_STATS_TRIGGERS:
+        cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+
+
+def _migration_student_course_stats(cursor):
+    """Per student and course grade aggregates, kept current by triggers on submissions."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS student_course_stats (
+            student_id INTEGER NOT NULL,
+            course_id INTEGER NOT NULL,
+            submission_count INTEGER NOT NULL DEFAULT 0,
+            graded_count INTEGER NOT NULL DEFAULT 0,
+            grade_sum REAL NOT NULL DEFAULT 0,
+            grade_avg REAL,
+            last_submitted_at TEXT,
+            PRIMARY KEY (student_id, course_id),
+            FOREIGN KEY (student_id) REFERENCES users(id),
+            FOREIGN KEY (course_id) REFERENCES courses(id)
+        ) WITHOUT ROWID
+    ''')
+    create_student_course_stats_triggers(cursor)
+
+
+def rebuild_student_course_stats(database, batch_size: int = 5000) -> int:
+    """Recompute student_course_stats from submissions; return the number of rows written.
+    
+    Works through students in id ranges, each in its own short write
+    transaction, so a large database stays usable while it runs. Rows are
+    replaced rather than deleted up front, so screens never see a student
+    without stats mid-rebuild.
+    """
+    with database.cursor() as cursor:
+        cursor.execute('SELECT MIN(id), MAX(id) FROM users')
+        low, high = cursor.fetchone()
+    if low is None:
+        return 0
+    
+    written = 0
+    for start in range(low, high + 1, batch_size):
+        end = start + batch_size - 1
+        with database.transaction() as cursor:
+            cursor.execute('DELETE FROM student_course_stats WHERE student_id BETWEEN ? AND ?',
+                           (start, end))
+            cursor.execute('INSERT INTO student_course_stats '
+                           + STUDENT_COURSE_STATS_SELECT.format(where='s.student_id BETWEEN ? AND ?'),
+                           (start, end))
+            written += cursor.rowcount
+    return written
+
+
+# Full-text index over the users' names, username and email. It is an
+# external-content table: the text lives only in users and these triggers
+# keep the index in step. unicode61 with remove_diacritics folds "João" and
+# "joao" to the same token; the prefix indexes make short "jo*" queries cheap.
+USERS_FTS_TRIGGERS = {
+    'trg_users_fts_insert': '''
+        AFTER INSERT ON users
+        BEGIN
+            INSERT INTO users_fts (rowid, first_name, last_name, username, email)
+            VALUES (NEW.id, NEW.first_name, NEW.last_name, NEW.username, NEW.email);
+        END
+    ''',
+    'trg_users_fts_update': '''
+        AFTER UPDATE OF first_name, last_name, username, email ON users
+        BEGIN
+            INSERT INTO users_fts (users_fts, rowid, first_name, last_name, username, email)
+            VALUES ('delete', OLD.id, OLD.first_name, OLD.last_name, OLD.username, OLD.email);
+            INSERT INTO users_fts (rowid, first_name, last_name, username, email)
+            VALUES (NEW.id, NEW.first_name, NEW.last_name, NEW.username, NEW.email);
+        END
+    ''',
+    'trg_users_fts_delete': '''
+        AFTER DELETE ON users
+        BEGIN
+            INSERT INTO users_fts (users_fts, rowid, first_name, last_name, username, email)
+            VALUES ('delete', OLD.id, OLD.first_name, OLD.last_name, OLD.username, OLD.email);
+        END
+    ''',
+}
+
+
+def _migration_users_fts(cursor):
+    """Full-text search index over users, filled from the existing rows."""
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(
+            first_name, last_name, username, email,
+            content = 'users', content_rowid = 'id',
+            tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+        )
+    ''')
+    for name, body in USERS_FTS_TRIGGERS.items():
+        cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {body}')
+    cursor.execute("INSERT INTO users_fts (users_fts) VALUES ('rebuild')")
+
+
+def fts_prefix_query(text: str) -> Optional[str]:
+    """Turn free text typed by a user into an FTS5 query matching every word as a prefix.
+    
+    Each word is quoted, so FTS5 operators and punctuation in the input are
+    taken literally. Returns None when the text has no words.
+    """
+    import re
+    
+    words = re.findall(r'\w+', text)
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+# Tables whose writes bump a counter in change_counters, one row per table.
+# Caches compare the counters they were built from with the current ones
+# (one indexed read) to know whether they are stale. ensure_change_counters()
+# runs as a MIGRATIONS step; changing this tuple needs a new step.
+CHANGE_COUNTED_TABLES = (
+    'users', 'courses', 'enrollments', 'assignments', 'submissions', 'quiz_questions',
+    'quiz_answers', 'classes', 'student_classes', 'announcements', 'announcement_inbox',
+)
+
+
+def _change_counter_triggers(table: str) -> Dict[str, str]:
+    bump = f"UPDATE change_counters SET changes = changes + 1 WHERE table_name = '{table}';"
+    return {f'trg_{table}_count_{event.lower()}': f'AFTER {event} ON {table} BEGIN {bump} END'
+            for event in ('INSERT', 'UPDATE', 'DELETE')}
+
+
+def create_change_counter_triggers(cursor):
+    # Tables created by a later migration get their triggers from the step that follows it
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    existing = {row[0] for row in cursor.fetchall()}
+    for table in CHANGE_COUNTED_TABLES:
+        if table not in existing:
+            continue
+        for name, body in _change_counter_triggers(table).items():
+            cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {body}')
+
+
+def drop_change_counter_triggers(cursor):
+    for table in CHANGE_COUNTED_TABLES:
+        for name in _change_counter_triggers(table):
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+
+
+def bump_change_counters(cursor, tables=CHANGE_COUNTED_TABLES):
+    """Mark tables as changed, for writers that ran with the counter triggers dropped."""
+    cursor.executemany('UPDATE change_counters SET changes = changes + 1 WHERE table_name = ?',
+                       [(table,) for table in tables])
+
+
+def ensure_change_counters(cursor):
+    """Create change_counters with a row and triggers for every table in CHANGE_COUNTED_TABLES."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS change_counters (
+            table_name TEXT PRIMARY KEY,
+            changes INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    cursor.executemany('INSERT OR IGNORE INTO change_counters (table_name) VALUES (?)',
+                       [(table,) for table in CHANGE_COUNTED_TABLES])
+    create_change_counter_triggers(cursor)
+
+
+def change_counters(cursor, tables) -> tuple:
+    """Current counters for tables, in order; equal tuples mean none of them was written in between."""
+    cursor.execute(f"SELECT table_name, changes FROM change_counters "
+                   f"WHERE table_name IN ({', '.join('?' * len(tables))})", tuple(tables))
+    counters = dict(cursor.fetchall())
+    return tuple(counters.get(table) for table in tables)
+
+
+def _migration_quiz_bank(cursor):
+    """Reusable question pools per course, copied into quiz_questions when a quiz is created."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS question_pools (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            course_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (course_id, name),
+            FOREIGN KEY (course_id) REFERENCES courses(id)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS pool_questions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pool_id INTEGER NOT NULL,
+            question_text TEXT NOT NULL,
+            option_a TEXT NOT NULL,
+            option_b TEXT NOT NULL,
+            option_c TEXT NOT NULL,
+            option_d TEXT NOT NULL,
+            correct_answer TEXT NOT NULL,
+            points INTEGER NOT NULL DEFAULT 1,
+            FOREIGN KEY (pool_id) REFERENCES question_pools(id)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS pool_questions_pool ON pool_questions(pool_id)')
+
+
+def _migration_course_materials(cursor):
+    """Persisted course materials; uploaded files are content-addressed blobs stored once."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS blobs (
+            sha256 TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS course_materials (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            course_id INTEGER NOT NULL,
+            kind TEXT NOT NULL CHECK (kind IN ('syllabus', 'resources', 'lesson', 'file')),
+            title TEXT NOT NULL,
+            body TEXT,
+            blob_sha256 TEXT,
+            filename TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (course_id) REFERENCES courses(id),
+            FOREIGN KEY (blob_sha256) REFERENCES blobs(sha256)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS course_materials_course ON course_materials(course_id, kind)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS course_materials_blob ON course_materials(blob_sha256)')
+
+
+def _migration_announcement_inbox(cursor):
+    """Per-student read cursor over announcements, and the (class, id) index the inbox polls."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS announcement_inbox (
+            student_id INTEGER PRIMARY KEY,
+            last_seen_id INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (student_id) REFERENCES users(id)
+        )
+    ''')
+    ensure_indexes(cursor)
+
+
+def _migration_unique_submissions(cursor):
+    """One submission per (assignment, student), enforced by a unique index.
+    
+    Duplicates left by double clicks on "Entregar" are removed before the
+    index is built. Each pair keeps its most recent graded submission, or its
+    most recent one if none was graded, so no grade is lost to a later
+    ungraded double click; the removed rows are logged. The unique index
+    replaces idx_submissions_assignment_student, which ensure_indexes drops
+    (see RETIRED_INDEXES).
+    """
+    cursor.execute('''
+        CREATE TEMP TABLE duplicate_submissions AS
+        SELECT s.id, s.assignment_id, s.student_id, s.grade FROM submissions s
+        WHERE s.id != (SELECT k.id FROM submissions k
+                       WHERE k.assignment_id = s.assignment_id AND k.student_id = s.student_id
+                       ORDER BY k.grade IS NULL, k.id DESC LIMIT 1)
+    ''')
+    cursor.execute('SELECT id, assignment_id, student_id, grade FROM duplicate_submissions ORDER BY id')
+    removed = cursor.fetchall()
+    if removed:
+        logging.getLogger('academic.schema').warning(
+            "Entregas duplicadas removidas (id, atividade, estudante, nota): %s",
+            ', '.join(str(row) for row in removed))
+    cursor.execute('DELETE FROM quiz_answers WHERE submission_id IN (SELECT id FROM duplicate_submissions)')
+    cursor.execute('DELETE FROM submissions WHERE id IN (SELECT id FROM duplicate_submissions)')
+    cursor.execute('DROP TABLE duplicate_submissions')
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS submissions_assignment_student_unique
+        ON submissions(assignment_id, student_id)
+    ''')
+    ensure_indexes(cursor)
+
+
+def _migration_submission_attachments(cursor):
+    """Files attached to submissions, stored in BlobStore like course materials."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS submission_attachments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            submission_id INTEGER NOT NULL,
+            blob_sha256 TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (submission_id) REFERENCES submissions(id),
+            FOREIGN KEY (blob_sha256) REFERENCES blobs(sha256)
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS submission_attachments_submission
+        ON submission_attachments(submission_id)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS submission_attachments_blob ON submission_attachments(blob_sha256)
+    ''')
+
+
+def _migration_rebuild_users_fts(cursor):
+    """Drop users_fts entries left behind by INSERT OR REPLACE imports, which skipped the delete trigger."""
+    cursor.execute("INSERT INTO users_fts (users_fts) VALUES ('rebuild')")
+
+
+# Ordered schema history; position + 1 is the user_version a step leaves
+# behind. Append new steps, never edit or reorder the applied ones.
+# Each entry is (description, apply(cursor), backfill(database) or None).
+MIGRATIONS = [
+    ('Tabelas base', _migration_base_schema, None),
+    ('Dados iniciais', _migration_seed_data, None),
+    ('Índices gerenciados', ensure_indexes, None),
+    ('submitted_at das entregas antigas', lambda cursor: None, _backfill_submitted_at),
+    ('Estatísticas de notas por estudante e disciplina', _migration_student_course_stats,
+     rebuild_student_course_stats),
+    ('Índice de busca textual de usuários', _migration_users_fts, None),
+    ('Contadores de alteração por tabela', ensure_change_counters, None),
+    ('Banco de questões por disciplina', _migration_quiz_bank, None),
+    ('Materiais das disciplinas', _migration_course_materials, None),
+    ('Caixa de entrada de avisos', _migration_announcement_inbox, None),
+    ('Uma entrega por estudante e atividade', _migration_unique_submissions, None),
+    ('Contador de alteração da caixa de entrada de avisos', ensure_change_counters, None),
+    ('Anexos das entregas', _migration_submission_attachments, None),
+    ('Índice de ordenação por nome com nomes vazios', ensure_indexes, None),
+    ('Reconstrução do índice de busca de usuários', _migration_rebuild_users_fts, None),
+]
+
+
+def insert_sample_data(cursor):
+    """Insert sample data for testing purposes."""
+    # Sample users
+    users_data = [
+        ('teacher1', 'pass123', 'Maria', 'Silva', 'maria.silva@email.com', 'TEACHER'),
+        ('student1', 'pass123', 'João', 'Santos', 'joao.santos@email.com', 'STUDENT'),
+        ('student2', 'pass123', 'Ana', 'Costa', 'ana.costa@email.com', 'STUDENT'),
+        ('coordinator1', 'pass123', 'Carlos', 'Lima', 'carlos.lima@email.com', 'COORDINATOR'),
+        ('secretary1', 'pass123', 'Paula', 'Ferreira', 'paula.ferreira@email.com', 'SECRETARY'),
+        ('director1', 'pass123', 'Roberto', 'Oliveira', 'roberto.oliveira@email.com', 'DIRECTOR'),
+    ]
+    
+    cursor.executemany('''
+        INSERT INTO users (username, password, first_name, last_name, email, role)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', users_data)
+    
+    # Sample courses
+    courses_data = [
+        ('Matemática I', 1),
+        ('Fundamentos de Programação', 1),
+        ('Estruturas de Dados', 1),
+    ]
+    
+    cursor.executemany('''
+        INSERT INTO courses (name, teacher_id)
+        VALUES (?, ?)
+    ''', courses_data)
+    
+    # Sample enrollments
+    enrollments_data = [
+        (2, 1), (2, 2),  # student1 in Math and Programming
+        (3, 1), (3, 3),  # student2 in Math and Data Structures
+    ]
+    
+    cursor.executemany('''
+        INSERT INTO enrollments (user_id, course_id)
+        VALUES (?, ?)
+    ''', enrollments_data)
+    
+    # Sample assignments
+    assignments_data = [
+        (1, 'Calculus Assignment', 'Solve differential equations problems', '2025-09-15', 100),
+        (1, 'Linear Algebra Quiz', 'Matrix operations and transformations', '2025-09-22', 50),
+        (2, 'Python Project 1', 'Create a simple calculator application', '2025-09-20', 100),
+        (2, 'Data Types Exercise', 'Work with lists, dictionaries, and sets', '2025-09-18', 75),
+        (3, 'Binary Tree Implementation', 'Implement binary search tree in Python', '2025-09-25', 100),
+        (3, 'Algorithm Analysis', 'Analyze time complexity of sorting algorithms', '2025-09-30', 80),
+    ]
+    
+    cursor.executemany('''
+        INSERT INTO assignments (course_id, title, description, due_date, max_points)
+        VALUES (?, ?, ?, ?, ?)
+    ''', assignments_data)
+
+
+# Sizes for generate_institution(); 'large' is the 100k student / ~5M quiz
+# answer institution used to reproduce scaling problems.
+DATASET_PRESETS = {
+    'small': dict(students=500, teachers=10, courses=20, classes=5, announcements=50),
+    'medium': dict(students=10_000, teachers=100, courses=150, classes=40, announcements=1_000),
+    'large': dict(students=100_000, teachers=600, courses=1_000, classes=300, announcements=10_000),
+}
+
+SYNTHETIC_FIRST_NAMES = ['Ana', 'Bruno', 'Carla', 'Daniel', 'Eduarda', 'Felipe', 'Gabriela', 'Heitor',
+                         'Isabela', 'João', 'Larissa', 'Mateus', 'Natália', 'Otávio', 'Paula', 'Rafael',
+                         'Sofia', 'Thiago', 'Valentina', 'Vinícius']
+SYNTHETIC_LAST_NAMES = ['Almeida', 'Barbosa', 'Cardoso', 'Costa', 'Dias', 'Ferreira', 'Gomes', 'Lima',
+                        'Martins', 'Oliveira', 'Pereira', 'Ribeiro', 'Rodrigues', 'Santos', 'Silva', 'Souza']
+SYNTHETIC_SUBJECTS = ['Matemática', 'Programação', 'Estruturas de Dados', 'Banco de Dados', 'Física',
+                      'Redes', 'Sistemas Operacionais', 'Estatística', 'Engenharia de Software', 'Cálculo']
+
+
+def insert_synthetic_data(cursor, students: int = 1000, teachers: int = 20, courses: int = 40,
+                          classes: int = 10, courses_per_student: int = 3,
+                          assignments_per_course: int = 4, quizzes_per_course: int = 2,
+                          questions_per_quiz: int = 10, submission_rate: float = 0.85,
+                          announcements: int = 200, seed: int = 42) -> Dict[str, int]:
+    """Insert a synthetic institution on top of whatever the database already holds.
+    
+    Everything is derived from seed, so the same arguments always produce
+    the same rows. Ids are assigned here, after the current MAX(id) of each
+    table, and usernames embed them, so the generator can run on a seeded
+    database. Rows are streamed to executemany in batches; the caller owns
+    the transaction. Returns the number of rows inserted per table.
+    """
+    import random
+    from datetime import datetime, timedelta
+    
+    rng = random.Random(seed)
+    counts = dict.fromkeys(['users', 'classes', 'courses', 'enrollments', 'student_classes',
+                            'assignments', 'quiz_questions', 'submissions', 'quiz_answers',
+                            'announcements'], 0)
+    
+    def first_id(table):
+        cursor.execute(f'SELECT COALESCE(MAX(id), 0) + 1 FROM {table}')
+        return cursor.fetchone()[0]
+    
+    def insert(table, columns, rows):
+        placeholders = ', '.join('?' * len(columns))
+        cursor.executemany(f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({placeholders})', rows)
+        counts[table] += cursor.rowcount
+    
+    def person(user_id, prefix, role):
+        first, last = rng.choice(SYNTHETIC_FIRST_NAMES), rng.choice(SYNTHETIC_LAST_NAMES)
+        username = f"{prefix}{user_id}"
+        email = f"{username}@academico.edu"
+        # Like spreadsheet imports with empty cells: a few students lack an email or last name
+        if role == 'STUDENT' and user_id % 50 == 0:
+            email = None
+        if role == 'STUDENT' and user_id % 97 == 0:
+            last = None
+        return (user_id, username, 'pass123', first, last, email, role)
+    
+    user_columns = ('id', 'username', 'password', 'first_name', 'last_name', 'email', 'role')
+    start = first_id('users')
+    teacher_ids = range(start, start + teachers)
+    student_ids = range(teacher_ids.stop, teacher_ids.stop + students)
+    insert('users', user_columns, (person(i, 'prof', 'TEACHER') for i in teacher_ids))
+    
+    semester_start = datetime(2025, 8, 1)
+    created_at = semester_start.strftime('%Y-%m-%d %H:%M:%S')
+    
+    start = first_id('classes')
+    class_ids = range(start, start + classes)
+    insert('classes', ('id', 'name', 'description', 'created_at'),
+           ((i, f"Turma G{i}", f"Turma gerada {i}", created_at) for i in class_ids))
+    
+    start = first_id('courses')
+    course_ids = range(start, start + courses)
+    insert('courses', ('id', 'name', 'teacher_id'),
+           ((i, f"{SYNTHETIC_SUBJECTS[n % len(SYNTHETIC_SUBJECTS)]} {n // len(SYNTHETIC_SUBJECTS) + 1}",
+             rng.choice(teacher_ids)) for n, i in enumerate(course_ids)))
+    
+    # Assignments per course: (id, type, max_points, due date); quizzes keep their answer key
+    course_assignments = {}
+    quiz_keys = {}
+    assignment_rows = []
+    question_rows = []
+    assignment_id = first_id('assignments')
+    question_id = first_id('quiz_questions')
+    for course_id in course_ids:
+        course_assignments[course_id] = []
+        for n in range(assignments_per_course + quizzes_per_course):
+            is_quiz = n >= assignments_per_course
+            kind = 'quiz' if is_quiz else rng.choice(['homework', 'project', 'exam'])
+            max_points = questions_per_quiz if is_quiz else 100
+            due = semester_start + timedelta(days=rng.randint(7, 120))
+            assignment_rows.append((assignment_id, course_id, f"{kind.title()} {n + 1}",
+                                    f"Atividade gerada {assignment_id}", due.strftime('%Y-%m-%d'),
+                                    max_points, kind))
+            if is_quiz:
+                key = []
+                for q in range(questions_per_quiz):
+                    correct = rng.choice('ABCD')
+                    question_rows.append((question_id, assignment_id, f"Questão {q + 1}",
+                                          'Opção A', 'Opção B', 'Opção C', 'Opção D', correct, 1))
+                    key.append((question_id, correct))
+                    question_id += 1
+                quiz_keys[assignment_id] = key
+            course_assignments[course_id].append((assignment_id, kind, max_points, due))
+            assignment_id += 1
+    insert('assignments', ('id', 'course_id', 'title', 'description', 'due_date', 'max_points', 'type'),
+           assignment_rows)
+    insert('quiz_questions', ('id', 'assignment_id', 'question_text', 'option_a', 'option_b',
+                              'option_c', 'option_d', 'correct_answer', 'points'), question_rows)
+    
+    insert('users', user_columns, (person(i, 'aluno', 'STUDENT') for i in student_ids))
+    
+    # Enrollments, classes, submissions and answers, flushed in batches per student range
+    submission_columns = ('id', 'assignment_id', 'student_id', 'submission_date', 'submitted_at',
+                          'content', 'grade')
+    answer_columns = ('submission_id', 'question_id', 'selected_answer', 'is_correct')
+    submission_id = first_id('submissions')
+    enrollments, memberships, submissions, answers = [], [], [], []
+    
+    def flush():
+        insert('enrollments', ('user_id', 'course_id'), enrollments)
+        insert('student_classes', ('student_id', 'class_id', 'assigned_at'), memberships)
+        insert('submissions', submission_columns, submissions)
+        insert('quiz_answers', answer_columns, answers)
+        for batch in (enrollments, memberships, submissions, answers):
+            batch.clear()
+    
+    for student_id in student_ids:
+        if class_ids and rng.random() < 0.9:
+            memberships.append((student_id, rng.choice(class_ids), created_at))
+        skill = rng.uniform(0.3, 0.95)
+        for course_id in rng.sample(course_ids, min(courses_per_student, courses)):
+            enrollments.append((student_id, course_id))
+            for assignment_id, kind, max_points, due in course_assignments[course_id]:
+                if rng.random() >= submission_rate:
+                    continue
+                submitted = (due + timedelta(days=rng.randint(-6, 2), minutes=rng.randint(0, 1439))
+                             ).strftime('%Y-%m-%d %H:%M:%S')
+                if kind == 'quiz':
+                    correct_count = 0
+                    for question_id, correct in quiz_keys[assignment_id]:
+                        is_correct = rng.random() < skill
+                        selected = correct if is_correct else rng.choice([o for o in 'ABCD' if o != correct])
+                        answers.append((submission_id, question_id, selected, int(is_correct)))
+                        correct_count += is_correct
+                    grade = correct_count / len(quiz_keys[assignment_id]) * max_points if quiz_keys[assignment_id] else 0
+                    content = "Quiz submission"
+                else:
+                    grade = round(min(100.0, max(0.0, rng.gauss(skill * 100, 12))), 1) if rng.random() < 0.8 else None
+                    content = None
+                submissions.append((submission_id, assignment_id, student_id, submitted, submitted, content, grade))
+                submission_id += 1
+        if len(answers) >= 200_000 or len(submissions) >= 50_000:
+            flush()
+    flush()
+    
+    author_ids = list(teacher_ids) or [None]
+    insert('announcements', ('title', 'content', 'target_class_id', 'created_by', 'created_at', 'priority'),
+           ((f"Aviso {n + 1}", f"Conteúdo do aviso gerado {n + 1}.",
+             rng.choice(class_ids) if class_ids and rng.random() < 0.8 else None,
+             rng.choice(author_ids),
+             (semester_start + timedelta(minutes=rng.randint(0, 180 * 1440))).strftime('%Y-%m-%d %H:%M:%S'),
+             'high' if rng.random() < 0.15 else 'normal') for n in range(announcements)))
+    return counts
+
+
+def generate_institution(path: str, seed: int = 42, **sizes) -> Dict[str, int]:
+    """Create or extend the database at path with a synthetic institution.
+    
+    sizes are insert_synthetic_data() keyword arguments, usually one of
+    DATASET_PRESETS. The rows go in one transaction; the managed indexes are
+    dropped first and rebuilt after the load, which is much faster than
+    maintaining them row by row. The student_course_stats triggers are
+    suspended the same way and the table is rebuilt at the end; the change
+    counter triggers too, with every counter bumped once afterwards.
+    """
+    database = Database(path)
+    try:
+        migrate(database)
+        with database.transaction() as cursor:
+            cursor.execute('PRAGMA cache_size = -200000')  # ~200 MB while loading
+            for name in INDEXES:
+                cursor.execute(f'DROP INDEX IF EXISTS {name}')
+            drop_student_course_stats_triggers(cursor)
+            drop_change_counter_triggers(cursor)
+            counts = insert_synthetic_data(cursor, seed=seed, **sizes)
+            ensure_indexes(cursor)
+            create_student_course_stats_triggers(cursor)
+            create_change_counter_triggers(cursor)
+            bump_change_counters(cursor)
+        rebuild_student_course_stats(database)
+        return counts
+    finally:
+        database.close()
+
+
+class RiskEngine:
+    """Scores every enrolled student-course pair for academic risk in one vectorized pass.
+    
+    Enrollments, assignments and submissions of all courses are loaded into
+    arrays at once and three normalized signals are computed per pair:
+    grade_ratio (mean grade / max_points over graded work), missing_ratio
+    (past-due assignments without a submission / past-due assignments) and
+    late_ratio (submissions after the due date / submissions). risk_score
+    weighs them with WEIGHTS. The result is cached until change_counters
+    shows a write to one of TABLES or the next due date passes (missing work
+    counts from then on), so the teacher and coordinator views read the same
+    scores without reloading.
+    
+    One engine serves one database; the shared risk_engine serves db.
+    """
+    
+    TABLES = ('users', 'courses', 'enrollments', 'assignments', 'submissions')
+    WEIGHTS = {'grade': 0.5, 'missing': 0.35, 'late': 0.15}
+    GRADE_THRESHOLD = 0.6   # below 60% of the points
+    MISSING_THRESHOLD = 0.5  # half of the past-due work not handed in
+    SCORE_THRESHOLD = 0.4
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = None
+        self._scores = None
+        self._expires = None
+    
+    def scores(self, cursor) -> pd.DataFrame:
+        """Scores for every student-course pair, recomputed only if TABLES changed or a deadline passed."""
+        with self._lock:
+            counters = change_counters(cursor, self.TABLES)
+            now = pd.Timestamp.now()
+            if (self._scores is None or counters != self._counters
+                    or (self._expires is not None and now >= self._expires)):
+                # Counters are read before the data, so a write in between
+                # only causes one extra recompute later, never stale scores
+                enrollments, assignments, submissions = self.load(cursor)
+                self._scores = self.compute(enrollments, assignments, submissions, now)
+                due = self.deadlines(assignments)
+                upcoming = due[due > now]
+                self._expires = upcoming.min() if len(upcoming) else None
+                self._counters = counters
+            return self._scores
+    
+    def at_risk(self, cursor, course_id: Optional[int] = None) -> pd.DataFrame:
+        """At-risk pairs, optionally for one course, highest risk first."""
+        scores = self.scores(cursor)
+        if course_id is not None:
+            scores = scores[scores['course_id'] == course_id]
+        return scores[scores['at_risk']].sort_values('risk_score', ascending=False)
+    
+    def course_summary(self, cursor) -> pd.DataFrame:
+        """Per course: students, at-risk count and share, mean grade_ratio; riskiest courses first."""
+        scores = self.scores(cursor)
+        summary = scores.groupby(['course_id', 'course_name'], sort=False).agg(
+            students=('student_id', 'size'),
+            at_risk=('at_risk', 'sum'),
+            grade_ratio=('grade_ratio', 'mean'),
+        ).reset_index()
+        summary['at_risk_share'] = summary['at_risk'] / summary['students']
+        return summary.sort_values(['at_risk_share', 'course_name'], ascending=[False, True])
+    
+    @staticmethod
+    def load(cursor):
+        """Read the tables the scores depend on; returns DataFrames for compute()."""
+        def frame(sql, columns):
+            cursor.execute(sql)
+            return pd.DataFrame.from_records(cursor.fetchall(), columns=columns)
+        
+        enrollments = frame('''
+            SELECT e.user_id, e.course_id, u.first_name || ' ' || u.last_name, c.name
+            FROM enrollments e
+            JOIN users u ON u.id = e.user_id
+            JOIN courses c ON c.id = e.course_id
+            WHERE u.role = 'STUDENT'
+        ''', ['student_id', 'course_id', 'name', 'course_name'])
+        assignments = frame('SELECT id, course_id, max_points, due_date FROM assignments',
+                            ['assignment_id', 'course_id', 'max_points', 'due_date'])
+        submissions = frame('''
+            SELECT assignment_id, student_id, grade, COALESCE(submitted_at, submission_date)
+            FROM submissions
+        ''', ['assignment_id', 'student_id', 'grade', 'submitted_at'])
+        return enrollments, assignments, submissions
+    
+    @staticmethod
+    def deadlines(assignments: pd.DataFrame) -> pd.Series:
+        """When each assignment becomes past due: a due date is a day, so the day after it starts."""
+        return pd.to_datetime(assignments['due_date'], errors='coerce', format='ISO8601') + pd.Timedelta(days=1)
+    
+    @classmethod
+    def compute(cls, enrollments: pd.DataFrame, assignments: pd.DataFrame, submissions: pd.DataFrame,
+                now: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        """Score every enrollment from the loaded tables; now defaults to the current time."""
+        import numpy as np
+        
+        now = pd.Timestamp.now() if now is None else now
+        # A due date is a day: work is late once that day is over
+        due = cls.deadlines(assignments)
+        past_due = (due <= now).to_numpy()
+        max_points = pd.to_numeric(assignments['max_points'], errors='coerce').to_numpy(dtype=float)
+        
+        # Look up each submission's assignment by position instead of a merge
+        index = pd.Index(assignments['assignment_id'])
+        position = index.get_indexer(submissions['assignment_id'])
+        known = position >= 0
+        position = position[known]
+        grade = pd.to_numeric(submissions['grade'], errors='coerce').to_numpy(dtype=float)[known]
+        points = max_points[position]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = np.where(points > 0, np.clip(grade / points, 0, 1), np.nan)
+        submitted = pd.to_datetime(submissions['submitted_at'], errors='coerce',
+                                   format='ISO8601').to_numpy()[known]
+        
+        per_submission = pd.DataFrame({
+            'student_id': submissions['student_id'].to_numpy()[known],
+            'course_id': assignments['course_id'].to_numpy()[position],
+            'ratio': ratio,
+            'late': submitted > due.to_numpy()[position],
+            'past_due': past_due[position],
+        })
+        per_pair = per_submission.groupby(['student_id', 'course_id']).agg(
+            submitted=('ratio', 'size'),
+            grade_ratio=('ratio', 'mean'),
+            late=('late', 'sum'),
+            past_due_submitted=('past_due', 'sum'),
+        )
+        due_per_course = pd.Series(past_due, index=assignments['course_id']).groupby(level=0).sum()
+        
+        scores = enrollments.join(per_pair, on=['student_id', 'course_id'])
+        scores['due'] = scores['course_id'].map(due_per_course).fillna(0).to_numpy()
+        for column in ('submitted', 'late', 'past_due_submitted'):
+            scores[column] = scores[column].fillna(0).astype(int)
+        
+        due_count = scores['due'].to_numpy(dtype=float)
+        missing = np.clip(due_count - scores['past_due_submitted'].to_numpy(), 0, None)
+        scores['missing'] = missing.astype(int)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores['missing_ratio'] = np.where(due_count > 0, missing / due_count, 0.0)
+            scores['late_ratio'] = np.where(scores['submitted'] > 0,
+                                            scores['late'] / scores['submitted'], 0.0)
+        # No graded work yet says nothing about grades; missing work is scored on its own
+        grade_shortfall = 1 - scores['grade_ratio'].fillna(1.0)
+        scores['risk_score'] = (cls.WEIGHTS['grade'] * grade_shortfall
+                                + cls.WEIGHTS['missing'] * scores['missing_ratio']
+                                + cls.WEIGHTS['late'] * scores['late_ratio'])
+        scores['at_risk'] = ((scores['grade_ratio'] < cls.GRADE_THRESHOLD)
+                             | (scores['missing_ratio'] >= cls.MISSING_THRESHOLD)
+                             | (scores['risk_score'] >= cls.SCORE_THRESHOLD))
+        return scores.drop(columns=['past_due_submitted'])
+
+
+# Shared engine for the teacher and coordinator risk views
+risk_engine = RiskEngine()
+
+
+def risk_tree(parent: tk.Misc, height: int = 12) -> ttk.Treeview:
+    """A Treeview with scrollbar, packed into parent, for rows from RiskEngine."""
+    columns = ("Estudante", "Disciplina", "Nota", "Faltando", "Atrasos", "Risco")
+    tree = ttk.Treeview(parent, columns=columns, show="headings", height=height)
+    for col in columns:
+        tree.heading(col, text=col)
+        tree.column(col, width=170 if col in ("Estudante", "Disciplina") else 80)
+    scrollbar = ttk.Scrollbar(parent, orient="vertical", command=tree.yview)
+    tree.configure(yscrollcommand=scrollbar.set)
+    tree.pack(side="left", fill="both", expand=True)
+    scrollbar.pack(side="right", fill="y")
+    return tree
+
+
+def fill_risk_tree(tree: ttk.Treeview, at_risk: pd.DataFrame):
+    """Show RiskEngine rows: grade as share of the points, missing and late work as counts."""
+    reconcile_tree(tree, ((f"{row.student_id}/{row.course_id}", (
+        row.name,
+        row.course_name,
+        "-" if pd.isna(row.grade_ratio) else f"{row.grade_ratio:.0%}",
+        f"{row.missing}/{row.due}",
+        f"{row.late}/{row.submitted}",
+        f"{row.risk_score:.2f}",
+    )) for row in at_risk.itertuples(index=False)))
+
+
+def show_risk_window(parent: tk.Misc, title: str, at_risk: pd.DataFrame):
+    """Toplevel listing at-risk student-course pairs, highest risk first."""
+    window = tk.Toplevel(parent)
+    window.title(title)
+    window.geometry("800x450")
+    window.transient(parent)
+    
+    tk.Label(window, text=title, font=("Arial", 14, "bold")).pack(pady=10)
+    tk.Label(window, text=f"Critérios: nota abaixo de {RiskEngine.GRADE_THRESHOLD:.0%} dos pontos, "
+                          f"{RiskEngine.MISSING_THRESHOLD:.0%} ou mais das atividades vencidas sem entrega, "
+                          f"ou risco combinado a partir de {RiskEngine.SCORE_THRESHOLD:.2f}",
+             font=("Arial", 9), fg="#7f8c8d", wraplength=760).pack()
+    
+    if at_risk.empty:
+        tk.Label(window, text="Nenhum estudante em risco encontrado nesta disciplina.",
+                 font=("Arial", 11)).pack(pady=30)
+        return
+    
+    frame = tk.Frame(window)
+    frame.pack(fill="both", expand=True, padx=20, pady=10)
+    fill_risk_tree(risk_tree(frame), at_risk)
+
+
+class SubmissionListing:
+    """Every enrolled student's submission for one assignment, with summary stats.
+    
+    One grouped query lists the students with their submission and, for
+    quizzes, the correct answers pre-aggregated per submission of that
+    assignment. CROSS JOIN keeps the course's enrollments as the outer loop;
+    otherwise SQLite walks every student in name order to skip the sort.
+    The listing and its summary (submitted, graded, missing, mean and median
+    grade) are cached per assignment until change_counters shows a write to
+    one of TABLES; the MAX_CACHED most recently viewed assignments are kept.
+    
+    One listing serves one database; the shared submission_listing serves db.
+    """
+    
+    TABLES = ('users', 'enrollments', 'assignments', 'submissions', 'quiz_questions', 'quiz_answers')
+    MAX_CACHED = 32
+    
+    ROWS = '''
+        SELECT u.id, u.first_name || ' ' || u.last_name AS name,
+               s.submitted_at, s.grade, s.id AS submission_id, qa.correct_answers
+        FROM enrollments e
+        CROSS JOIN users u ON u.id = e.user_id
+        LEFT JOIN submissions s ON s.student_id = e.user_id AND s.assignment_id = :assignment_id
+        LEFT JOIN (
+            SELECT qa.submission_id, SUM(qa.is_correct = 1) AS correct_answers
+            FROM submissions s
+            JOIN quiz_answers qa ON qa.submission_id = s.id
+            WHERE s.assignment_id = :assignment_id
+            GROUP BY qa.submission_id
+        ) qa ON qa.submission_id = s.id
+        WHERE e.course_id = :course_id AND u.role = 'STUDENT'
+        ORDER BY u.first_name, u.last_name
+    '''
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cache = {}
+    
+    def get(self, cursor, assignment_id: int):
+        """(assignment type, total quiz questions, rows, summary), from cache if nothing changed.
+        
+        rows are (student_id, name, submitted_at, grade, submission_id,
+        correct_answers); correct_answers is None outside quizzes.
+        """
+        with self._lock:
+            counters = change_counters(cursor, self.TABLES)
+            cached = self._cache.pop(assignment_id, None)
+            if cached is None or cached[0] != counters:
+                cached = (counters, self.load(cursor, assignment_id))
+            # Reinserting keeps the dict in least-recently-viewed order
+            self._cache[assignment_id] = cached
+            while len(self._cache) > self.MAX_CACHED:
+                del self._cache[next(iter(self._cache))]
+            return cached[1]
+    
+    @classmethod
+    def load(cls, cursor, assignment_id: int):
+        """Read the listing without the cache; same result as get()."""
+        cursor.execute('''
+            SELECT course_id, type, (SELECT COUNT(*) FROM quiz_questions WHERE assignment_id = a.id)
+            FROM assignments a WHERE id = ?
+        ''', (assignment_id,))
+        course_id, assignment_type, total_questions = cursor.fetchone()
+        cursor.execute(cls.ROWS, {'assignment_id': assignment_id, 'course_id': course_id})
+        rows = cursor.fetchall()
+        return assignment_type, total_questions, rows, cls.summarize(rows)
+    
+    @staticmethod
+    def summarize(rows) -> Dict[str, Any]:
+        """enrolled, submitted, graded and missing counts, mean and median grade (None if ungraded).
+        
+        A row counts as submitted when it has a submission, including grades
+        the teacher entered in the grade grid, which have no submitted_at.
+        """
+        import statistics
+        
+        grades = [row[3] for row in rows if row[4] is not None and row[3] is not None]
+        submitted = sum(1 for row in rows if row[4] is not None)
+        return {
+            'enrolled': len(rows),
+            'submitted': submitted,
+            'graded': len(grades),
+            'missing': len(rows) - submitted,
+            'mean': statistics.mean(grades) if grades else None,
+            'median': statistics.median(grades) if grades else None,
+        }
+
+
+# Shared listing cache for the teacher's submissions window
+submission_listing = SubmissionListing()
+
+
+class StudentDashboard:
+    """Everything StudentFrame shows for one student, read as one snapshot and cached per student.
+    
+    load() reads the courses, the assignments, the class and the newest
+    page of announcements with the inbox state inside a single DEFERRED
+    read transaction, so the sections always agree with each other. get()
+    keeps the last snapshot of the MAX_CACHED most recent students until
+    change_counters shows a write to one of TABLES. PRAGMA data_version
+    (plus the connection's own total_changes) tells whether anything was
+    committed since the counters were last read on that connection, so
+    raising the dashboard again with nothing changed reads no table at all.
+    
+    One dashboard serves one database; the shared student_dashboard serves db.
+    """
+    
+    TABLES = ('users', 'courses', 'enrollments', 'assignments', 'submissions', 'classes',
+              'student_classes', 'announcements', 'announcement_inbox')
+    MAX_CACHED = 8
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cache = {}
+        self._local = threading.local()  # (connection, data version, counters) last seen by this thread
+    
+    def get(self, cursor, student_id: int, limit: int = 30) -> Dict[str, Any]:
+        """The student's snapshot, from cache if nothing it depends on changed.
+        
+        A cache hit returns the very same dict, so callers can skip
+        redrawing with an identity check.
+        """
+        with self._lock:
+            counters = self._counters(cursor)
+            cached = self._cache.pop(student_id, None)
+            if cached is None or cached[:2] != (counters, limit):
+                cached = self.load(cursor, student_id, limit)
+            # Reinserting keeps the dict in least-recently-viewed order
+            self._cache[student_id] = cached
+            while len(self._cache) > self.MAX_CACHED:
+                del self._cache[next(iter(self._cache))]
+            return cached[2]
+    
+    def _counters(self, cursor) -> tuple:
+        conn = cursor.connection
+        cursor.execute('PRAGMA data_version')
+        version = (cursor.fetchone()[0], conn.total_changes)
+        seen = getattr(self._local, 'seen', None)
+        if seen is not None and seen[0] is conn and seen[1] == version:
+            return seen[2]
+        counters = change_counters(cursor, self.TABLES)
+        self._local.seen = (conn, version, counters)
+        return counters
+    
+    @classmethod
+    def load(cls, cursor, student_id: int, limit: int = 30) -> tuple:
+        """(counters, limit, snapshot) read in one transaction, without the cache.
+        
+        snapshot has 'courses' and 'assignments' as StudentFrame.fetch_courses
+        and fetch_assignments return them, and 'notifications' as
+        StudentFrame.fetch_notifications does.
+        """
+        conn = cursor.connection
+        own = not conn.in_transaction
+        if own:
+            cursor.execute('BEGIN DEFERRED')
+        try:
+            counters = change_counters(cursor, cls.TABLES)
+            snapshot = {
+                'courses': StudentFrame.fetch_courses(cursor, student_id),
+                'assignments': StudentFrame.fetch_assignments(cursor, student_id),
+                'notifications': StudentFrame.fetch_notifications(cursor, student_id, limit),
+            }
+        finally:
+            if own:
+                conn.commit()
+        return counters, limit, snapshot
+
+
+student_dashboard = StudentDashboard()
+
+
+# Question fields in quiz bank files and in pool_questions/quiz_questions
+QUIZ_BANK_FIELDS = ('question_text', 'option_a', 'option_b', 'option_c', 'option_d', 'correct_answer', 'points')
+
+
+def validate_question(question: Dict[str, Any], number: int) -> tuple:
+    """Return a question as a QUIZ_BANK_FIELDS tuple, or raise ValueError naming question number."""
+    values = []
+    for field in QUIZ_BANK_FIELDS[:-2]:
+        text = str(question.get(field) or '').strip()
+        if not text:
+            raise ValueError(f"Questão {number}: campo '{field}' vazio ou ausente")
+        values.append(text)
+    answer = str(question.get('correct_answer') or '').strip().upper()
+    if answer not in ('A', 'B', 'C', 'D'):
+        raise ValueError(f"Questão {number}: correct_answer deve ser A, B, C ou D")
+    try:
+        points = int(question.get('points') or 1)
+    except (TypeError, ValueError):
+        raise ValueError(f"Questão {number}: points deve ser um número inteiro")
+    if points <= 0:
+        raise ValueError(f"Questão {number}: points deve ser positivo")
+    return tuple(values) + (answer, points)
+
+
+def read_question_file(path: str) -> List[tuple]:
+    """Read and validate questions from a .json or .csv quiz bank file.
+    
+    JSON is a list of objects (or {"questions": [...]}) and CSV has a header
+    row, both with the QUIZ_BANK_FIELDS names; points defaults to 1.
+    """
+    import csv
+    import json
+    
+    if path.lower().endswith('.json'):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        questions = data.get('questions', []) if isinstance(data, dict) else data
+    elif path.lower().endswith('.csv'):
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            questions = list(csv.DictReader(f))
+    else:
+        raise ValueError("Formato não suportado: use um arquivo .json ou .csv")
+    if not isinstance(questions, list) or not all(isinstance(q, dict) for q in questions):
+        raise ValueError("O arquivo deve conter uma lista de questões")
+    return [validate_question(question, number) for number, question in enumerate(questions, 1)]
+
+
+def write_question_file(path: str, questions: List[tuple]):
+    """Write QUIZ_BANK_FIELDS tuples as .json or .csv, the formats read_question_file() reads."""
+    import csv
+    import json
+    
+    if path.lower().endswith('.csv'):
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(QUIZ_BANK_FIELDS)
+            writer.writerows(questions)
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'questions': [dict(zip(QUIZ_BANK_FIELDS, q)) for q in questions]},
+                      f, ensure_ascii=False, indent=2)
+
+
+def import_question_pool(cursor, course_id: int, name: str, questions: List[tuple]) -> int:
+    """Add questions to the course's pool called name, creating it if needed; return the pool id.
+    
+    Run inside a write transaction; the questions go in with one executemany.
+    """
+    cursor.execute('INSERT OR IGNORE INTO question_pools (course_id, name) VALUES (?, ?)', (course_id, name))
+    cursor.execute('SELECT id FROM question_pools WHERE course_id = ? AND name = ?', (course_id, name))
+    pool_id = cursor.fetchone()[0]
+    cursor.executemany(f'''
+        INSERT INTO pool_questions (pool_id, {', '.join(QUIZ_BANK_FIELDS)})
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [(pool_id,) + tuple(question) for question in questions])
+    return pool_id
+
+
+def export_question_pool(cursor, pool_id: int) -> List[tuple]:
+    """The pool's questions as QUIZ_BANK_FIELDS tuples, in insertion order."""
+    cursor.execute(f'''
+        SELECT {', '.join(QUIZ_BANK_FIELDS)} FROM pool_questions WHERE pool_id = ? ORDER BY id
+    ''', (pool_id,))
+    return cursor.fetchall()
+
+
+def fetch_question_pools(cursor, course_id: int) -> List[tuple]:
+    """(id, name, question count, total points) of the course's pools."""
+    cursor.execute('''
+        SELECT p.id, p.name, COUNT(q.id), COALESCE(SUM(q.points), 0)
+        FROM question_pools p
+        LEFT JOIN pool_questions q ON q.pool_id = p.id
+        WHERE p.course_id = ?
+        GROUP BY p.id
+        ORDER BY p.name
+    ''', (course_id,))
+    return cursor.fetchall()
+
+
+def create_quiz_from_pool(cursor, pool_id: int, course_ids: List[int], title: str, due_date: str,
+                          description: str = '', count: Optional[int] = None,
+                          seed: Optional[int] = None) -> List[int]:
+    """Create the same quiz in every course of course_ids from a pool; return the assignment ids.
+    
+    count picks that many questions at random (seed makes the pick
+    repeatable); every section gets the same pick. Each quiz's questions are
+    copied with a single INSERT ... SELECT, and max_points is their total.
+    Run inside a write transaction, so either every section gets its quiz
+    or none does.
+    """
+    import json
+    import random
+    
+    cursor.execute('SELECT id FROM pool_questions WHERE pool_id = ? ORDER BY id', (pool_id,))
+    question_ids = [row[0] for row in cursor.fetchall()]
+    if not question_ids:
+        raise ValueError("O banco de questões está vazio")
+    if count is not None:
+        if not 0 < count <= len(question_ids):
+            raise ValueError(f"Escolha entre 1 e {len(question_ids)} questões")
+        question_ids = sorted(random.Random(seed).sample(question_ids, count))
+    picked = json.dumps(question_ids)
+    cursor.execute('''
+        SELECT SUM(points) FROM pool_questions WHERE id IN (SELECT value FROM json_each(?))
+    ''', (picked,))
+    max_points = cursor.fetchone()[0]
+    
+    assignment_ids = []
+    for course_id in course_ids:
+        cursor.execute('''
+            INSERT INTO assignments (course_id, title, description, due_date, max_points, type)
+            VALUES (?, ?, ?, ?, ?, 'quiz')
+        ''', (course_id, title, description, due_date, max_points))
+        assignment_id = cursor.lastrowid
+        cursor.execute(f'''
+            INSERT INTO quiz_questions (assignment_id, {', '.join(QUIZ_BANK_FIELDS)})
+            SELECT ?, {', '.join(QUIZ_BANK_FIELDS)} FROM pool_questions
+            WHERE id IN (SELECT value FROM json_each(?))
+            ORDER BY id
+        ''', (assignment_id, picked))
+        assignment_ids.append(assignment_id)
+    return assignment_ids
+
+
+def regrade_quiz(cursor, assignment_id: int, key_changes: Dict[int, Dict[str, Any]]) -> Dict[str, int]:
+    """Apply answer-key fixes to a quiz and recompute every affected answer and grade.
+    
+    key_changes maps question id to the new 'correct_answer' and/or
+    'points'. The key, quiz_answers.is_correct and submissions.grade are each
+    updated by one set-based UPDATE ... FROM, with grades recomputed the way
+    StudentFrame.grade_quiz does: points of correct answers over points of
+    all the quiz's questions, scaled to max_points. Only submissions with
+    quiz answers are regraded, so grades entered by the teacher stay. Run
+    inside a write transaction. Returns counts of changed questions,
+    answers and grades.
+    """
+    import json
+    
+    changes = []
+    for question_id, change in key_changes.items():
+        answer = change.get('correct_answer')
+        if answer is not None:
+            answer = str(answer).strip().upper()
+            if answer not in ('A', 'B', 'C', 'D'):
+                raise ValueError(f"Questão {question_id}: a resposta correta deve ser A, B, C ou D")
+        points = change.get('points')
+        if points is not None and int(points) < 0:
+            raise ValueError(f"Questão {question_id}: a pontuação não pode ser negativa")
+        changes.append({'id': int(question_id), 'correct_answer': answer,
+                        'points': None if points is None else int(points)})
+    
+    cursor.execute('''
+        UPDATE quiz_questions
+        SET correct_answer = COALESCE(c.correct_answer, quiz_questions.correct_answer),
+            points = COALESCE(c.points, quiz_questions.points)
+        FROM (
+            SELECT json_extract(value, '$.id') AS id,
+                   json_extract(value, '$.correct_answer') AS correct_answer,
+                   json_extract(value, '$.points') AS points
+            FROM json_each(?)
+        ) c
+        WHERE quiz_questions.id = c.id AND quiz_questions.assignment_id = ?
+          AND (quiz_questions.correct_answer IS NOT COALESCE(c.correct_answer, quiz_questions.correct_answer)
+               OR quiz_questions.points IS NOT COALESCE(c.points, quiz_questions.points))
+    ''', (json.dumps(changes), assignment_id))
+    questions = cursor.rowcount
+    
+    cursor.execute('''
+        UPDATE quiz_answers SET is_correct = (quiz_answers.selected_answer = q.correct_answer)
+        FROM submissions s, quiz_questions q
+        WHERE s.assignment_id = ? AND quiz_answers.submission_id = s.id AND q.id = quiz_answers.question_id
+          AND quiz_answers.is_correct IS NOT (quiz_answers.selected_answer = q.correct_answer)
+    ''', (assignment_id,))
+    answers = cursor.rowcount
+    
+    cursor.execute('''
+        UPDATE submissions SET grade = g.grade
+        FROM (
+            SELECT s.id AS submission_id,
+                   CASE WHEN SUM(q.points) > 0
+                        THEN CAST(SUM(CASE WHEN qa.is_correct THEN q.points ELSE 0 END) AS REAL)
+                             / SUM(q.points) * a.max_points
+                        ELSE 0 END AS grade
+            FROM submissions s
+            JOIN assignments a ON a.id = s.assignment_id
+            JOIN quiz_questions q ON q.assignment_id = s.assignment_id
+            LEFT JOIN quiz_answers qa ON qa.submission_id = s.id AND qa.question_id = q.id
+            WHERE s.assignment_id = ?
+              AND EXISTS (SELECT 1 FROM quiz_answers answered WHERE answered.submission_id = s.id)
+            GROUP BY s.id
+        ) g
+        WHERE submissions.id = g.submission_id
+          AND (submissions.grade IS NULL OR ABS(submissions.grade - g.grade) > 1e-9)
+    ''', (assignment_id,))
+    grades = cursor.rowcount
+    return {'questions': questions, 'answers': answers, 'grades': grades}
+
+
+BLOB_CHUNK_SIZE = 1024 * 1024
+# How long an unreferenced blob file is kept before BlobStore.sweep removes it;
+# longer than any upload takes from put() to its committed blobs row
+BLOB_SWEEP_GRACE_SECONDS = 24 * 3600
+
+
+class BlobStore:
+    """Content-addressed files on disk, each stored once under its SHA-256.
+    
+    A blob lives at root/ab/abcdef..., named by the hex digest of its bytes.
+    put() streams the source in BLOB_CHUNK_SIZE chunks into a temporary file
+    while hashing, then renames it into place, so a half-written upload never
+    appears under a real name and identical files (in any course) end up as
+    one blob. Reads are streamed the same way. The blobs table records what
+    is stored; course_materials and submission_attachments rows point at it.
+    
+    Files are never removed inline: another client may have just put() the
+    same content and not yet committed its blobs row. sweep() removes the
+    files without a row once they are older than BLOB_SWEEP_GRACE_SECONDS,
+    and put() refreshes the time of a file it finds already stored.
+    
+    progress, where accepted, is called with the bytes copied so far.
+    """
+    
+    def __init__(self, root: str):
+        self.root = root
+    
+    def path(self, sha256: str) -> str:
+        return os.path.join(self.root, sha256[:2], sha256)
+    
+    def put(self, source_path: str, progress=None) -> tuple:
+        """Store the file at source_path; return (sha256, size)."""
+        import hashlib
+        import tempfile
+        
+        os.makedirs(self.root, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, temp_path = tempfile.mkstemp(dir=self.root, suffix='.part')
+        try:
+            with open(source_path, 'rb') as source, os.fdopen(fd, 'wb') as target:
+                while True:
+                    chunk = source.read(BLOB_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    target.write(chunk)
+                    size += len(chunk)
+                    if progress is not None:
+                        progress(size)
+            sha256 = digest.hexdigest()
+            final_path = self.path(sha256)
+            if os.path.exists(final_path):
+                os.remove(temp_path)  # Already stored; in use again, so sweep() must wait
+                os.utime(final_path)
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.replace(temp_path, final_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return sha256, size
+    
+    def copy_to(self, sha256: str, target_path: str, progress=None) -> int:
+        """Write the blob to target_path in chunks; return the bytes written."""
+        size = 0
+        with open(self.path(sha256), 'rb') as source, open(target_path, 'wb') as target:
+            while True:
+                chunk = source.read(BLOB_CHUNK_SIZE)
+                if not chunk:
+                    break
+                target.write(chunk)
+                size += len(chunk)
+                if progress is not None:
+                    progress(size)
+        return size
+    
+    def sweep(self, referenced, grace: float = BLOB_SWEEP_GRACE_SECONDS) -> int:
+        """Delete blob files not in referenced, and leftover .part files, older than grace seconds.
+        
+        referenced must be read before the sweep starts. Returns the number
+        of files deleted.
+        """
+        if not os.path.isdir(self.root):
+            return 0
+        cutoff = time.time() - grace
+        removed = 0
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                if name in referenced:
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    if os.stat(path).st_mtime < cutoff:
+                        os.remove(path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+
+# Shared store next to the shared database
+blob_store = BlobStore(BLOB_DIR)
+
+
+def sweep_blobs(database, store: BlobStore) -> int:
+    """Remove the store's files that no blobs row refers to; returns how many were deleted."""
+    with database.cursor() as cursor:
+        cursor.execute('SELECT sha256 FROM blobs')
+        referenced = {row[0] for row in cursor.fetchall()}
+    return store.sweep(referenced)
+
+
+def fetch_course_materials(cursor, course_id: int, kind: str) -> List[tuple]:
+    """(id, title, body, blob_sha256, filename, size, created_at) of the course's materials of one kind."""
+    cursor.execute('''
+        SELECT m.id, m.title, m.body, m.blob_sha256, m.filename, b.size, m.created_at
+        FROM course_materials m
+        LEFT JOIN blobs b ON b.sha256 = m.blob_sha256
+        WHERE m.course_id = ? AND m.kind = ?
+        ORDER BY m.id
+    ''', (course_id, kind))
+    return cursor.fetchall()
+
+
+def add_course_material(cursor, course_id: int, kind: str, title: str, body: Optional[str] = None,
+                        blob: Optional[tuple] = None, filename: Optional[str] = None) -> int:
+    """Insert a material, registering blob (sha256, size from BlobStore.put) if given; return its id."""
+    if blob is not None:
+        cursor.execute('INSERT OR IGNORE INTO blobs (sha256, size) VALUES (?, ?)', blob)
+    cursor.execute('''
+        INSERT INTO course_materials (course_id, kind, title, body, blob_sha256, filename)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (course_id, kind, title, body, blob[0] if blob else None, filename))
+    return cursor.lastrowid
+
+
+def save_course_text(cursor, course_id: int, kind: str, title: str, body: str):
+    """Replace the course's single syllabus or resources text."""
+    cursor.execute('DELETE FROM course_materials WHERE course_id = ? AND kind = ?', (course_id, kind))
+    add_course_material(cursor, course_id, kind, title, body)
+
+
+def delete_course_material(cursor, material_id: int) -> Optional[str]:
+    """Delete a material; return its blob's sha256 if no other material uses it anymore.
+    
+    The orphaned blobs row is removed here; its file is left to BlobStore.sweep().
+    """
+    cursor.execute('SELECT blob_sha256 FROM course_materials WHERE id = ?', (material_id,))
+    row = cursor.fetchone()
+    cursor.execute('DELETE FROM course_materials WHERE id = ?', (material_id,))
+    sha256 = row[0] if row else None
+    if sha256 is None or not release_blob(cursor, sha256):
+        return None
+    return sha256
+
+
+def release_blob(cursor, sha256: str) -> bool:
+    """Remove the blobs row of sha256 unless a material or attachment still uses it.
+    
+    Returns True when nothing refers to the blob anymore. The file stays
+    until BlobStore.sweep(), in case another client is storing it again.
+    """
+    cursor.execute('''
+        DELETE FROM blobs WHERE sha256 = :sha256
+        AND NOT EXISTS (SELECT 1 FROM course_materials WHERE blob_sha256 = :sha256)
+        AND NOT EXISTS (SELECT 1 FROM submission_attachments WHERE blob_sha256 = :sha256)
+    ''', {'sha256': sha256})
+    if cursor.rowcount:
+        return True
+    # Left in place only while referenced; no row at all means nothing was committed for it
+    cursor.execute('SELECT 1 FROM blobs WHERE sha256 = ?', (sha256,))
+    return cursor.fetchone() is None
+
+
+def add_submission_attachment(cursor, submission_id: int, blob: tuple, filename: str) -> int:
+    """Attach blob (sha256, size from BlobStore.put) to a submission; return the attachment id."""
+    cursor.execute('INSERT OR IGNORE INTO blobs (sha256, size) VALUES (?, ?)', blob)
+    cursor.execute('''
+        INSERT INTO submission_attachments (submission_id, blob_sha256, filename) VALUES (?, ?, ?)
+    ''', (submission_id, blob[0], filename))
+    return cursor.lastrowid
+
+
+def fetch_submission_attachments(cursor, submission_id: int) -> List[tuple]:
+    """(id, filename, blob_sha256, size, created_at) of the files attached to a submission."""
+    cursor.execute('''
+        SELECT a.id, a.filename, a.blob_sha256, b.size, a.created_at
+        FROM submission_attachments a
+        JOIN blobs b ON b.sha256 = a.blob_sha256
+        WHERE a.submission_id = ?
+        ORDER BY a.id
+    ''', (submission_id,))
+    return cursor.fetchall()
+
+
+def format_size(size: Optional[int]) -> str:
+    """Human-readable byte count, e.g. '1.5 MB'."""
+    if size is None:
+        return ""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+# Per tree, the values reconcile_tree last gave each row, as text, so a refresh
+# recognizes unchanged rows without asking Tk for them. Code that inserts or
+# rewrites rows of such a tree itself records them here too (see
+# PagedTreeview._show_page); rows without an entry are read back from Tk once.
+_tree_values = weakref.WeakKeyDictionary()
+
+
+def _values_text(values) -> tuple:
+    # Tk hands values back as strings or numbers, so compare as text
+    return tuple(str(value) for value in values)
+
+
+def _top_row(tree: ttk.Treeview, children) -> Optional[str]:
+    """The top-level item at the top of the view, from yview() so the heading row doesn't matter."""
+    if not children:
+        return None
+    return children[min(int(round(tree.yview()[0] * len(children))), len(children) - 1)]
+
+
+def _rows_in_order(iids: List[str], target: Dict[str, int]) -> set:
+    """The most iids that can stay where they are: a longest run whose target positions increase."""
+    import bisect
+    
+    tails, tail_rows, previous = [], [], []
+    for row, iid in enumerate(iids):
+        length = bisect.bisect_left(tails, target[iid])
+        if length == len(tails):
+            tails.append(target[iid])
+            tail_rows.append(row)
+        else:
+            tails[length] = target[iid]
+            tail_rows[length] = row
+        previous.append(tail_rows[length - 1] if length else None)
+    keep = set()
+    row = tail_rows[-1] if tail_rows else None
+    while row is not None:
+        keep.add(iids[row])
+        row = previous[row]
+    return keep
+
+
+def reconcile_tree(tree: ttk.Treeview, items) -> tuple:
+    """Make tree's top-level items equal items, an iterable of (iid, values), with minimal Tk calls.
+    
+    Rows are matched by iid, normally the primary key: vanished rows are
+    deleted, new ones inserted, changed values rewritten and moved rows
+    moved; rows that did not change are not touched at all, and their
+    values are compared with what the last call wrote instead of being read
+    back from Tk. Only rows out of order relative to the others are moved.
+    Selected items that survive stay selected, and the row at the top of
+    the view stays there. Returns (inserted, updated, deleted).
+    """
+    items = [(str(iid), tuple(values)) for iid, values in items]
+    target = {iid: index for index, (iid, _) in enumerate(items)}
+    texts = {iid: _values_text(values) for iid, values in items}
+    known = _tree_values.get(tree, {})
+    
+    children = tree.get_children()
+    stale = [iid for iid in children if iid not in target]
+    current = [iid for iid in children if iid in target]
+    keep = _rows_in_order(current, target)
+    movers = [iid for iid in current if iid not in keep]
+    inserted = len(items) - len(current)
+    anchor = _top_row(tree, children) if stale or movers or inserted else None
+    
+    if stale:
+        tree.delete(*stale)
+    updated = 0
+    for iid in current:
+        old = known.get(iid)
+        if old is None:
+            old = _values_text(tree.item(iid, 'values'))
+        if old != texts[iid]:
+            tree.item(iid, values=items[target[iid]][1])
+            updated += 1
+    
+    if movers or inserted:
+        # With the movers detached, every row left is in order, so placing the
+        # rest by ascending target position puts each at its final index
+        selected = set(tree.selection()).intersection(movers) if movers else ()
+        if movers:
+            tree.detach(*movers)
+        present = set(current)
+        for index, (iid, values) in enumerate(items):
+            if iid in keep:
+                continue
+            if iid in present:
+                tree.move(iid, "", index)
+            else:
+                tree.insert("", index, iid=iid, values=values)
+        if selected:
+            tree.selection_add(*selected)
+    _tree_values[tree] = texts
+    
+    if anchor in target:
+        tree.yview_moveto(target[anchor] / len(items))
+    return inserted, updated, len(stale)
+
+
+class KeysetQuery:
+    """A SELECT read one page at a time, positioned by the last row seen instead of OFFSET.
+    
+    sql must contain three placeholders: {sort_values} at the end of the
+    select list, {keyset} as a WHERE condition and {order} after ORDER BY.
+    sorts maps a column heading to the SQL expressions it sorts by; key is
+    appended to every sort as the tie-breaker and must identify a result row.
+    All of them must be NOT NULL (wrap nullable columns in COALESCE), since
+    a row-value comparison with NULL drops the row. Each page costs an index
+    seek to the previous page's last row, so page 500 is as cheap as page 1;
+    the first expression is also bounded on its own, because SQLite seeks an
+    expression index by a plain comparison but not by a row value.
+    """
+    
+    def __init__(self, sql: str, sorts: Dict[str, tuple], key: tuple, default_sort: str):
+        self.sql = sql
+        self.sorts = sorts
+        self.key = key
+        self.default_sort = default_sort
+    
+    def render(self, sort: str, descending: bool = False, after: bool = False,
+               backwards: bool = False) -> str:
+        """SQL for one page; backwards reads the rows before the position instead of after it."""
+        expressions = self.sorts[sort] + self.key
+        flip = descending != backwards
+        keyset = '1'
+        if after:
+            bounds = ', '.join(f':_k{i}' for i in range(len(expressions)))
+            keyset = (f"{expressions[0]} {'<=' if flip else '>='} :_k0 AND "
+                      f"({', '.join(expressions)}) {'<' if flip else '>'} ({bounds})")
+        order = ', '.join(f"{e} {'DESC' if flip else 'ASC'}" for e in expressions)
+        return self.sql.format(sort_values=', '.join(expressions), keyset=keyset, order=order) + ' LIMIT :_limit'
+    
+    def page(self, cursor, params: Dict[str, Any], sort: Optional[str] = None, descending: bool = False,
+             after: Optional[tuple] = None, backwards: bool = False, limit: int = 100):
+        """Return (rows, positions) for up to limit rows after (or before) position after.
+        
+        rows hold the displayed columns; positions hold each row's sort values
+        and key, to pass back as after for the next page.
+        """
+        sort = sort or self.default_sort
+        width = len(self.sorts[sort]) + len(self.key)
+        bound = dict(params, _limit=limit)
+        if after is not None:
+            bound.update((f'_k{i}', value) for i, value in enumerate(after))
+        cursor.execute(self.render(sort, descending, after is not None, backwards), bound)
+        rows = cursor.fetchall()
+        if backwards:
+            rows.reverse()
+        return [row[:-width] for row in rows], [row[-width:] for row in rows]
+
+
+class PagedTreeview:
+    """Shows a KeysetQuery in a ttk.Treeview while keeping only a window of it in Tk.
+    
+    Pages are fetched through db_worker when the view scrolls near either
+    end of what is loaded. Beyond max_pages the page at the far end is
+    dropped and read again if the user scrolls back, so a 20k-row result
+    never holds more than a few hundred items. Clicking a heading re-sorts
+    in SQL. Item iids are the rows' keys joined with '/', so selections map
+    back to database rows. Loading the same query and params again re-reads
+    the loaded window and reconciles it, keeping selection and scroll.
+    """
+    
+    PREFETCH = 0.1  # fetch when the visible part is this close to an end
+    
+    def __init__(self, tree: ttk.Treeview, scrollbar: ttk.Scrollbar, worker_key: str,
+                 page_size: int = 100, max_pages: int = 4, indicator: Optional[tk.Label] = None):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.worker_key = worker_key
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.indicator = indicator
+        self.query = None
+        self.params = {}
+        self.format_row = tuple
+        self.sort = None
+        self.descending = False
+        self._pages = deque()  # [(iids, first position, last position)]
+        self._start = None  # position just before the first loaded row; None at the top
+        self._at_start = self._at_end = True
+        self._fetching = False
+        tree.configure(yscrollcommand=self._on_scroll)
+    
+    def load(self, query: KeysetQuery, params: Dict[str, Any], format_row=tuple):
+        """Show query with params; format_row maps a row to the item values.
+        
+        A different query or params starts from the top; the same ones
+        refresh what is on screen.
+        """
+        if query is not self.query:
+            self.sort, self.descending = query.default_sort, False
+            for column in self.tree['columns']:
+                self.tree.heading(column, command=(lambda c=column: self.sort_by(c))
+                                  if column in query.sorts else '')
+        same = query is self.query and params == self.params
+        self.query, self.params, self.format_row = query, params, format_row
+        if same and self._pages:
+            self.refresh()
+        else:
+            self.reload()
+    
+    def reload(self):
+        """Drop every loaded page and fetch the first one again."""
+        self._pages.clear()
+        self._start = None
+        self._at_start, self._at_end = True, False
+        self._fetching = False  # a pending fetch is superseded by the one below
+        self.tree.delete(*self.tree.get_children())
+        self._fetch(None, False, self.page_size, lambda page: self._show_page(page, False))
+    
+    def refresh(self):
+        """Re-read the loaded rows in one query and apply only what changed."""
+        loaded = max(sum(len(page[0]) for page in self._pages), self.page_size)
+        self._fetching = False
+        self._fetch(self._start, False, loaded, lambda page: self._show_refresh(page, loaded))
+    
+    def sort_by(self, column: str):
+        """Sort by column, toggling the direction when it is already the sort column."""
+        self.descending = not self.descending if column == self.sort else False
+        self.sort = column
+        self.reload()
+    
+    def _fetch(self, after, backwards, limit, on_done):
+        query, params, sort, descending = self.query, self.params, self.sort, self.descending
+        self._fetching = True
+        db_worker.submit(self.worker_key,
+                         lambda cursor: query.page(cursor, params, sort, descending, after, backwards, limit),
+                         on_done, indicator=self.indicator, on_error=self._fetch_failed)
+    
+    def _fetch_failed(self, error):
+        self._fetching = False
+        messagebox.showerror("Erro", f"Falha ao carregar dados: {error}")
+    
+    def _iid(self, position) -> str:
+        return '/'.join(str(value) for value in position[-len(self.query.key):])
+    
+    def _show_page(self, page, backwards):
+        self._fetching = False
+        rows, positions = page
+        if backwards:
+            # One extra row was read so the window keeps the position before it
+            if len(rows) > self.page_size:
+                self._start = positions[0]
+                rows, positions = rows[1:], positions[1:]
+            else:
+                self._start = None
+                self._at_start = True
+        elif len(rows) < self.page_size:
+            self._at_end = True
+        if not rows:
+            return
+        
+        anchor = self._top_item()
+        known = _tree_values.setdefault(self.tree, {})
+        iids = []
+        for row, position in zip(rows, positions):
+            iid = self._iid(position)
+            if self.tree.exists(iid):
+                continue  # moved across the page boundary by a concurrent edit
+            values = self.format_row(row)
+            self.tree.insert("", len(iids) if backwards else "end", iid=iid, values=values)
+            known[iid] = _values_text(values)
+            iids.append(iid)
+        
+        page_entry = (iids, positions[0], positions[-1])
+        if backwards:
+            self._pages.appendleft(page_entry)
+        else:
+            self._pages.append(page_entry)
+        
+        if len(self._pages) > self.max_pages:
+            if backwards:
+                dropped = self._pages.pop()
+                self._at_end = False
+            else:
+                dropped = self._pages.popleft()
+                self._start = dropped[2]
+                self._at_start = False
+            self.tree.delete(*dropped[0])
+        self._restore_top(anchor)
+    
+    def _show_refresh(self, page, limit):
+        self._fetching = False
+        rows, positions = page
+        iids = [self._iid(position) for position in positions]
+        reconcile_tree(self.tree, zip(iids, map(self.format_row, rows)))
+        
+        self._pages.clear()
+        for start in range(0, len(rows), self.page_size):
+            end = min(start + self.page_size, len(rows))
+            self._pages.append((iids[start:end], positions[start], positions[end - 1]))
+        self._at_end = len(rows) < limit
+    
+    def _top_item(self) -> Optional[str]:
+        return _top_row(self.tree, self.tree.get_children())
+    
+    def _restore_top(self, anchor: Optional[str]):
+        # Inserting or deleting above the view shifts it; keep the same row on top
+        if anchor is None or not self.tree.exists(anchor):
+            return
+        total = len(self.tree.get_children())
+        if total:
+            self.tree.yview_moveto(self.tree.index(anchor) / total)
+    
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if self._fetching or self.query is None or not self._pages:
+            return
+        if float(last) >= 1 - self.PREFETCH and not self._at_end:
+            self._fetch(self._pages[-1][2], False, self.page_size,
+                        lambda page: self._show_page(page, False))
+        elif float(first) <= self.PREFETCH and not self._at_start:
+            self._fetch(self._pages[0][1], True, self.page_size + 1,
+                        lambda page: self._show_page(page, True))
+
+
+class AnnouncementFeed:
+    """Announcement cards on a Canvas, with Tk widgets only for the ones in view.
     
-    # Add content and submitted_at columns to submissions table if they don't exist
-    try:
-        cursor.execute('ALTER TABLE submissions ADD COLUMN content TEXT')
-    except sqlite3.OperationalError:
-        pass  # Column already exists
+    Every card is CARD_HEIGHT pixels tall, so the scrollregion can span all
+    loaded announcements while a small pool of card frames is moved onto the
+    visible slots and refilled as the feed scrolls; a long feed costs the
+    same widgets as a short one. Rows (id, title, content, priority,
+    created_at) come from a KeysetQuery read newest first, one page at a
+    time through db_worker, when the view nears the last loaded card, and
+    newer ones can be added on top with prepend(). Long texts are cut to
+    fit; clicking a card shows the whole announcement.
+    """
+    
+    CARD_HEIGHT = 150
+    CONTENT_CHARS = 220
+    PREFETCH_CARDS = 5  # fetch when the view is this close to the last loaded card
+    
+    def __init__(self, parent: tk.Misc, worker_key: str, page_size: int = 30,
+                 indicator: Optional[tk.Label] = None):
+        self.worker_key = worker_key
+        self.page_size = page_size
+        self.indicator = indicator
+        self.query = None
+        self.params = {}
+        self.rows = []
+        self.positions = []
+        self._cards = []  # pooled card widgets, reused for whichever rows are visible
+        self.unread_after = 0  # rows with a larger id are marked as new
+        self._at_end = True
+        self._fetching = False
+        
+        self.scrollbar = ttk.Scrollbar(parent, orient="vertical")
+        self.canvas = tk.Canvas(parent, bg="white", highlightthickness=0, yscrollincrement=20,
+                                yscrollcommand=self._on_scroll)
+        self.scrollbar.configure(command=self.canvas.yview)
+        self.scrollbar.pack(side="right", fill="y")
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self._empty = self.canvas.create_text(20, 50, anchor="w", state="hidden", fill="#7f8c8d",
+                                              font=("Arial", 12), text="📭 Nenhum aviso disponível no momento")
+        self.canvas.bind('<Configure>', lambda e: self._layout())
+        self._bind_wheel(self.canvas)
+    
+    def load(self, query: KeysetQuery, params: Dict[str, Any], first_page: Optional[tuple] = None):
+        """Show query with params from the newest row; first_page is an already read (rows, positions)."""
+        self.query, self.params = query, params
+        self.rows, self.positions = [], []
+        self._at_end = False
+        self.canvas.yview_moveto(0)
+        if first_page is not None:
+            db_worker.cancel(self.worker_key)
+            self._show_page(first_page)
+        else:
+            self._fetch()
+    
+    def prepend(self, rows: List[tuple], positions: List[tuple]):
+        """Add rows newer than everything loaded on top, without touching the cards in view.
         
-    try:
-        cursor.execute('ALTER TABLE submissions ADD COLUMN submitted_at TEXT')
-    except sqlite3.OperationalError:
-        pass  # Column already exists
+        Scrolled down, the view shifts by the added height so the same cards
+        stay on screen; at the top the new cards show up.
+        """
+        if not rows:
+            return
+        top = self.canvas.canvasy(0)
+        self.rows[:0] = rows
+        self.positions[:0] = positions
+        self._layout()
+        if top > 0:
+            self.canvas.yview_moveto((top + len(rows) * self.CARD_HEIGHT) / (len(self.rows) * self.CARD_HEIGHT))
     
-    # Create quiz questions table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS quiz_questions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            assignment_id INTEGER,
-            question_text TEXT NOT NULL,
-            option_a TEXT NOT NULL,
-            option_b TEXT NOT NULL,
-            option_c TEXT NOT NULL,
-            option_d TEXT NOT NULL,
-            correct_answer TEXT NOT NULL,
-            points INTEGER DEFAULT 1,
-            FOREIGN KEY (assignment_id) REFERENCES assignments (id)
-        )
-    ''')
+    def _fetch(self):
+        query, params, page_size = self.query, self.params, self.page_size
+        after = self.positions[-1] if self.positions else None
+        self._fetching = True
+        db_worker.submit(self.worker_key,
+                         lambda cursor: query.page(cursor, params, None, True, after, limit=page_size),
+                         self._show_page, indicator=self.indicator, on_error=self._fetch_failed)
     
-    # Create quiz answers table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS quiz_answers (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            submission_id INTEGER,
-            question_id INTEGER,
-            selected_answer TEXT NOT NULL,
-            is_correct BOOLEAN DEFAULT 0,
-            FOREIGN KEY (submission_id) REFERENCES submissions (id),
-            FOREIGN KEY (question_id) REFERENCES quiz_questions (id)
-        )
-    ''')
+    def _fetch_failed(self, error):
+        self._fetching = False
+        messagebox.showerror("Erro", f"Falha ao carregar avisos: {error}")
     
-    # Create submissions table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS submissions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            assignment_id INTEGER,
-            student_id INTEGER,
-            submission_date TEXT,
-            grade REAL,
-            feedback TEXT,
-            FOREIGN KEY (assignment_id) REFERENCES assignments(id),
-            FOREIGN KEY (student_id) REFERENCES users(id)
-        )
-    ''')
+    def _show_page(self, page):
+        self._fetching = False
+        rows, positions = page
+        if len(rows) < self.page_size:
+            self._at_end = True
+        self.rows.extend(rows)
+        self.positions.extend(positions)
+        self._layout()
     
-    # Create classes/turmas table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS classes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT UNIQUE NOT NULL,
-            description TEXT,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
+    def _layout(self):
+        width = self.canvas.winfo_width()
+        self.canvas.configure(scrollregion=(0, 0, width, len(self.rows) * self.CARD_HEIGHT))
+        self.canvas.itemconfigure(self._empty, state="normal" if self._at_end and not self.rows else "hidden")
+        for card in self._cards:
+            self.canvas.itemconfigure(card['window'], width=max(width - 10, 1))
+            card['content'].config(wraplength=max(width - 50, 100))
+        self._render()
     
-    # Create student_classes table (associação entre estudantes e turmas)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS student_classes (
-            student_id INTEGER,
-            class_id INTEGER,
-            assigned_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            PRIMARY KEY (student_id, class_id),
-            FOREIGN KEY (student_id) REFERENCES users(id),
-            FOREIGN KEY (class_id) REFERENCES classes(id)
-        )
-    ''')
+    def _render(self):
+        top = self.canvas.canvasy(0)
+        first = max(int(top // self.CARD_HEIGHT), 0)
+        last = min(int((top + self.canvas.winfo_height()) // self.CARD_HEIGHT) + 1, len(self.rows))
+        while len(self._cards) < last - first:
+            self._cards.append(self._new_card())
+        
+        for slot, card in enumerate(self._cards):
+            index = first + slot
+            if index < last:
+                if card['row'] is not self.rows[index]:
+                    self._fill(card, self.rows[index])
+                self.canvas.coords(card['window'], 5, index * self.CARD_HEIGHT + 5)
+            else:
+                card['row'] = None
+                self.canvas.coords(card['window'], 5, -2 * self.CARD_HEIGHT)  # parked out of view
+        
+        if not self._fetching and not self._at_end and self.query is not None \
+                and last >= len(self.rows) - self.PREFETCH_CARDS:
+            self._fetch()
     
-    # Create announcements/avisos table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS announcements (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            content TEXT NOT NULL,
-            target_class_id INTEGER,
-            created_by INTEGER,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            priority TEXT DEFAULT 'normal',
-            FOREIGN KEY (target_class_id) REFERENCES classes(id),
-            FOREIGN KEY (created_by) REFERENCES users(id)
-        )
-    ''')
+    def _new_card(self) -> Dict[str, Any]:
+        frame = tk.Frame(self.canvas, bg="white", relief="solid", bd=1)
+        header = tk.Frame(frame, bg="#ecf0f1")
+        header.pack(fill="x")
+        priority = tk.Label(header, font=("Arial", 9, "bold"), fg="white", padx=10, pady=3)
+        priority.pack(side="left")
+        created = tk.Label(header, font=("Arial", 9), bg="#ecf0f1", fg="#7f8c8d")
+        created.pack(side="right", padx=10, pady=3)
+        title = tk.Label(frame, font=("Arial", 13, "bold"), bg="white", fg="#2c3e50", anchor="w")
+        title.pack(fill="x", padx=15, pady=(10, 5))
+        content = tk.Label(frame, font=("Arial", 11), bg="white", fg="#34495e", anchor="nw", justify="left",
+                           wraplength=max(self.canvas.winfo_width() - 50, 100))
+        content.pack(fill="both", expand=True, padx=15, pady=(0, 10))
+        
+        window = self.canvas.create_window(5, -2 * self.CARD_HEIGHT, window=frame, anchor="nw",
+                                           width=max(self.canvas.winfo_width() - 10, 1),
+                                           height=self.CARD_HEIGHT - 10)
+        card = {'window': window, 'priority': priority, 'created': created, 'title': title,
+                'content': content, 'row': None}
+        for widget in (frame, header, priority, created, title, content):
+            self._bind_wheel(widget)
+            widget.bind('<Button-1>', lambda e, c=card: self._open(c['row']))
+        return card
     
-    # Insert sample data if tables are empty
-    cursor.execute('SELECT COUNT(*) FROM users')
-    if cursor.fetchone()[0] == 0:
-        insert_sample_data(cursor)
+    def _fill(self, card: Dict[str, Any], row: tuple):
+        _, title, content, priority, created_at = row
+        high = priority == "high"
+        card['row'] = row
+        card['priority'].config(text="🔴 ALTA PRIORIDADE" if high else "🟢 Normal",
+                                bg="#e74c3c" if high else "#27ae60")
+        card['created'].config(text=f"🆕 {created_at}" if row[0] > self.unread_after else created_at)
+        card['title'].config(text=title)
+        if len(content) > self.CONTENT_CHARS:
+            content = content[:self.CONTENT_CHARS].rstrip() + "… (clique para ler)"
+        card['content'].config(text=content)
     
-    # Insert default classes if they don't exist
-    cursor.execute('SELECT COUNT(*) FROM classes')
-    if cursor.fetchone()[0] == 0:
-        cursor.execute("INSERT INTO classes (name, description) VALUES ('Turma A', 'Primeira turma')")
-        cursor.execute("INSERT INTO classes (name, description) VALUES ('Turma B', 'Segunda turma')")
+    def _open(self, row: Optional[tuple]):
+        if row is not None:
+            messagebox.showinfo(row[1], row[2], parent=self.canvas)
+    
+    def _bind_wheel(self, widget: tk.Misc):
+        # Bound per widget, not bind_all, so the feed never scrolls from other windows
+        widget.bind('<MouseWheel>', lambda e: self.canvas.yview_scroll(int(-1 * (e.delta / 120)) * 3, "units"))
+        widget.bind('<Button-4>', lambda e: self.canvas.yview_scroll(-3, "units"))
+        widget.bind('<Button-5>', lambda e: self.canvas.yview_scroll(3, "units"))
     
-    conn.commit()
-    conn.close()
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self._render()
 
 
-def insert_sample_data(cursor):
-    """Insert sample data for testing purposes."""
-    # Sample users
-    users_data = [
-        ('teacher1', 'pass123', 'Maria', 'Silva', 'maria.silva@email.com', 'TEACHER'),
-        ('student1', 'pass123', 'João', 'Santos', 'joao.santos@email.com', 'STUDENT'),
-        ('student2', 'pass123', 'Ana', 'Costa', 'ana.costa@email.com', 'STUDENT'),
-        ('coordinator1', 'pass123', 'Carlos', 'Lima', 'carlos.lima@email.com', 'COORDINATOR'),
-        ('secretary1', 'pass123', 'Paula', 'Ferreira', 'paula.ferreira@email.com', 'SECRETARY'),
-        ('director1', 'pass123', 'Roberto', 'Oliveira', 'roberto.oliveira@email.com', 'DIRECTOR'),
-    ]
+class QuizPager:
+    """A quiz answered one page of questions at a time, on widgets reused from page to page.
     
-    cursor.executemany('''
-        INSERT INTO users (username, password, first_name, last_name, email, role)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', users_data)
+    Only PAGE_SIZE question slots (a frame, a label and four Radiobuttons
+    each) are ever built; turning the page refills their texts, so a
+    200-question exam opens as fast as a 5-question one. The chosen options
+    live in answers, an array with one byte per question (-1 while
+    unanswered), not in Tk variables. The navigator on the left lists every
+    question with its state and jumps to its page when clicked.
+    """
     
-    # Sample courses
-    courses_data = [
-        ('Matemática I', 1),
-        ('Fundamentos de Programação', 1),
-        ('Estruturas de Dados', 1),
-    ]
+    PAGE_SIZE = 5
+    OPTIONS = ('A', 'B', 'C', 'D')
     
-    cursor.executemany('''
-        INSERT INTO courses (name, teacher_id)
-        VALUES (?, ?)
-    ''', courses_data)
+    def __init__(self, parent: tk.Misc, questions: List[tuple], page_size: int = PAGE_SIZE):
+        from array import array
+        
+        self.questions = questions  # (id, text, option_a, option_b, option_c, option_d, points)
+        self.page_size = page_size
+        self.answers = array('b', [-1]) * len(questions)
+        self.page = 0
+        self.pages = max((len(questions) + page_size - 1) // page_size, 1)
+        
+        navigator_frame = tk.Frame(parent)
+        navigator_frame.pack(side="left", fill="y", padx=(0, 10))
+        tk.Label(navigator_frame, text="Questões", font=("Arial", 10, "bold")).pack()
+        self.navigator = tk.Listbox(navigator_frame, width=9, activestyle="none", exportselection=False,
+                                    font=("Arial", 10))
+        navigator_scroll = ttk.Scrollbar(navigator_frame, orient="vertical", command=self.navigator.yview)
+        self.navigator.configure(yscrollcommand=navigator_scroll.set)
+        navigator_scroll.pack(side="right", fill="y")
+        self.navigator.pack(side="left", fill="y")
+        self.navigator.insert("end", *(self._navigator_text(index) for index in range(len(questions))))
+        self.navigator.bind('<<ListboxSelect>>', self._on_navigate)
+        
+        page_frame = tk.Frame(parent)
+        page_frame.pack(side="left", fill="both", expand=True)
+        
+        controls = tk.Frame(page_frame)
+        controls.pack(side="bottom", fill="x", pady=(5, 0))
+        self.previous_button = tk.Button(controls, text="◀ Anterior", command=lambda: self.show_page(self.page - 1))
+        self.previous_button.pack(side="left")
+        self.next_button = tk.Button(controls, text="Próxima ▶", command=lambda: self.show_page(self.page + 1))
+        self.next_button.pack(side="right")
+        self.status_label = tk.Label(controls, font=("Arial", 10))
+        self.status_label.pack(side="left", expand=True)
+        
+        scrollbar = ttk.Scrollbar(page_frame, orient="vertical")
+        self.canvas = tk.Canvas(page_frame, highlightthickness=0, yscrollcommand=scrollbar.set)
+        scrollbar.configure(command=self.canvas.yview)
+        scrollbar.pack(side="right", fill="y")
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.body = tk.Frame(self.canvas)
+        body_window = self.canvas.create_window((0, 0), window=self.body, anchor="nw")
+        self.body.bind('<Configure>', lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
+        self.canvas.bind('<Configure>', lambda e: self.canvas.itemconfigure(body_window, width=e.width))
+        self._bind_wheel(self.canvas)
+        self._bind_wheel(self.body)
+        
+        self._slots = [self._new_slot() for _ in range(min(page_size, len(questions)))]
+        self.show_page(0)
     
-    # Sample enrollments
-    enrollments_data = [
-        (2, 1), (2, 2),  # student1 in Math and Programming
-        (3, 1), (3, 3),  # student2 in Math and Data Structures
-    ]
+    def show_page(self, page: int):
+        """Refill the question slots with page's questions."""
+        self.page = min(max(page, 0), self.pages - 1)
+        first = self.page * self.page_size
+        for slot_number, slot in enumerate(self._slots):
+            index = first + slot_number
+            if index < len(self.questions):
+                self._fill(slot, index)
+                slot['frame'].pack(fill="x", pady=10, padx=10)
+            else:
+                slot['index'] = None
+                slot['frame'].pack_forget()
+        self.canvas.yview_moveto(0)
+        self.previous_button.config(state="normal" if self.page > 0 else "disabled")
+        self.next_button.config(state="normal" if self.page < self.pages - 1 else "disabled")
+        self._update_status()
     
-    cursor.executemany('''
-        INSERT INTO enrollments (user_id, course_id)
-        VALUES (?, ?)
-    ''', enrollments_data)
+    def show_question(self, index: int):
+        """Turn to the page holding question index and select it in the navigator."""
+        self.show_page(index // self.page_size)
+        self.navigator.selection_clear(0, "end")
+        self.navigator.selection_set(index)
+        self.navigator.see(index)
     
-    # Sample assignments
-    assignments_data = [
-        (1, 'Calculus Assignment', 'Solve differential equations problems', '2025-09-15', 100),
-        (1, 'Linear Algebra Quiz', 'Matrix operations and transformations', '2025-09-22', 50),
-        (2, 'Python Project 1', 'Create a simple calculator application', '2025-09-20', 100),
-        (2, 'Data Types Exercise', 'Work with lists, dictionaries, and sets', '2025-09-18', 75),
-        (3, 'Binary Tree Implementation', 'Implement binary search tree in Python', '2025-09-25', 100),
-        (3, 'Algorithm Analysis', 'Analyze time complexity of sorting algorithms', '2025-09-30', 80),
-    ]
+    def unanswered(self) -> List[int]:
+        """Indexes of the questions still without an answer."""
+        return [index for index, option in enumerate(self.answers) if option < 0]
     
-    cursor.executemany('''
-        INSERT INTO assignments (course_id, title, description, due_date, max_points)
-        VALUES (?, ?, ?, ?, ?)
-    ''', assignments_data)
+    def selected(self) -> Dict[int, str]:
+        """Question id -> chosen option letter, for the answered questions."""
+        return {question[0]: self.OPTIONS[option]
+                for question, option in zip(self.questions, self.answers) if option >= 0}
+    
+    def _new_slot(self) -> Dict[str, Any]:
+        frame = tk.LabelFrame(self.body, font=("Arial", 11, "bold"), padx=10, pady=10)
+        text = tk.Label(frame, font=("Arial", 11), wraplength=550, justify="left")
+        text.pack(anchor='w', pady=(0, 10))
+        slot = {'frame': frame, 'text': text, 'var': tk.IntVar(frame, value=-1), 'index': None, 'options': []}
+        for value in range(len(self.OPTIONS)):
+            button = tk.Radiobutton(frame, variable=slot['var'], value=value, font=("Arial", 10),
+                                    wraplength=500, justify="left",
+                                    command=lambda s=slot: self._choose(s))
+            button.pack(anchor='w', pady=2)
+            slot['options'].append(button)
+        for widget in [frame, text] + slot['options']:
+            self._bind_wheel(widget)
+        return slot
+    
+    def _fill(self, slot: Dict[str, Any], index: int):
+        question_id, question_text, *options, points = self.questions[index]
+        slot['index'] = index
+        slot['frame'].config(text=f"Questão {index + 1} ({points} pontos)")
+        slot['text'].config(text=question_text)
+        for letter, option_text, button in zip(self.OPTIONS, options, slot['options']):
+            button.config(text=f"{letter}) {option_text}")
+        slot['var'].set(self.answers[index])
+    
+    def _choose(self, slot: Dict[str, Any]):
+        index = slot['index']
+        if index is None:
+            return
+        self.answers[index] = slot['var'].get()
+        self.navigator.delete(index)
+        self.navigator.insert(index, self._navigator_text(index))
+        self._update_status()
+    
+    def _navigator_text(self, index: int) -> str:
+        return f"{'✔' if self.answers[index] >= 0 else '○'} {index + 1}"
+    
+    def _on_navigate(self, event):
+        selection = self.navigator.curselection()
+        if selection and selection[0] // self.page_size != self.page:
+            self.show_page(selection[0] // self.page_size)
+    
+    def _update_status(self):
+        answered = len(self.answers) - self.answers.count(-1)
+        self.status_label.config(text=f"Página {self.page + 1} de {self.pages} · "
+                                      f"{answered}/{len(self.questions)} respondidas")
+    
+    def _bind_wheel(self, widget: tk.Misc):
+        # Bound per widget, not bind_all, so closing the quiz leaves no handler behind
+        widget.bind('<MouseWheel>', lambda e: self.canvas.yview_scroll(int(-1 * (e.delta / 120)), "units"))
+        widget.bind('<Button-4>', lambda e: self.canvas.yview_scroll(-1, "units"))
+        widget.bind('<Button-5>', lambda e: self.canvas.yview_scroll(1, "units"))
+
+
+class TransferProgress:
+    """A progress bar with "x de y" for a file transfer running on a worker thread.
+    
+    Tk must only be touched from its own thread, so the worker just stores
+    the byte count through the callbacks from reporter() and the bar reads
+    it every POLL_MS. stop() removes the bar.
+    """
+    
+    POLL_MS = 100
+    
+    def __init__(self, parent: tk.Misc, total: int):
+        self.total = total
+        self.done = 0
+        self.frame = tk.Frame(parent)
+        self.bar = ttk.Progressbar(self.frame, orient="horizontal", length=300, maximum=max(total, 1))
+        self.bar.pack()
+        self.label = tk.Label(self.frame, font=("Arial", 9), fg="#7f8c8d")
+        self.label.pack()
+        self._job = None
+        self._poll()
+    
+    def reporter(self, offset: int):
+        """Progress callback for BlobStore.put/copy_to of a file that starts offset bytes into the transfer."""
+        def report(size):
+            self.done = offset + size
+        return report
+    
+    def stop(self):
+        if self._job is not None:
+            self.frame.after_cancel(self._job)
+            self._job = None
+        self.frame.destroy()
+    
+    def _poll(self):
+        if not self.frame.winfo_exists():
+            return  # the window closed mid-transfer
+        self.bar['value'] = self.done
+        self.label.config(text=f"{format_size(self.done)} de {format_size(self.total)}")
+        self._job = self.frame.after(self.POLL_MS, self._poll)
 
 
 class LoginFrame(tk.Frame):
@@ -348,14 +3164,12 @@ class LoginFrame(tk.Frame):
         # Check if C module exists
         if not os.path.exists(exe_path):
             # Fallback to Python implementation if C module not available
-            conn = sqlite3.connect('academic_system.db')
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT id, username, first_name, last_name, email, role
-                FROM users WHERE username = ? AND password = ?
-            ''', (username, password))
-            user_data = cursor.fetchone()
-            conn.close()
+            with db.cursor() as cursor:
+                cursor.execute('''
+                    SELECT id, username, first_name, last_name, email, role
+                    FROM users WHERE username = ? AND password = ?
+                ''', (username, password))
+                user_data = cursor.fetchone()
             
             if user_data:
                 return {
@@ -371,12 +3185,7 @@ class LoginFrame(tk.Frame):
         
         try:
             # Call C module for login validation
-            result = subprocess.run(
-                [exe_path, 'login', username, password],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
+            result = run_c_module([exe_path, 'login', username, password], timeout=5)
             
             # Parse output
             output = result.stdout.strip()
@@ -408,14 +3217,12 @@ class LoginFrame(tk.Frame):
         except Exception as e:
             print(f"Erro ao chamar módulo C: {e}")
             # Fallback to Python implementation
-            conn = sqlite3.connect('academic_system.db')
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT id, username, first_name, last_name, email, role
-                FROM users WHERE username = ? AND password = ?
-            ''', (username, password))
-            user_data = cursor.fetchone()
-            conn.close()
+            with db.cursor() as cursor:
+                cursor.execute('''
+                    SELECT id, username, first_name, last_name, email, role
+                    FROM users WHERE username = ? AND password = ?
+                ''', (username, password))
+                user_data = cursor.fetchone()
             
             if user_data:
                 return {
@@ -523,6 +3330,9 @@ class TeacherFrame(tk.Frame):
                  command=self.show_all_students, bg="#9C27B0", fg="white",
                  font=("Arial", 9)).pack(side="left", padx=10)
         
+        self.loading_label = tk.Label(course_selection_frame, text="", font=("Arial", 9, "italic"), fg="#7f8c8d")
+        self.loading_label.pack(side="left", padx=5)
+        
         # Students list
         students_frame = tk.LabelFrame(content_frame, text="Estudantes Inscritos", 
                                      font=("Arial", 12, "bold"))
@@ -545,6 +3355,10 @@ class TeacherFrame(tk.Frame):
         self.students_tree.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
         
+        # Only the visible stretch of the list is held in the Treeview
+        self.students_view = PagedTreeview(self.students_tree, scrollbar, 'teacher.students',
+                                           indicator=self.loading_label)
+        
         # Action buttons
         buttons_frame = tk.Frame(content_frame)
         buttons_frame.pack(fill="x", pady=10)
@@ -577,6 +3391,9 @@ class TeacherFrame(tk.Frame):
         
         tk.Button(buttons_row2, text="Ver Entregas", command=self.view_submissions,
                  bg="#795548", fg="white", font=("Arial", 10)).pack(side="left", padx=5)
+        
+        tk.Button(buttons_row2, text="Banco de Questões", command=self.manage_quiz_bank,
+                 bg="#3F51B5", fg="white", font=("Arial", 10)).pack(side="left", padx=5)
     
     def refresh_data(self):
         """Refresh the teacher's courses when frame is shown."""
@@ -586,21 +3403,25 @@ class TeacherFrame(tk.Frame):
             )
             self.load_courses()
     
+    @staticmethod
+    def fetch_courses(cursor, teacher_id):
+        """Courses taught by teacher_id."""
+        cursor.execute('''
+            SELECT id, name FROM courses WHERE teacher_id = ?
+        ''', (teacher_id,))
+        return cursor.fetchall()
+    
     def load_courses(self):
         """Load teacher's courses into the combobox."""
         if not self.controller.current_user:
             return
         
-        conn = sqlite3.connect('academic_system.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT id, name FROM courses WHERE teacher_id = ?
-        ''', (self.controller.current_user['id'],))
-        
-        courses = cursor.fetchall()
-        conn.close()
+        teacher_id = self.controller.current_user['id']
         
+        db_worker.submit('teacher.courses', lambda cursor: self.fetch_courses(cursor, teacher_id),
+                         self._show_courses, indicator=self.loading_label)
+    
+    def _show_courses(self, courses):
         course_list = [f"{course[1]} (ID: {course[0]})" for course in courses]
         self.course_combo['values'] = course_list
         
@@ -615,39 +3436,59 @@ class TeacherFrame(tk.Frame):
         else:
             messagebox.showinfo("Info", "Por favor, selecione uma disciplina primeiro.")
     
+    # students_tree shows one of these through PagedTreeview; the headings
+    # match the Treeview columns so clicking one sorts in SQL. Names and
+    # emails can be NULL (empty cells of an imported spreadsheet), and a
+    # keyset comparison with NULL drops the row, hence the COALESCEs; "Nome"
+    # matches idx_users_role_sort_name expression for expression.
+    STUDENT_SORTS = {
+        "ID": ('u.id',),
+        "Nome": ("COALESCE(u.first_name, '')", "COALESCE(u.last_name, '')"),
+        "Email": ("COALESCE(u.email, '')",),
+        "Turma": ("COALESCE(c.name, 'Sem Turma')",),
+    }
+    
+    ALL_STUDENTS = KeysetQuery('''
+        SELECT u.id, u.first_name || ' ' || u.last_name as name, u.email,
+               COALESCE(c.name, 'Sem Turma') as class_name,
+               (SELECT GROUP_CONCAT(co.name, ', ')
+                FROM enrollments e JOIN courses co ON co.id = e.course_id
+                WHERE e.user_id = u.id) as enrolled_courses,
+               {sort_values}
+        FROM users u
+        LEFT JOIN student_classes sc ON sc.student_id = u.id
+        LEFT JOIN classes c ON c.id = sc.class_id
+        WHERE u.role = 'STUDENT' AND {keyset}
+        ORDER BY {order}
+    ''', STUDENT_SORTS, key=('u.id', 'COALESCE(c.id, 0)'), default_sort="Nome")
+    
+    # class_filter is 'Todas', 'Sem Turma' or a class name. The average comes
+    # from student_course_stats, which holds each student's submissions to
+    # the course already grouped, so no submission rows are joined here.
+    COURSE_STUDENTS = KeysetQuery('''
+        SELECT u.id, u.first_name || ' ' || u.last_name as name, u.email,
+               COALESCE(c.name, 'Sem Turma') as class_name,
+               COALESCE(st.grade_avg, 0) as avg_grade,
+               {sort_values}
+        FROM enrollments e
+        JOIN users u ON u.id = e.user_id
+        LEFT JOIN student_classes sc ON sc.student_id = u.id
+        LEFT JOIN classes c ON c.id = sc.class_id
+        LEFT JOIN student_course_stats st ON st.student_id = u.id AND st.course_id = e.course_id
+        WHERE e.course_id = :course_id AND u.role = 'STUDENT'
+        AND (:class_filter = 'Todas'
+             OR (:class_filter = 'Sem Turma' AND sc.student_id IS NULL)
+             OR c.name = :class_filter)
+        AND {keyset}
+        ORDER BY {order}
+    ''', dict(STUDENT_SORTS, **{"Nota Média": ('COALESCE(st.grade_avg, 0)',)}),
+        key=('u.id', 'COALESCE(c.id, 0)'), default_sort="Nome")
+    
     def show_all_students(self):
         """Show all students regardless of course enrollment."""
-        conn = sqlite3.connect('academic_system.db')
-        cursor = conn.cursor()
-        
-        # Get all students with their class and course information
-        cursor.execute('''
-            SELECT u.id, u.first_name || ' ' || u.last_name as name, u.email,
-                   COALESCE(cl.name, 'Sem Turma') as class_name,
-                   GROUP_CONCAT(c.name, ', ') as enrolled_courses
-            FROM users u
-            LEFT JOIN student_classes sc ON u.id = sc.student_id
-            LEFT JOIN classes cl ON sc.class_id = cl.id
-            LEFT JOIN enrollments e ON u.id = e.user_id
-            LEFT JOIN courses c ON e.course_id = c.id
-            WHERE u.role = 'STUDENT'
-            GROUP BY u.id, u.first_name, u.last_name, u.email, cl.name
-            ORDER BY u.first_name, u.last_name
-        ''')
-        
-        all_students = cursor.fetchall()
-        conn.close()
-        
-        # Clear and populate treeview
-        for item in self.students_tree.get_children():
-            self.students_tree.delete(item)
-        
-        for student in all_students:
-            class_name = student[3]
-            courses = student[4] if student[4] else "Sem matrículas"
-            self.students_tree.insert("", "end", values=(
-                student[0], student[1], student[2], class_name, courses
-            ))
+        # Shares the paged view with on_course_selected: whichever was clicked last wins
+        self.students_view.load(self.ALL_STUDENTS, {},
+                                lambda s: (s[0], s[1], s[2], s[3], s[4] or "Sem matrículas"))
     
     def on_course_selected(self, event):
         """Handle course selection and load students."""
@@ -661,115 +3502,309 @@ class TeacherFrame(tk.Frame):
         # Get class filter
         class_filter = self.class_filter_combo.get()
         
-        conn = sqlite3.connect('academic_system.db')
-        cursor = conn.cursor()
-        
-        # Build query based on filter
-        if class_filter == 'Todas':
-            cursor.execute('''
-                SELECT u.id, u.first_name || ' ' || u.last_name as name, u.email,
-                       COALESCE(c.name, 'Sem Turma') as class_name,
-                       COALESCE(AVG(s.grade), 0) as avg_grade
-                FROM users u
-                JOIN enrollments e ON u.id = e.user_id
-                LEFT JOIN student_classes sc ON u.id = sc.student_id
-                LEFT JOIN classes c ON sc.class_id = c.id
-                LEFT JOIN submissions s ON u.id = s.student_id
-                LEFT JOIN assignments a ON s.assignment_id = a.id AND a.course_id = ?
-                WHERE e.course_id = ? AND u.role = 'STUDENT'
-                GROUP BY u.id, u.first_name, u.last_name, u.email, c.name
-                ORDER BY u.first_name, u.last_name
-            ''', (course_id, course_id))
-        elif class_filter == 'Sem Turma':
-            cursor.execute('''
-                SELECT u.id, u.first_name || ' ' || u.last_name as name, u.email,
-                       'Sem Turma' as class_name,
-                       COALESCE(AVG(s.grade), 0) as avg_grade
-                FROM users u
-                JOIN enrollments e ON u.id = e.user_id
-                LEFT JOIN submissions s ON u.id = s.student_id
-                LEFT JOIN assignments a ON s.assignment_id = a.id AND a.course_id = ?
-                WHERE e.course_id = ? AND u.role = 'STUDENT'
-                AND u.id NOT IN (SELECT student_id FROM student_classes)
-                GROUP BY u.id, u.first_name, u.last_name, u.email
-                ORDER BY u.first_name, u.last_name
-            ''', (course_id, course_id))
-        else:
-            cursor.execute('''
-                SELECT u.id, u.first_name || ' ' || u.last_name as name, u.email,
-                       c.name as class_name,
-                       COALESCE(AVG(s.grade), 0) as avg_grade
-                FROM users u
-                JOIN enrollments e ON u.id = e.user_id
-                JOIN student_classes sc ON u.id = sc.student_id
-                JOIN classes c ON sc.class_id = c.id
-                LEFT JOIN submissions s ON u.id = s.student_id
-                LEFT JOIN assignments a ON s.assignment_id = a.id AND a.course_id = ?
-                WHERE e.course_id = ? AND u.role = 'STUDENT' AND c.name = ?
-                GROUP BY u.id, u.first_name, u.last_name, u.email, c.name
-                ORDER BY u.first_name, u.last_name
-            ''', (course_id, course_id, class_filter))
-        
-        students = cursor.fetchall()
-        conn.close()
+        # Flipping course_combo quickly supersedes the previous course's load
+        self.students_view.load(self.COURSE_STUDENTS,
+                                {'course_id': course_id, 'class_filter': class_filter},
+                                lambda s: (s[0], s[1], s[2], s[3], f"{s[4]:.1f}"))
+    
+    GRADE_GRID_PIVOT = '''
+        SELECT u.id, u.first_name || ' ' || u.last_name as name, {cells}
+        FROM enrollments e
+        JOIN users u ON u.id = e.user_id
+        LEFT JOIN submissions s ON s.student_id = u.id
+            AND s.assignment_id IN (SELECT id FROM assignments WHERE course_id = ?)
+        WHERE e.course_id = ? AND u.role = 'STUDENT'
+        GROUP BY u.id
+        ORDER BY u.first_name, u.last_name
+    '''
+    
+    @classmethod
+    def fetch_grade_grid(cls, cursor, course_id):
+        """Students × assignments of a course as (assignments, rows), read with one pivot query.
+        
+        assignments are (id, title, max_points) by due date. Each row is
+        (student_id, name, cells) with one (grade, submitted) cell per
+        assignment, in the same order; submitted tells an ungraded
+        submission from no submission at all.
+        """
+        cursor.execute('''
+            SELECT id, title, max_points FROM assignments
+            WHERE course_id = ?
+            ORDER BY due_date, id
+        ''', (course_id,))
+        assignments = cursor.fetchall()
         
-        # Clear and populate treeview
-        for item in self.students_tree.get_children():
-            self.students_tree.delete(item)
+        # Two pivot columns per assignment: its grade and whether a submission exists
+        cells = ', '.join(f'MAX(CASE WHEN s.assignment_id = {int(a[0])} THEN s.grade END), '
+                          f'COUNT(CASE WHEN s.assignment_id = {int(a[0])} THEN 1 END) > 0'
+                          for a in assignments) or 'NULL'
+        cursor.execute(cls.GRADE_GRID_PIVOT.format(cells=cells), (course_id, course_id))
+        rows = [(row[0], row[1], [(row[i], bool(row[i + 1])) for i in range(2, 2 + 2 * len(assignments), 2)])
+                for row in cursor.fetchall()]
+        return assignments, rows
+    
+    @staticmethod
+    def save_grade_grid(cursor, course_id, edits):
+        """Write buffered grid edits; return the conflicting ones, writing nothing if there are any.
+        
+        edits are (student_id, assignment_id, grade_read, submitted_read,
+        new_grade). Each cell is checked against what the grid read, so a
+        grade someone else changed since is never overwritten silently.
+        Graded cells without a submission get one. Run it in a write
+        transaction (db.run_write) so the check and the writes are atomic.
+        """
+        import json
         
-        for student in students:
-            self.students_tree.insert("", "end", values=(
-                student[0], student[1], student[2], student[3], f"{student[4]:.1f}"
-            ))
+        cursor.execute('''
+            SELECT s.student_id, s.assignment_id, MAX(s.grade), COUNT(*)
+            FROM submissions s
+            WHERE s.student_id IN (SELECT value FROM json_each(?))
+            AND s.assignment_id IN (SELECT id FROM assignments WHERE course_id = ?)
+            GROUP BY s.student_id, s.assignment_id
+        ''', (json.dumps(sorted({edit[0] for edit in edits})), course_id))
+        current = {(row[0], row[1]): (row[2], row[3] > 0) for row in cursor.fetchall()}
+        
+        conflicts = [edit for edit in edits
+                     if current.get((edit[0], edit[1]), (None, False)) != (edit[2], edit[3])]
+        if conflicts:
+            return conflicts
+        
+        cursor.executemany('''
+            UPDATE submissions SET grade = ? WHERE assignment_id = ? AND student_id = ?
+        ''', [(edit[4], edit[1], edit[0]) for edit in edits if edit[3]])
+        cursor.executemany('''
+            INSERT INTO submissions (assignment_id, student_id, content, grade)
+            VALUES (?, ?, 'Nota lançada pelo professor', ?)
+        ''', [(edit[1], edit[0], edit[4]) for edit in edits if not edit[3]])
+        return []
     
     def enter_grades(self):
-        """Open grade entry window."""
-        selection = self.students_tree.selection()
+        """Open the grade grid (students × assignments) for the selected course."""
+        selection = self.course_combo.get()
         if not selection:
-            messagebox.showwarning("Aviso", "Por favor, selecione um estudante primeiro.")
+            messagebox.showwarning("Aviso", "Por favor, selecione uma disciplina primeiro.")
             return
         
-        student_data = self.students_tree.item(selection[0])['values']
-        
-        # Create grade entry window
-        grade_window = tk.Toplevel(self.controller)
-        grade_window.title("Inserir Nota")
-        grade_window.geometry("300x200")
-        grade_window.transient(self.controller)
-        grade_window.grab_set()
-        
-        tk.Label(grade_window, text=f"Estudante: {student_data[1]}", 
-                font=("Arial", 12, "bold")).pack(pady=10)
+        course_id = int(selection.split("ID: ")[1].rstrip(")"))
+        course_name = selection.split(" (ID:")[0]
         
-        tk.Label(grade_window, text="Nota (0-100):").pack()
-        grade_entry = tk.Entry(grade_window)
-        grade_entry.pack(pady=5)
+        db_worker.submit('teacher.grade_grid', lambda cursor: self.fetch_grade_grid(cursor, course_id),
+                         lambda grid: self._show_grade_grid(course_id, course_name, *grid),
+                         indicator=self.loading_label)
+    
+    def _show_grade_grid(self, course_id, course_name, assignments, rows):
+        if not assignments:
+            messagebox.showinfo("Info", "Esta disciplina ainda não tem atividades.")
+            return
         
-        tk.Label(grade_window, text="Atividade:").pack()
-        assignment_entry = tk.Entry(grade_window)
-        assignment_entry.pack(pady=5)
+        grid_window = tk.Toplevel(self.controller)
+        grid_window.title(f"Inserir Notas - {course_name}")
+        grid_window.geometry("1000x600")
+        grid_window.transient(self.controller)
+        
+        tk.Label(grid_window, text=f"Notas - {course_name}", font=("Arial", 14, "bold")).pack(pady=10)
+        tk.Label(grid_window, text="Duplo clique ou Enter para editar uma nota; Enter/Tab confirmam e "
+                                   "avançam, Esc cancela. Nada é gravado até clicar em \"Salvar Notas\".",
+                 font=("Arial", 9), fg="#7f8c8d").pack()
+        
+        table_frame = tk.Frame(grid_window)
+        table_frame.pack(fill="both", expand=True, padx=20, pady=10)
+        
+        columns = ["student"] + [f"a{a[0]}" for a in assignments]
+        tree = ttk.Treeview(table_frame, columns=columns, show="headings", selectmode="browse")
+        tree.heading("student", text="Estudante")
+        tree.column("student", width=200, stretch=False)
+        for assignment_id, title, max_points in assignments:
+            tree.heading(f"a{assignment_id}", text=f"{title} ({max_points})")
+            tree.column(f"a{assignment_id}", width=110, anchor="center", stretch=False)
+        tree.tag_configure("edited", background="#FFF3CD")
+        
+        y_scroll = ttk.Scrollbar(table_frame, orient="vertical", command=tree.yview)
+        x_scroll = ttk.Scrollbar(table_frame, orient="horizontal", command=tree.xview)
+        tree.configure(yscrollcommand=y_scroll.set, xscrollcommand=x_scroll.set)
+        y_scroll.pack(side="right", fill="y")
+        x_scroll.pack(side="bottom", fill="x")
+        tree.pack(side="left", fill="both", expand=True)
         
-        def save_grade():
-            try:
-                grade = float(grade_entry.get())
-                assignment = assignment_entry.get().strip()
-                
-                if not assignment:
-                    messagebox.showerror("Erro", "Por favor, insira o nome da atividade.")
+        # Grid state lives in Python; the Treeview only displays it
+        names = {row[0]: row[1] for row in rows}
+        read = {(row[0], assignment[0]): cell
+                for row in rows for assignment, cell in zip(assignments, row[2])}
+        edits = {}  # (student_id, assignment_id) -> new grade or None
+        limits = {a[0]: a[2] or 100 for a in assignments}
+        
+        def cell_text(student_id, assignment_id):
+            if (student_id, assignment_id) in edits:
+                grade = edits[(student_id, assignment_id)]
+                return "" if grade is None else f"{grade:g}*"
+            grade, submitted = read[(student_id, assignment_id)]
+            if grade is not None:
+                return f"{grade:g}"
+            return "entregue" if submitted else ""
+        
+        def row_values(student_id):
+            return [names[student_id]] + [cell_text(student_id, a[0]) for a in assignments]
+        
+        def show_rows(student_ids=None):
+            # Always through reconcile_tree, which only rewrites the rows that changed
+            reconcile_tree(tree, ((row[0], row_values(row[0])) for row in rows))
+            if student_ids is None:
+                student_ids = [row[0] for row in rows]
+            edited = {key[0] for key in edits}
+            for student_id in student_ids:
+                tree.item(student_id, tags=("edited",) if student_id in edited else ())
+            status_label.config(text=f"{len(edits)} alteração(ões) não salva(s)" if edits else "")
+        
+        editor = {'entry': None}
+        
+        def begin_edit(student_iid, column_index):
+            if column_index < 1 or column_index > len(assignments):
+                return
+            tree.see(student_iid)
+            bbox = tree.bbox(student_iid, columns[column_index])
+            if not bbox:
+                return
+            finish_edit(save=False)
+            x, y, width, height = bbox
+            entry = tk.Entry(tree, justify="center")
+            entry.place(x=x, y=y, width=width, height=height)
+            entry.insert(0, tree.set(student_iid, columns[column_index]).rstrip("*")
+                         .replace("entregue", ""))
+            entry.select_range(0, tk.END)
+            entry.focus_set()
+            editor.update(entry=entry, student=int(student_iid), column=column_index)
+            entry.bind('<Return>', lambda e: finish_edit(save=True, move=(1, 0)))
+            entry.bind('<Tab>', lambda e: finish_edit(save=True, move=(0, 1)) or "break")
+            entry.bind('<Escape>', lambda e: finish_edit(save=False))
+            entry.bind('<FocusOut>', lambda e: finish_edit(save=True))
+        
+        def finish_edit(save, move=None):
+            entry = editor['entry']
+            if entry is None:
+                return
+            # Detach the editor first: the error dialogs below take focus,
+            # which would otherwise re-enter through <FocusOut>
+            editor['entry'] = None
+            student_id, column_index = editor['student'], editor['column']
+            assignment_id = assignments[column_index - 1][0]
+            text = entry.get().strip().replace(",", ".")
+            entry.destroy()
+            tree.focus_set()
+            if save:
+                try:
+                    grade = float(text) if text else None
+                except ValueError:
+                    messagebox.showerror("Erro", "Por favor, insira uma nota numérica válida.", parent=grid_window)
                     return
-                
-                if not 0 <= grade <= 100:
-                    messagebox.showerror("Erro", "A nota deve estar entre 0 e 100.")
+                if grade is not None and not 0 <= grade <= limits[assignment_id]:
+                    messagebox.showerror("Erro", f"A nota deve estar entre 0 e {limits[assignment_id]}.",
+                                         parent=grid_window)
                     return
-                
-                messagebox.showinfo("Sucesso", f"Nota {grade} salva para {assignment}")
-                grade_window.destroy()
-                
-            except ValueError:
-                messagebox.showerror("Erro", "Por favor, insira uma nota numérica válida.")
+                if grade == read[(student_id, assignment_id)][0]:
+                    edits.pop((student_id, assignment_id), None)
+                elif grade is not None or read[(student_id, assignment_id)][1]:
+                    edits[(student_id, assignment_id)] = grade
+            show_rows([student_id])
+            if move:
+                order = tree.get_children()
+                row = order.index(str(student_id)) + move[0]
+                column = column_index + move[1]
+                if column > len(assignments):
+                    row, column = row + 1, 1
+                if row < len(order):
+                    tree.selection_set(order[row])
+                    tree.focus(order[row])
+                    begin_edit(order[row], column)
+        
+        def on_double_click(event):
+            student_iid = tree.identify_row(event.y)
+            column = tree.identify_column(event.x)
+            if student_iid and column:
+                begin_edit(student_iid, int(column[1:]) - 1)
+        
+        def on_return(event):
+            if tree.focus():
+                begin_edit(tree.focus(), 1)
+        
+        tree.bind('<Double-1>', on_double_click)
+        tree.bind('<Return>', on_return)
+        
+        def save_all():
+            finish_edit(save=True)
+            if not edits:
+                messagebox.showinfo("Info", "Não há alterações para salvar.", parent=grid_window)
+                return
+            pending = [(student_id, assignment_id) + read[(student_id, assignment_id)] + (grade,)
+                       for (student_id, assignment_id), grade in edits.items()]
+            try:
+                conflicts = db.run_write(self.save_grade_grid, course_id, pending)
+            except sqlite3.Error as e:
+                messagebox.showerror("Erro", f"Falha ao salvar notas: {e}", parent=grid_window)
+                return
+            
+            if conflicts:
+                # Nothing was written; reload the grid so the teacher sees the current grades
+                messagebox.showwarning(
+                    "Conflito",
+                    f"{len(conflicts)} nota(s) foram alteradas por outra pessoa desde que a grade foi aberta. "
+                    "Nada foi salvo; as notas atuais foram recarregadas e suas alterações mantidas. "
+                    "Confira e salve novamente.", parent=grid_window)
+                with db.cursor() as cursor:
+                    _, fresh = self.fetch_grade_grid(cursor, course_id)
+                read.update({(row[0], assignment[0]): cell
+                             for row in fresh for assignment, cell in zip(assignments, row[2])})
+                show_rows()
+                return
+            
+            for (student_id, assignment_id), grade in edits.items():
+                read[(student_id, assignment_id)] = (grade, True)
+            saved = len(edits)
+            edits.clear()
+            show_rows()
+            messagebox.showinfo("Sucesso", f"{saved} nota(s) salva(s).", parent=grid_window)
+        
+        def close():
+            finish_edit(save=False)
+            if edits and not messagebox.askyesno("Alterações não salvas",
+                                                 "Descartar as notas não salvas?", parent=grid_window):
+                return
+            grid_window.destroy()
+        
+        button_frame = tk.Frame(grid_window)
+        button_frame.pack(pady=10)
+        tk.Button(button_frame, text="Salvar Notas", command=save_all,
+                 bg="#4CAF50", fg="white", font=("Arial", 11)).pack(side="left", padx=5)
+        tk.Button(button_frame, text="Fechar", command=close,
+                 bg="#f44336", fg="white", font=("Arial", 11)).pack(side="left", padx=5)
+        status_label = tk.Label(button_frame, text="", font=("Arial", 9, "italic"), fg="#7f8c8d")
+        status_label.pack(side="left", padx=10)
+        grid_window.protocol("WM_DELETE_WINDOW", close)
+        
+        show_rows()
+    
+    SEARCH_LIMIT = 50
+    SEARCH_MIN_CHARS = 2  # one letter matches most of the institution; not worth ranking
+    SEARCH_DEBOUNCE_MS = 200
+    
+    @staticmethod
+    def fetch_student_matches(cursor, text, limit):
+        """Students whose name, username or email has words starting with the typed ones, best first.
         
-        tk.Button(grade_window, text="Salvar Nota", command=save_grade,
-                 bg="#4CAF50", fg="white").pack(pady=20)
+        Matching goes through users_fts, so it ignores accents and case and
+        never scans users; names weigh more than username and email.
+        """
+        match = fts_prefix_query(text)
+        if match is None:
+            return []
+        cursor.execute('''
+            SELECT u.first_name, u.last_name, u.email, u.username
+            FROM users_fts
+            JOIN users u ON u.id = users_fts.rowid
+            WHERE users_fts MATCH ? AND u.role = 'STUDENT'
+            ORDER BY bm25(users_fts, 10.0, 10.0, 5.0, 1.0)
+            LIMIT ?
+        ''', (match, limit))
+        return cursor.fetchall()
     
     def search_students(self):
         """Open student search dialog."""
@@ -782,35 +3817,55 @@ class TeacherFrame(tk.Frame):
         tk.Label(search_window, text="Buscar Estudantes", 
                 font=("Arial", 14, "bold")).pack(pady=10)
         
-        tk.Label(search_window, text="Digite o nome do estudante:").pack()
+        tk.Label(search_window, text="Digite nome, usuário ou email do estudante:").pack()
         search_entry = tk.Entry(search_window, font=("Arial", 12))
         search_entry.pack(pady=5)
         
+        status_label = tk.Label(search_window, text="", font=("Arial", 9, "italic"), fg="#7f8c8d")
+        status_label.pack()
+        
         results_text = tk.Text(search_window, height=10, width=40)
         results_text.pack(pady=10, fill="both", expand=True)
         
         def perform_search():
+            if pending[0] is not None:
+                search_window.after_cancel(pending[0])
+                pending[0] = None
             query = search_entry.get().strip()
-            if not query:
+            if len(query) < self.SEARCH_MIN_CHARS:
+                db_worker.cancel('teacher.search')
+                results_text.delete(1.0, tk.END)
+                status_label.config(text=f"Digite ao menos {self.SEARCH_MIN_CHARS} letras" if query else "")
                 return
             
-            conn = sqlite3.connect('academic_system.db')
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT first_name, last_name, email FROM users
-                WHERE role = 'STUDENT' AND (first_name LIKE ? OR last_name LIKE ?)
-            ''', (f'%{query}%', f'%{query}%'))
-            
-            results = cursor.fetchall()
-            conn.close()
-            
+            # One extra row tells whether the list was cut at SEARCH_LIMIT
+            db_worker.submit('teacher.search',
+                             lambda cursor: self.fetch_student_matches(cursor, query, self.SEARCH_LIMIT + 1),
+                             show_results)
+        
+        def show_results(results):
             results_text.delete(1.0, tk.END)
             if results:
-                for student in results:
-                    results_text.insert(tk.END, f"{student[0]} {student[1]} - {student[2]}\n")
+                for student in results[:self.SEARCH_LIMIT]:
+                    results_text.insert(tk.END, f"{student[0]} {student[1]} ({student[3]}) - {student[2]}\n")
+                if len(results) > self.SEARCH_LIMIT:
+                    status_label.config(text=f"Mostrando os {self.SEARCH_LIMIT} melhores resultados; "
+                                             "digite mais para refinar")
+                else:
+                    status_label.config(text=f"{len(results)} estudante(s) encontrado(s)")
             else:
                 results_text.insert(tk.END, "Nenhum estudante encontrado.")
+                status_label.config(text="")
+        
+        # Search as the user types, once typing pauses for SEARCH_DEBOUNCE_MS
+        pending = [None]
+        
+        def schedule_search(event):
+            if pending[0] is not None:
+                search_window.after_cancel(pending[0])
+            pending[0] = search_window.after(self.SEARCH_DEBOUNCE_MS, perform_search)
+        
+        search_entry.bind('<KeyRelease>', schedule_search)
         
         # Bind Enter key to search in this window
         search_entry.bind('<Return>', lambda e: perform_search())
@@ -827,42 +3882,25 @@ class TeacherFrame(tk.Frame):
                  bg="#f44336", fg="white", font=("Arial", 11),
                  width=15, height=2).pack(side="left", padx=5)
     
+    @staticmethod
+    def fetch_at_risk_students(cursor, course_id):
+        """The course's at-risk students from risk_engine, highest risk first."""
+        return risk_engine.at_risk(cursor, course_id)
+    
     def view_at_risk_students(self):
-        """AI Feature: Show students with low grades."""
+        """AI Feature: Show students at risk from grades, missing and late work."""
         selection = self.course_combo.get()
         if not selection:
             messagebox.showwarning("Aviso", "Por favor, selecione um curso primeiro.")
             return
         
         course_id = int(selection.split("ID: ")[1].rstrip(")"))
+        course_name = selection.split(" (ID:")[0]
         
-        conn = sqlite3.connect('academic_system.db')
-        cursor = conn.cursor()
-        
-        # Get students with average grade below 6.0
-        cursor.execute('''
-            SELECT u.first_name || ' ' || u.last_name as name, 
-                   COALESCE(AVG(s.grade), 0) as avg_grade
-            FROM users u
-            JOIN enrollments e ON u.id = e.user_id
-            LEFT JOIN submissions s ON u.id = s.student_id
-            LEFT JOIN assignments a ON s.assignment_id = a.id AND a.course_id = ?
-            WHERE e.course_id = ? AND u.role = 'STUDENT'
-            GROUP BY u.id, u.first_name, u.last_name
-            HAVING avg_grade < 6.0 OR avg_grade = 0
-        ''', (course_id, course_id))
-        
-        at_risk_students = cursor.fetchall()
-        conn.close()
-        
-        if at_risk_students:
-            message = "Estudantes em Risco (Média < 6.0):\n\n"
-            for student in at_risk_students:
-                message += f"• {student[0]} - Média: {student[1]:.1f}\n"
-        else:
-            message = "Nenhum estudante em risco encontrado nesta disciplina."
-        
-        messagebox.showinfo("Estudantes em Risco", message)
+        db_worker.submit('teacher.at_risk', lambda cursor: self.fetch_at_risk_students(cursor, course_id),
+                         lambda at_risk: show_risk_window(self.controller, f"Estudantes em Risco - {course_name}",
+                                                          at_risk),
+                         indicator=self.loading_label)
     
     def create_assignment(self):
         """Criar uma nova atividade para o curso selecionado."""
@@ -1049,7 +4087,8 @@ class TeacherFrame(tk.Frame):
         def on_mousewheel(event):
             main_canvas.yview_scroll(int(-1*(event.delta/120)), "units")
         
-        main_canvas.bind_all("<MouseWheel>", on_mousewheel)
+        # Bound on the window rather than bind_all, so the handler goes away with it
+        assignment_window.bind("<MouseWheel>", on_mousewheel)
         
         def save_assignment():
             title = title_entry.get().strip()
@@ -1096,36 +4135,27 @@ class TeacherFrame(tk.Frame):
                 max_points = total_points
             
             try:
-                conn = sqlite3.connect('academic_system.db')
-                cursor = conn.cursor()
-                
-                cursor.execute('''
-                    INSERT INTO assignments (course_id, title, description, due_date, max_points, type)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (course_id, title, description, due_date, max_points, assignment_type))
+                with db.transaction() as cursor:
+                    cursor.execute('''
+                        INSERT INTO assignments (course_id, title, description, due_date, max_points, type)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    ''', (course_id, title, description, due_date, max_points, assignment_type))
                 
-                assignment_id = cursor.lastrowid
+                    assignment_id = cursor.lastrowid
                 
-                # Save quiz questions if it's a quiz
-                if assignment_type == "quiz":
-                    for q_data in quiz_questions:
-                        question_text = q_data['question_entry'].get(1.0, tk.END).strip()
-                        correct_answer = q_data['correct_var'].get()
-                        q_points = int(q_data['points_entry'].get())
-                        
-                        cursor.execute('''
+                    # Save quiz questions if it's a quiz
+                    if assignment_type == "quiz":
+                        cursor.executemany('''
                             INSERT INTO quiz_questions 
                             (assignment_id, question_text, option_a, option_b, option_c, option_d, correct_answer, points)
                             VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                        ''', (assignment_id, question_text,
-                              q_data['options']['A'].get(),
-                              q_data['options']['B'].get(),
-                              q_data['options']['C'].get(),
-                              q_data['options']['D'].get(),
-                              correct_answer, q_points))
-                
-                conn.commit()
-                conn.close()
+                        ''', [(assignment_id, q_data['question_entry'].get(1.0, tk.END).strip(),
+                               q_data['options']['A'].get(),
+                               q_data['options']['B'].get(),
+                               q_data['options']['C'].get(),
+                               q_data['options']['D'].get(),
+                               q_data['correct_var'].get(), int(q_data['points_entry'].get()))
+                              for q_data in quiz_questions])
                 
                 if assignment_type == "quiz":
                     messagebox.showinfo("Sucesso", 
@@ -1152,8 +4182,167 @@ class TeacherFrame(tk.Frame):
         tk.Button(button_frame, text="Cancelar", command=assignment_window.destroy,
                  bg="#f44336", fg="white", font=("Arial", 11), width=15).pack(side="left", padx=5)
     
+    def manage_quiz_bank(self):
+        """Question pools of the selected course: import/export JSON or CSV, create quizzes from them."""
+        selection = self.course_combo.get()
+        if not selection:
+            messagebox.showwarning("Aviso", "Por favor, selecione um curso primeiro.")
+            return
+        
+        course_id = int(selection.split("ID: ")[1].rstrip(")"))
+        course_name = selection.split(" (ID:")[0]
+        
+        bank_window = tk.Toplevel(self.controller)
+        bank_window.title(f"Banco de Questões - {course_name}")
+        bank_window.geometry("600x450")
+        bank_window.transient(self.controller)
+        
+        tk.Label(bank_window, text=f"Banco de Questões - {course_name}",
+                font=("Arial", 14, "bold")).pack(pady=10)
+        
+        pools_frame = tk.Frame(bank_window)
+        pools_frame.pack(fill="both", expand=True, padx=20, pady=5)
+        columns = ("Banco", "Questões", "Pontos")
+        pools_tree = ttk.Treeview(pools_frame, columns=columns, show="headings", height=10, selectmode="browse")
+        for col in columns:
+            pools_tree.heading(col, text=col)
+            pools_tree.column(col, width=300 if col == "Banco" else 100)
+        scrollbar = ttk.Scrollbar(pools_frame, orient="vertical", command=pools_tree.yview)
+        pools_tree.configure(yscrollcommand=scrollbar.set)
+        pools_tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+        
+        loading_label = tk.Label(bank_window, text="", font=("Arial", 9, "italic"), fg="#7f8c8d")
+        loading_label.pack()
+        
+        def load_pools():
+            db_worker.submit('teacher.quiz_bank', lambda cursor: fetch_question_pools(cursor, course_id),
+                             lambda pools: reconcile_tree(pools_tree, ((p[0], p[1:]) for p in pools)),
+                             indicator=loading_label)
+        
+        def selected_pool():
+            selection = pools_tree.selection()
+            if not selection:
+                messagebox.showwarning("Aviso", "Por favor, selecione um banco de questões.", parent=bank_window)
+                return None
+            return int(selection[0]), pools_tree.item(selection[0])['values'][0]
+        
+        def import_file():
+            path = filedialog.askopenfilename(parent=bank_window, title="Importar questões",
+                                              filetypes=[("Banco de questões", "*.json *.csv")])
+            if not path:
+                return
+            try:
+                questions = read_question_file(path)
+            except (OSError, ValueError) as e:
+                messagebox.showerror("Erro", f"Arquivo inválido: {e}", parent=bank_window)
+                return
+            if not questions:
+                messagebox.showwarning("Aviso", "O arquivo não contém questões.", parent=bank_window)
+                return
+            
+            # New questions go to the selected pool, or to a pool named after the file
+            selection = pools_tree.selection()
+            name = (pools_tree.item(selection[0])['values'][0] if selection
+                    else os.path.splitext(os.path.basename(path))[0])
+            try:
+                db.run_write(import_question_pool, course_id, name, questions)
+            except sqlite3.Error as e:
+                messagebox.showerror("Erro", f"Falha ao importar: {e}", parent=bank_window)
+                return
+            messagebox.showinfo("Sucesso", f"{len(questions)} questão(ões) importada(s) para '{name}'.",
+                                parent=bank_window)
+            load_pools()
+        
+        def export_file():
+            pool = selected_pool()
+            if pool is None:
+                return
+            path = filedialog.asksaveasfilename(parent=bank_window, title="Exportar questões",
+                                                initialfile=f"{pool[1]}.json", defaultextension=".json",
+                                                filetypes=[("JSON", "*.json"), ("CSV", "*.csv")])
+            if not path:
+                return
+            with db.cursor() as cursor:
+                questions = export_question_pool(cursor, pool[0])
+            try:
+                write_question_file(path, questions)
+            except OSError as e:
+                messagebox.showerror("Erro", f"Falha ao exportar: {e}", parent=bank_window)
+                return
+            messagebox.showinfo("Sucesso", f"{len(questions)} questão(ões) exportada(s).", parent=bank_window)
+        
+        def create_quiz():
+            pool = selected_pool()
+            if pool is None:
+                return
+            
+            quiz_window = tk.Toplevel(bank_window)
+            quiz_window.title(f"Criar Quiz - {pool[1]}")
+            quiz_window.geometry("400x300")
+            quiz_window.transient(bank_window)
+            quiz_window.grab_set()
+            
+            tk.Label(quiz_window, text="Título do Quiz:").pack(anchor='w', padx=20, pady=(10, 0))
+            title_entry = tk.Entry(quiz_window, width=40)
+            title_entry.pack(anchor='w', padx=20)
+            title_entry.insert(0, pool[1])
+            
+            tk.Label(quiz_window, text="Data de Entrega (AAAA-MM-DD):").pack(anchor='w', padx=20, pady=(10, 0))
+            due_entry = tk.Entry(quiz_window, width=20)
+            due_entry.pack(anchor='w', padx=20)
+            
+            tk.Label(quiz_window, text="Número de questões (vazio = todas, sorteadas se menor):").pack(
+                anchor='w', padx=20, pady=(10, 0))
+            count_entry = tk.Entry(quiz_window, width=10)
+            count_entry.pack(anchor='w', padx=20)
+            
+            all_sections = tk.BooleanVar(value=False)
+            tk.Checkbutton(quiz_window, text="Criar em todas as minhas disciplinas",
+                          variable=all_sections).pack(anchor='w', padx=20, pady=10)
+            
+            def save():
+                title = title_entry.get().strip()
+                due_date = due_entry.get().strip()
+                if not title:
+                    messagebox.showerror("Erro", "Por favor, insira um título para o quiz.", parent=quiz_window)
+                    return
+                try:
+                    count = int(count_entry.get()) if count_entry.get().strip() else None
+                except ValueError:
+                    messagebox.showerror("Erro", "O número de questões deve ser um número.", parent=quiz_window)
+                    return
+                
+                course_ids = [course_id]
+                if all_sections.get():
+                    course_ids = [int(value.split("ID: ")[1].rstrip(")")) for value in self.course_combo['values']]
+                try:
+                    created = db.run_write(create_quiz_from_pool, pool[0], course_ids, title, due_date, '', count)
+                except (ValueError, sqlite3.Error) as e:
+                    messagebox.showerror("Erro", f"Falha ao criar quiz: {e}", parent=quiz_window)
+                    return
+                messagebox.showinfo("Sucesso", f"Quiz '{title}' criado em {len(created)} disciplina(s).",
+                                    parent=quiz_window)
+                quiz_window.destroy()
+            
+            tk.Button(quiz_window, text="Criar Quiz", command=save,
+                     bg="#4CAF50", fg="white").pack(pady=10)
+        
+        button_frame = tk.Frame(bank_window)
+        button_frame.pack(pady=10)
+        tk.Button(button_frame, text="Importar Arquivo...", command=import_file,
+                 bg="#2196F3", fg="white").pack(side="left", padx=5)
+        tk.Button(button_frame, text="Exportar...", command=export_file,
+                 bg="#607D8B", fg="white").pack(side="left", padx=5)
+        tk.Button(button_frame, text="Criar Quiz", command=create_quiz,
+                 bg="#4CAF50", fg="white").pack(side="left", padx=5)
+        tk.Button(button_frame, text="Fechar", command=bank_window.destroy,
+                 bg="#f44336", fg="white").pack(side="left", padx=5)
+        
+        load_pools()
+    
     def manage_course_materials(self):
-        """Manage course materials and content."""
+        """Manage course materials and content, persisted per course; each tab loads when first opened."""
         selection = self.course_combo.get()
         if not selection:
             messagebox.showwarning("Aviso", "Por favor, selecione um curso primeiro.")
@@ -1164,13 +4353,16 @@ class TeacherFrame(tk.Frame):
         
         materials_window = tk.Toplevel(self.controller)
         materials_window.title(f"Materiais da Disciplina - {course_name}")
-        materials_window.geometry("600x500")
+        materials_window.geometry("700x550")
         materials_window.transient(self.controller)
         materials_window.grab_set()
         
         tk.Label(materials_window, text=f"Materiais da Disciplina para {course_name}", 
                 font=("Arial", 14, "bold")).pack(pady=10)
         
+        loading_label = tk.Label(materials_window, text="", font=("Arial", 9, "italic"), fg="#7f8c8d")
+        loading_label.pack()
+        
         # Notebook for different types of content
         notebook = ttk.Notebook(materials_window)
         notebook.pack(fill="both", expand=True, padx=20, pady=10)
@@ -1183,7 +4375,7 @@ class TeacherFrame(tk.Frame):
         syllabus_text = tk.Text(syllabus_frame, height=15, font=("Arial", 10))
         syllabus_text.pack(fill="both", expand=True, padx=10, pady=5)
         
-        # Load existing syllabus or add sample content
+        # Template shown until the course has a saved syllabus
         sample_syllabus = f"""Disciplina: {course_name}
         
 Descrição da Disciplina:
@@ -1213,45 +4405,17 @@ Semana 5-6: Aplicações
 Semana 7-8: Tópicos Avançados
 Semana 9-10: Revisão e Avaliação
 """
-        syllabus_text.insert(1.0, sample_syllabus)
         
         # Lessons tab
         lessons_frame = tk.Frame(notebook)
         notebook.add(lessons_frame, text="Aulas")
         
         tk.Label(lessons_frame, text="Aulas do Curso", font=("Arial", 12, "bold")).pack(pady=5)
-        
-        lessons_list_frame = tk.Frame(lessons_frame)
-        lessons_list_frame.pack(fill="both", expand=True, padx=10, pady=5)
-        
-        lessons_listbox = tk.Listbox(lessons_list_frame, font=("Arial", 10))
-        lessons_listbox.pack(side="left", fill="both", expand=True)
-        
-        lessons_scroll = ttk.Scrollbar(lessons_list_frame, orient="vertical", command=lessons_listbox.yview)
-        lessons_listbox.configure(yscrollcommand=lessons_scroll.set)
-        lessons_scroll.pack(side="right", fill="y")
-        
-        # Sample lessons
-        sample_lessons = [
-            "Aula 1: Introdução ao Assunto",
-            "Aula 2: Princípios e Conceitos Básicos",
-            "Aula 3: Aplicações Práticas",
-            "Aula 4: Técnicas de Resolução de Problemas",
-            "Aula 5: Estudos de Caso e Exemplos",
-            "Aula 6: Visão Geral de Tópicos Avançados",
-            "Aula 7: Revisão e Prática",
-            "Aula 8: Preparação para Avaliação Final"
-        ]
-        
-        for lesson in sample_lessons:
-            lessons_listbox.insert(tk.END, lesson)
+        lessons_tree = self._materials_tree(lessons_frame, ("Aula", "Anexo", "Tamanho"))
         
         lesson_buttons = tk.Frame(lessons_frame)
         lesson_buttons.pack(pady=5)
         
-        tk.Button(lesson_buttons, text="Adicionar Aula", bg="#4CAF50", fg="white",
-                 command=lambda: self.add_lesson_dialog(lessons_listbox)).pack(side="left", padx=5)
-        
         # Resources tab
         resources_frame = tk.Frame(notebook)
         notebook.add(resources_frame, text="Recursos")
@@ -1282,11 +4446,128 @@ Suporte:
 • Grupos de Estudo: [Informações]
 • Fórum Online: [URL]
 """
-        resources_text.insert(1.0, sample_resources)
+        
+        # Files tab
+        files_frame = tk.Frame(notebook)
+        notebook.add(files_frame, text="Arquivos")
+        
+        tk.Label(files_frame, text="Arquivos do Curso", font=("Arial", 12, "bold")).pack(pady=5)
+        files_tree = self._materials_tree(files_frame, ("Arquivo", "Tamanho", "Enviado em"))
+        
+        file_buttons = tk.Frame(files_frame)
+        file_buttons.pack(pady=5)
+        
+        texts = {'syllabus': ("Ementa", syllabus_text, sample_syllabus),
+                 'resources': ("Recursos", resources_text, sample_resources)}
+        trees = {'lesson': lessons_tree, 'file': files_tree}
+        tab_kinds = {str(syllabus_frame): 'syllabus', str(lessons_frame): 'lesson',
+                     str(resources_frame): 'resources', str(files_frame): 'file'}
+        materials = {}  # material id -> (blob_sha256, filename), for the loaded lists
+        loaded = set()
+        
+        def load(kind):
+            db_worker.submit(f'teacher.materials.{kind}',
+                             lambda cursor: fetch_course_materials(cursor, course_id, kind),
+                             lambda rows: show(kind, rows), indicator=loading_label)
+        
+        def show(kind, rows):
+            loaded.add(kind)
+            if kind in texts:
+                _, text_widget, template = texts[kind]
+                text_widget.delete(1.0, tk.END)
+                text_widget.insert(1.0, rows[-1][2] if rows else template)
+                return
+            
+            items = []
+            for material_id, title, body, sha256, filename, size, created_at in rows:
+                materials[material_id] = (sha256, filename)
+                if kind == 'lesson':
+                    values = (title, filename or "", format_size(size))
+                else:
+                    values = (title, format_size(size), created_at)
+                items.append((material_id, values))
+            reconcile_tree(trees[kind], items)
+        
+        def on_tab_changed(event):
+            kind = tab_kinds[notebook.select()]
+            if kind not in loaded:
+                load(kind)
+        
+        notebook.bind('<<NotebookTabChanged>>', on_tab_changed)
+        load('syllabus')
+        
+        def selected_material(kind):
+            selection = trees[kind].selection()
+            if not selection:
+                messagebox.showwarning("Aviso", "Por favor, selecione um item.", parent=materials_window)
+                return None
+            return int(selection[0])
+        
+        def upload_file():
+            path = filedialog.askopenfilename(parent=materials_window, title="Enviar arquivo")
+            if path:
+                self.upload_course_file(course_id, 'file', os.path.basename(path), path,
+                                        lambda material_id: load('file'), loading_label)
+        
+        def download(kind):
+            material_id = selected_material(kind)
+            if material_id is None:
+                return
+            sha256, filename = materials[material_id]
+            if sha256 is None:
+                messagebox.showinfo("Info", "Esta aula não tem arquivo anexado.", parent=materials_window)
+                return
+            target = filedialog.asksaveasfilename(parent=materials_window, title="Salvar arquivo",
+                                                  initialfile=filename)
+            if not target:
+                return
+            # Streamed off the Tk thread; the key is per target so parallel downloads all finish
+            transfer_worker.submit(f'teacher.materials.download.{target}',
+                                   lambda cursor: blob_store.copy_to(sha256, target),
+                                   lambda size: messagebox.showinfo(
+                                       "Sucesso", f"Arquivo salvo ({format_size(size)}).",
+                                       parent=materials_window),
+                                   indicator=loading_label,
+                                   on_error=lambda e: messagebox.showerror(
+                                       "Erro", f"Falha ao salvar o arquivo: {e}", parent=materials_window))
+        
+        def remove(kind):
+            material_id = selected_material(kind)
+            if material_id is None:
+                return
+            if not messagebox.askyesno("Confirmar", "Remover o item selecionado?", parent=materials_window):
+                return
+            db.run_write(delete_course_material, material_id)
+            load(kind)
+        
+        tk.Button(lesson_buttons, text="Adicionar Aula", bg="#4CAF50", fg="white",
+                 command=lambda: self.add_lesson_dialog(course_id, lambda: load('lesson'),
+                                                        loading_label)).pack(side="left", padx=5)
+        tk.Button(lesson_buttons, text="Baixar Anexo", bg="#2196F3", fg="white",
+                 command=lambda: download('lesson')).pack(side="left", padx=5)
+        tk.Button(lesson_buttons, text="Remover Aula", bg="#f44336", fg="white",
+                 command=lambda: remove('lesson')).pack(side="left", padx=5)
+        
+        tk.Button(file_buttons, text="Enviar Arquivo...", bg="#4CAF50", fg="white",
+                 command=upload_file).pack(side="left", padx=5)
+        tk.Button(file_buttons, text="Baixar...", bg="#2196F3", fg="white",
+                 command=lambda: download('file')).pack(side="left", padx=5)
+        tk.Button(file_buttons, text="Remover", bg="#f44336", fg="white",
+                 command=lambda: remove('file')).pack(side="left", padx=5)
         
         def save_materials():
-            """Save course materials (in a real system, this would save to database)."""
-            messagebox.showinfo("Salvo", "Materiais do curso foram salvos com sucesso!")
+            """Save the syllabus and resources texts in one transaction."""
+            def save(cursor):
+                for kind, (title, text_widget, _) in texts.items():
+                    if kind in loaded:
+                        save_course_text(cursor, course_id, kind, title, text_widget.get(1.0, tk.END).strip())
+            
+            try:
+                db.run_write(save)
+            except sqlite3.Error as e:
+                messagebox.showerror("Erro", f"Falha ao salvar os materiais: {e}", parent=materials_window)
+                return
+            messagebox.showinfo("Salvo", "Materiais do curso foram salvos com sucesso!", parent=materials_window)
         
         # Buttons
         button_frame = tk.Frame(materials_window)
@@ -1298,11 +4579,39 @@ Suporte:
         tk.Button(button_frame, text="Fechar", command=materials_window.destroy,
                  bg="#f44336", fg="white", font=("Arial", 11), width=15).pack(side="left", padx=5)
     
-    def add_lesson_dialog(self, lessons_listbox):
-        """Add a new lesson to the course."""
+    @staticmethod
+    def _materials_tree(parent, columns) -> ttk.Treeview:
+        """A single-selection Treeview with scrollbar for a materials tab."""
+        list_frame = tk.Frame(parent)
+        list_frame.pack(fill="both", expand=True, padx=10, pady=5)
+        tree = ttk.Treeview(list_frame, columns=columns, show="headings", height=10, selectmode="browse")
+        for col in columns:
+            tree.heading(col, text=col)
+            tree.column(col, width=300 if col == columns[0] else 120)
+        scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+        return tree
+    
+    def upload_course_file(self, course_id, kind, title, path, on_done, indicator=None):
+        """Store the file at path in blob_store and add it as a material, on transfer_worker.
+        
+        on_done(material_id) runs on the Tk thread once the row is committed.
+        """
+        def work(cursor):
+            blob = blob_store.put(path)
+            return db.run_write(add_course_material, course_id, kind, title, None, blob,
+                                os.path.basename(path))
+        
+        transfer_worker.submit(f'teacher.materials.upload.{path}', work, on_done, indicator=indicator,
+                               on_error=lambda e: messagebox.showerror("Erro", f"Falha ao enviar o arquivo: {e}"))
+    
+    def add_lesson_dialog(self, course_id, on_added, indicator=None):
+        """Add a new lesson, optionally with an attached file, to the course."""
         lesson_window = tk.Toplevel(self.controller)
         lesson_window.title("Add New Lesson")
-        lesson_window.geometry("400x200")
+        lesson_window.geometry("400x230")
         lesson_window.transient(self.controller)
         lesson_window.grab_set()
         
@@ -1312,16 +4621,187 @@ Suporte:
         lesson_entry = tk.Entry(lesson_window, font=("Arial", 11), width=40)
         lesson_entry.pack(pady=5)
         
+        attachment = {'path': None}
+        attachment_label = tk.Label(lesson_window, text="Nenhum arquivo anexado", fg="#7f8c8d")
+        
+        def choose_file():
+            path = filedialog.askopenfilename(parent=lesson_window, title="Anexar arquivo")
+            if path:
+                attachment['path'] = path
+                attachment_label.config(text=os.path.basename(path))
+        
+        tk.Button(lesson_window, text="Anexar Arquivo...", command=choose_file).pack(pady=(5, 0))
+        attachment_label.pack()
+        
         def add_lesson():
             lesson_title = lesson_entry.get().strip()
-            if lesson_title:
-                lessons_listbox.insert(tk.END, lesson_title)
-                lesson_window.destroy()
-            else:
+            if not lesson_title:
                 messagebox.showerror("Erro", "Por favor, insira um título para a aula.")
+                return
+            
+            if attachment['path']:
+                self.upload_course_file(course_id, 'lesson', lesson_title, attachment['path'],
+                                        lambda material_id: on_added(), indicator)
+            else:
+                db.run_write(add_course_material, course_id, 'lesson', lesson_title)
+                on_added()
+            lesson_window.destroy()
         
         tk.Button(lesson_window, text="Add Lesson", command=add_lesson,
-                 bg="#4CAF50", fg="white", font=("Arial", 11)).pack(pady=20)
+                 bg="#4CAF50", fg="white", font=("Arial", 11)).pack(pady=15)
+    
+    def save_attachments(self, parent, attachments):
+        """Ask where to save a submission's attachments and stream them there on transfer_worker.
+        
+        attachments are rows from fetch_submission_attachments. A single file
+        goes to a chosen path; several go into a chosen folder under their
+        own names, numbered when two share a name.
+        """
+        if not attachments:
+            messagebox.showinfo("Info", "Esta entrega não tem arquivos anexados.", parent=parent)
+            return
+        
+        if len(attachments) == 1:
+            target = filedialog.asksaveasfilename(parent=parent, title="Salvar anexo",
+                                                  initialfile=attachments[0][1])
+            if not target:
+                return
+            targets = [target]
+        else:
+            folder = filedialog.askdirectory(parent=parent, title="Salvar anexos em")
+            if not folder:
+                return
+            targets, used = [], set()
+            for attachment_id, filename, *_ in attachments:
+                name = filename if filename not in used else f"{attachment_id}_{filename}"
+                used.add(name)
+                targets.append(os.path.join(folder, name))
+        
+        progress = TransferProgress(parent, sum(attachment[3] for attachment in attachments))
+        progress.frame.pack(pady=5)
+        
+        def download(cursor):
+            offset = 0
+            for attachment, target in zip(attachments, targets):
+                offset += blob_store.copy_to(attachment[2], target, progress.reporter(offset))
+            return offset
+        
+        def saved(size):
+            progress.stop()
+            messagebox.showinfo("Sucesso", f"{len(targets)} arquivo(s) salvo(s) ({format_size(size)}).",
+                                parent=parent)
+        
+        def failed(error):
+            progress.stop()
+            messagebox.showerror("Erro", f"Falha ao salvar o anexo: {error}", parent=parent)
+        
+        # The key is per target so parallel downloads all finish
+        transfer_worker.submit(f'teacher.attachments.download.{targets[0]}', download, saved, on_error=failed)
+    
+    def regrade_quiz_dialog(self, parent, assignment_id, on_done):
+        """Fix a quiz's answer key or points and recompute every grade; on_done() runs after saving."""
+        with db.cursor() as cursor:
+            cursor.execute('SELECT title FROM assignments WHERE id = ?', (assignment_id,))
+            quiz_title = cursor.fetchone()[0]
+            cursor.execute('''
+                SELECT id, question_text, correct_answer, points FROM quiz_questions
+                WHERE assignment_id = ? ORDER BY id
+            ''', (assignment_id,))
+            questions = cursor.fetchall()
+        
+        key_window = tk.Toplevel(parent)
+        key_window.title(f"Corrigir Gabarito - {quiz_title}")
+        key_window.geometry("700x500")
+        key_window.transient(parent)
+        key_window.grab_set()
+        
+        tk.Label(key_window, text=f"Gabarito: {quiz_title}", font=("Arial", 14, "bold")).pack(pady=10)
+        tk.Label(key_window, text="Altere a resposta ou a pontuação das questões e recalcule as notas "
+                                  "de todas as entregas.", font=("Arial", 9), fg="#7f8c8d").pack()
+        
+        tree_frame = tk.Frame(key_window)
+        tree_frame.pack(fill="both", expand=True, padx=20, pady=10)
+        columns = ("#", "Questão", "Resposta", "Pontos")
+        key_tree = ttk.Treeview(tree_frame, columns=columns, show="headings", height=12, selectmode="browse")
+        for col, width in zip(columns, (40, 420, 80, 70)):
+            key_tree.heading(col, text=col)
+            key_tree.column(col, width=width)
+        key_tree.tag_configure('changed', background="#fff3cd")
+        scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=key_tree.yview)
+        key_tree.configure(yscrollcommand=scrollbar.set)
+        key_tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+        
+        for number, (question_id, text, answer, points) in enumerate(questions, 1):
+            key_tree.insert("", "end", iid=question_id, values=(number, text, answer, points))
+        
+        edit_frame = tk.Frame(key_window)
+        edit_frame.pack(pady=5)
+        tk.Label(edit_frame, text="Resposta correta:").pack(side="left")
+        answer_combo = ttk.Combobox(edit_frame, values=["A", "B", "C", "D"], state="readonly", width=4)
+        answer_combo.pack(side="left", padx=5)
+        tk.Label(edit_frame, text="Pontos:").pack(side="left", padx=(10, 0))
+        points_entry = tk.Entry(edit_frame, width=6)
+        points_entry.pack(side="left", padx=5)
+        
+        changes = {}  # question id -> {'correct_answer': ..., 'points': ...}
+        
+        def on_select(event):
+            selection = key_tree.selection()
+            if not selection:
+                return
+            _, _, answer, points = key_tree.item(selection[0])['values']
+            answer_combo.set(answer)
+            points_entry.delete(0, tk.END)
+            points_entry.insert(0, str(points))
+        
+        key_tree.bind('<<TreeviewSelect>>', on_select)
+        
+        def apply_change():
+            selection = key_tree.selection()
+            if not selection:
+                messagebox.showwarning("Aviso", "Por favor, selecione uma questão.", parent=key_window)
+                return
+            try:
+                points = int(points_entry.get())
+                if points < 0:
+                    raise ValueError
+            except ValueError:
+                messagebox.showerror("Erro", "Os pontos devem ser um número inteiro não negativo.",
+                                     parent=key_window)
+                return
+            question_id = int(selection[0])
+            number, text, _, _ = key_tree.item(selection[0])['values']
+            changes[question_id] = {'correct_answer': answer_combo.get(), 'points': points}
+            key_tree.item(selection[0], values=(number, text, answer_combo.get(), points), tags=('changed',))
+        
+        def regrade():
+            if not changes:
+                messagebox.showwarning("Aviso", "Nenhuma questão foi alterada.", parent=key_window)
+                return
+            if not messagebox.askyesno("Confirmar", "Recalcular as notas de todas as entregas deste quiz?",
+                                       parent=key_window):
+                return
+            try:
+                result = db.run_write(regrade_quiz, assignment_id, changes)
+            except (ValueError, sqlite3.Error) as e:
+                messagebox.showerror("Erro", f"Falha ao recalcular: {e}", parent=key_window)
+                return
+            messagebox.showinfo("Sucesso", f"{result['questions']} questão(ões) alterada(s), "
+                                           f"{result['answers']} resposta(s) reavaliada(s) e "
+                                           f"{result['grades']} nota(s) alterada(s).", parent=key_window)
+            key_window.destroy()
+            on_done()
+        
+        tk.Button(edit_frame, text="Aplicar", command=apply_change,
+                 bg="#2196F3", fg="white").pack(side="left", padx=10)
+        
+        button_frame = tk.Frame(key_window)
+        button_frame.pack(pady=10)
+        tk.Button(button_frame, text="Recalcular Notas", command=regrade,
+                 bg="#4CAF50", fg="white", font=("Arial", 11)).pack(side="left", padx=5)
+        tk.Button(button_frame, text="Cancelar", command=key_window.destroy,
+                 bg="#f44336", fg="white", font=("Arial", 11)).pack(side="left", padx=5)
     
     def view_submissions(self):
         """View and grade student submissions."""
@@ -1342,6 +4822,10 @@ Suporte:
         tk.Label(submissions_window, text=f"Entregas dos Estudantes para {course_name}", 
                 font=("Arial", 14, "bold")).pack(pady=10)
         
+        # Summary of the selected assignment, filled in by show_submissions
+        summary_label = tk.Label(submissions_window, text="", font=("Arial", 10), fg="#2c3e50")
+        summary_label.pack()
+        
         # Assignment selection
         assignment_frame = tk.Frame(submissions_window)
         assignment_frame.pack(fill="x", padx=20, pady=5)
@@ -1351,14 +4835,12 @@ Suporte:
         assignment_combo.pack(side="left", padx=10)
         
         # Load assignments for this course
-        conn = sqlite3.connect('academic_system.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT id, title, due_date FROM assignments 
-            WHERE course_id = ? ORDER BY due_date DESC
-        ''', (course_id,))
-        assignments = cursor.fetchall()
-        conn.close()
+        with db.cursor() as cursor:
+            cursor.execute('''
+                SELECT id, title, due_date FROM assignments 
+                WHERE course_id = ? ORDER BY due_date DESC
+            ''', (course_id,))
+            assignments = cursor.fetchall()
         
         if assignments:
             assignment_list = [f"{assignment[1]} - Due: {assignment[2]} (ID: {assignment[0]})" for assignment in assignments]
@@ -1367,6 +4849,9 @@ Suporte:
         else:
             assignment_combo['values'] = ["No assignments found"]
         
+        loading_label = tk.Label(assignment_frame, text="", font=("Arial", 9, "italic"), fg="#7f8c8d")
+        loading_label.pack(side="left", padx=5)
+        
         # Submissions display
         submissions_frame = tk.LabelFrame(submissions_window, text="Entregas", 
                                         font=("Arial", 12, "bold"))
@@ -1393,56 +4878,35 @@ Suporte:
                 return
             
             assignment_id = int(selection.split("ID: ")[1].rstrip(")"))
+            db_worker.submit('teacher.submissions', lambda cursor: submission_listing.get(cursor, assignment_id),
+                             show_submissions, indicator=loading_label)
+        
+        def show_submissions(result):
+            assignment_type, total_questions, students, summary = result
             
-            # Check if this is a quiz
-            conn = sqlite3.connect('academic_system.db')
-            cursor = conn.cursor()
-            cursor.execute('SELECT type FROM assignments WHERE id = ?', (assignment_id,))
-            assignment_type = cursor.fetchone()[0]
-            conn.close()
-            
-            # Clear existing items
-            for item in submissions_tree.get_children():
-                submissions_tree.delete(item)
-            
-            conn = sqlite3.connect('academic_system.db')
-            cursor = conn.cursor()
+            summary_text = (f"Matriculados: {summary['enrolled']}  |  Entregues: {summary['submitted']}  |  "
+                            f"Avaliados: {summary['graded']}  |  Faltando: {summary['missing']}")
+            if summary['graded']:
+                summary_text += f"  |  Média: {summary['mean']:.1f}  |  Mediana: {summary['median']:.1f}"
+            summary_label.config(text=summary_text)
             
             if assignment_type == "quiz":
-                # For quizzes, show additional quiz-specific information
-                cursor.execute('''
-                    SELECT u.id, u.first_name || ' ' || u.last_name as name,
-                           s.submitted_at, s.grade, s.id as submission_id,
-                           (SELECT COUNT(*) FROM quiz_answers qa 
-                            JOIN quiz_questions qq ON qa.question_id = qq.id 
-                            WHERE qa.submission_id = s.id AND qa.is_correct = 1) as correct_answers,
-                           (SELECT COUNT(*) FROM quiz_questions qq 
-                            WHERE qq.assignment_id = ?) as total_questions
-                    FROM users u
-                    JOIN enrollments e ON u.id = e.user_id
-                    LEFT JOIN submissions s ON u.id = s.student_id AND s.assignment_id = ?
-                    WHERE e.course_id = ? AND u.role = 'STUDENT'
-                    ORDER BY u.first_name, u.last_name
-                ''', (assignment_id, assignment_id, course_id))
+                files_button.pack_forget()
+                quiz_button.pack(side="left", padx=5, after=grade_button)
+                key_button.pack(side="left", padx=5, after=quiz_button)
             else:
-                # Get all students enrolled in this course with their submission status
-                cursor.execute('''
-                    SELECT u.id, u.first_name || ' ' || u.last_name as name,
-                           s.submitted_at, s.grade, s.id as submission_id, NULL, NULL
-                    FROM users u
-                    JOIN enrollments e ON u.id = e.user_id
-                    LEFT JOIN submissions s ON u.id = s.student_id AND s.assignment_id = ?
-                    WHERE e.course_id = ? AND u.role = 'STUDENT'
-                    ORDER BY u.first_name, u.last_name
-                ''', (assignment_id, course_id))
+                quiz_button.pack_forget()
+                key_button.pack_forget()
+                files_button.pack(side="left", padx=5, after=grade_button)
             
-            students = cursor.fetchall()
-            conn.close()
+            submissions_tree.delete(*submissions_tree.get_children())
             
             for student_data in students:
-                student_id, student_name, submission_date, grade, submission_id, correct_answers, total_questions = student_data
+                student_id, student_name, submission_date, grade, submission_id, correct_answers = student_data
                 
-                if submission_date:  # Student has submitted
+                if submission_id is not None:  # Submitted, or graded in the grade grid
+                    if not submission_date:
+                        submission_date = "Nota lançada pelo professor"
                     if grade is not None:
                         status = "Avaliado"
                         display_grade = f"{grade:.1f}"
@@ -1460,12 +4924,6 @@ Suporte:
                         student_name, "Não Entregue", "N/A", "Faltando"
                     ), tags=("none", assignment_type))
         
-        assignment_combo.bind('<<ComboboxSelected>>', lambda e: load_submissions())
-        
-        # Load initial submissions
-        if assignments:
-            load_submissions()
-        
         def grade_submission():
             """Grade the selected submission."""
             selection = submissions_tree.selection()
@@ -1487,11 +4945,9 @@ Suporte:
                 return
             
             # Get submission content
-            conn = sqlite3.connect('academic_system.db')
-            cursor = conn.cursor()
-            cursor.execute('SELECT feedback FROM submissions WHERE id = ?', (submission_id,))
-            submission_content = cursor.fetchone()
-            conn.close()
+            with db.cursor() as cursor:
+                cursor.execute('SELECT feedback FROM submissions WHERE id = ?', (submission_id,))
+                submission_content = cursor.fetchone()
             
             # Grade entry dialog
             grade_window = tk.Toplevel(self.controller)
@@ -1546,19 +5002,14 @@ Suporte:
                     feedback = feedback_text.get(1.0, tk.END).strip()
                     
                     # Update grade in database
-                    conn = sqlite3.connect('academic_system.db')
-                    cursor = conn.cursor()
-                    cursor.execute('''
-                        UPDATE submissions SET grade = ? 
-                        WHERE id = ?
-                    ''', (grade, submission_id))
-                    conn.commit()
-                    conn.close()
+                    with db.transaction() as cursor:
+                        cursor.execute('''
+                            UPDATE submissions SET grade = ? 
+                            WHERE id = ?
+                        ''', (grade, submission_id))
                     
-                    # Update the treeview
-                    submissions_tree.item(selection[0], values=(
-                        student_name, item['values'][1], f"{grade:.1f}", "Graded"
-                    ))
+                    # Reload so the row and the header stats show the new grade
+                    load_submissions()
                     
                     messagebox.showinfo("Sucesso", f"Nota {grade} salva para {student_name}")
                     grade_window.destroy()
@@ -1597,30 +5048,27 @@ Suporte:
                 return
             
             # Get quiz results
-            conn = sqlite3.connect('academic_system.db')
-            cursor = conn.cursor()
+            with db.cursor() as cursor:
+                # Get assignment details
+                assignment_selection = assignment_combo.get()
+                assignment_id = int(assignment_selection.split("ID: ")[1].rstrip(")"))
             
-            # Get assignment details
-            assignment_selection = assignment_combo.get()
-            assignment_id = int(assignment_selection.split("ID: ")[1].rstrip(")"))
-            
-            cursor.execute('''
-                SELECT title FROM assignments WHERE id = ?
-            ''', (assignment_id,))
-            quiz_title = cursor.fetchone()[0]
+                cursor.execute('''
+                    SELECT title FROM assignments WHERE id = ?
+                ''', (assignment_id,))
+                quiz_title = cursor.fetchone()[0]
             
-            # Get questions and answers
-            cursor.execute('''
-                SELECT qq.id, qq.question_text, qq.option_a, qq.option_b, qq.option_c, qq.option_d, 
-                       qq.correct_answer, qq.points, qa.selected_answer, qa.is_correct
-                FROM quiz_questions qq
-                LEFT JOIN quiz_answers qa ON qq.id = qa.question_id AND qa.submission_id = ?
-                WHERE qq.assignment_id = ?
-                ORDER BY qq.id
-            ''', (submission_id, assignment_id))
+                # Get questions and answers
+                cursor.execute('''
+                    SELECT qq.id, qq.question_text, qq.option_a, qq.option_b, qq.option_c, qq.option_d, 
+                           qq.correct_answer, qq.points, qa.selected_answer, qa.is_correct
+                    FROM quiz_questions qq
+                    LEFT JOIN quiz_answers qa ON qq.id = qa.question_id AND qa.submission_id = ?
+                    WHERE qq.assignment_id = ?
+                    ORDER BY qq.id
+                ''', (submission_id, assignment_id))
             
-            quiz_data = cursor.fetchall()
-            conn.close()
+                quiz_data = cursor.fetchall()
             
             # Show detailed quiz results
             show_teacher_quiz_results(quiz_title, item['values'][0], quiz_data)
@@ -1715,32 +5163,53 @@ Suporte:
             tk.Button(results_window, text="Fechar", command=results_window.destroy,
                      bg="#f44336", fg="white", font=("Arial", 11)).pack(pady=10)
         
+        def download_attachments():
+            """Save the files attached to the selected submission."""
+            selection = submissions_tree.selection()
+            if not selection:
+                messagebox.showwarning("Aviso", "Por favor, selecione uma entrega.", parent=submissions_window)
+                return
+            submission_id = submissions_tree.item(selection[0])['tags'][0]
+            if submission_id == "none":
+                messagebox.showwarning("Aviso", "Nenhuma entrega encontrada para este estudante.",
+                                       parent=submissions_window)
+                return
+            db_worker.submit('teacher.submissions.attachments',
+                             lambda cursor: fetch_submission_attachments(cursor, int(submission_id)),
+                             lambda attachments: self.save_attachments(submissions_window, attachments),
+                             indicator=loading_label)
+        
         # Buttons
         button_frame = tk.Frame(submissions_window)
         button_frame.pack(pady=10)
         
-        tk.Button(button_frame, text="Avaliar Selecionado", command=grade_submission,
-                 bg="#4CAF50", fg="white", font=("Arial", 11), width=15).pack(side="left", padx=5)
-        
-        def check_quiz_button():
-            """Verificar se deve mostrar o botão de detalhes do quiz."""
-            selection = assignment_combo.get()
-            if selection and "Quiz" in selection:
-                quiz_button.pack(side="left", padx=5)
-            else:
-                quiz_button.pack_forget()
+        grade_button = tk.Button(button_frame, text="Avaliar Selecionado", command=grade_submission,
+                                bg="#4CAF50", fg="white", font=("Arial", 11), width=15)
+        grade_button.pack(side="left", padx=5)
         
+        # Shown by show_submissions when the selected assignment is a quiz
         quiz_button = tk.Button(button_frame, text="Detalhes do Quiz", command=view_quiz_details,
                                bg="#FF9800", fg="white", font=("Arial", 11), width=15)
-        
-        tk.Button(button_frame, text="Atualizar", command=lambda: [load_submissions(), check_quiz_button()],
+        # Shown by show_submissions for assignments other than quizzes
+        files_button = tk.Button(button_frame, text="Baixar Anexos", command=download_attachments,
+                                bg="#607D8B", fg="white", font=("Arial", 11), width=15)
+        key_button = tk.Button(button_frame, text="Corrigir Gabarito", width=15,
+                              bg="#9C27B0", fg="white", font=("Arial", 11),
+                              command=lambda: self.regrade_quiz_dialog(
+                                  submissions_window, int(assignment_combo.get().split("ID: ")[1].rstrip(")")),
+                                  load_submissions))
+        
+        tk.Button(button_frame, text="Atualizar", command=load_submissions,
                  bg="#2196F3", fg="white", font=("Arial", 11), width=15).pack(side="left", padx=5)
         
         tk.Button(button_frame, text="Fechar", command=submissions_window.destroy,
                  bg="#f44336", fg="white", font=("Arial", 11), width=15).pack(side="left", padx=5)
         
-        # Initial check for quiz button
-        assignment_combo.bind('<<ComboboxSelected>>', lambda e: [load_submissions(), check_quiz_button()])
+        assignment_combo.bind('<<ComboboxSelected>>', lambda e: load_submissions())
+        
+        # Load initial submissions
+        if assignments:
+            load_submissions()
 
 
 class StudentFrame(tk.Frame):
@@ -1765,6 +5234,10 @@ class StudentFrame(tk.Frame):
                               relief="flat", padx=20, pady=8, cursor="hand2")
         logout_btn.pack(side="right", padx=20)
         
+        self.loading_label = tk.Label(header_frame, text="", font=("Arial", 10, "italic"),
+                                     bg="#2c3e50", fg="#bdc3c7")
+        self.loading_label.pack(side="right", padx=10)
+        
         # Main content with tabs
         content_frame = tk.Frame(self, bg="#f5f5f5")
         content_frame.pack(fill="both", expand=True, padx=20, pady=20)
@@ -1772,14 +5245,17 @@ class StudentFrame(tk.Frame):
         # Create Notebook for tabs
         notebook = ttk.Notebook(content_frame)
         notebook.pack(fill="both", expand=True)
+        self.notebook = notebook
         
         # Tab 1: Courses and Grades
         courses_tab = tk.Frame(notebook, bg="white")
         notebook.add(courses_tab, text="📚 Minhas Disciplinas")
         
-        # Tab 2: Notifications
+        # Tab 2: Notifications; the title carries the unread count
         notifications_tab = tk.Frame(notebook, bg="white")
         notebook.add(notifications_tab, text="🔔 Notificações")
+        self.notifications_tab = notifications_tab
+        notebook.bind('<<NotebookTabChanged>>', lambda e: self._mark_inbox_read())
         
         # ===== COURSES TAB =====
         # Enrolled courses
@@ -1819,6 +5295,20 @@ class StudentFrame(tk.Frame):
         self.notifications_frame = tk.Frame(notifications_tab, bg="white")
         self.notifications_frame.pack(fill="both", expand=True, padx=20, pady=(0, 20))
         
+        # Filled in by _show_notifications with the student's class
+        self.class_banner = tk.Label(self.notifications_frame, font=("Arial", 14, "bold"), fg="white")
+        self.class_banner.pack(fill="x", pady=(0, 20), ipady=15)
+        
+        feed_frame = tk.Frame(self.notifications_frame, bg="white")
+        feed_frame.pack(fill="both", expand=True)
+        self.feed = AnnouncementFeed(feed_frame, 'student.notifications.page', indicator=self.loading_label)
+        
+        # Inbox state of the student whose feed is loaded; see _show_notifications
+        self._inbox = None
+        self._poll_job = None
+        # Last StudentDashboard snapshot drawn; a cache hit returns the same object
+        self._dashboard = None
+        
         # Create Treeview for assignments
         columns = ("Disciplina", "Atividade", "Tipo", "Data de Entrega", "Status")
         self.assignments_tree = ttk.Treeview(assignments_frame, columns=columns, show="headings", height=6)
@@ -1871,146 +5361,238 @@ class StudentFrame(tk.Frame):
             self.welcome_label.config(
                 text=f"Painel do Estudante - Bem-vindo(a), {self.controller.current_user['first_name']}!"
             )
-            self.load_courses()
-            self.load_deadlines()
-            self.load_notifications()
+            self.load_dashboard()
     
-    def load_notifications(self):
-        """Load announcements for the student's class."""
+    def load_dashboard(self):
+        """Load courses, assignments and announcements as one snapshot, cached per student."""
         if not self.controller.current_user:
             return
         
-        # Clear existing notifications
-        for widget in self.notifications_frame.winfo_children():
-            widget.destroy()
-        
-        conn = sqlite3.connect('academic_system.db')
-        cursor = conn.cursor()
+        student_id = self.controller.current_user['id']
+        page_size = self.feed.page_size
         
-        # Get student's class
+        db_worker.submit('student.dashboard', lambda cursor: student_dashboard.get(cursor, student_id, page_size),
+                         lambda snapshot: self._show_dashboard(student_id, snapshot),
+                         indicator=self.loading_label)
+    
+    def _show_dashboard(self, student_id, snapshot):
+        if snapshot is self._dashboard:
+            return  # nothing changed since it was drawn
+        self._dashboard = snapshot
+        self._show_courses(snapshot['courses'])
+        self._show_assignments(snapshot['assignments'])
+        
+        student_class, rows, positions, state = snapshot['notifications']
+        class_id = student_class[0] if student_class else None
+        inbox = self._inbox
+        if inbox is not None and inbox['student_id'] == student_id and inbox['class_id'] == class_id:
+            # The loaded feed stays and gets only the announcements newer than it,
+            # unless the whole first page is new and some may be missing in between
+            new_rows = [row for row in rows if row[0] > inbox['since']]
+            if len(new_rows) < len(rows):
+                self._show_new_announcements(inbox, (student_class, new_rows, state))
+                return
+        self._show_notifications(student_id, snapshot['notifications'])
+    
+    # Announcements for a class (or none) plus the general ones, newest first.
+    # Each branch walks idx_announcements_class_created in order and the
+    # UNION ALL merges them, so a page reads only the rows it returns.
+    ANNOUNCEMENTS = KeysetQuery('''
+        SELECT id, title, content, priority, created_at, {sort_values}
+        FROM announcements
+        WHERE target_class_id = :class_id AND {keyset}
+        UNION ALL
+        SELECT id, title, content, priority, created_at, {sort_values}
+        FROM announcements
+        WHERE target_class_id IS NULL AND {keyset}
+        ORDER BY {order}
+    ''', {"Data": ('created_at',)}, key=('id',), default_sort="Data")
+    
+    # How often an open dashboard checks for new announcements
+    INBOX_POLL_MS = 15000
+    
+    @staticmethod
+    def fetch_student_class(cursor, student_id):
+        """(id, name) of the student's class, or None."""
         cursor.execute('''
             SELECT c.id, c.name
             FROM classes c
             JOIN student_classes sc ON c.id = sc.class_id
             WHERE sc.student_id = ?
-        ''', (self.controller.current_user['id'],))
+        ''', (student_id,))
+        return cursor.fetchone()
+    
+    @staticmethod
+    def fetch_inbox_state(cursor, student_id, class_id):
+        """(last seen id, newest visible id, unread count) of the student's announcements.
+        
+        Every part is a MAX or COUNT over one idx_announcements_class_id range.
+        """
+        cursor.execute('''
+            SELECT COALESCE((SELECT last_seen_id FROM announcement_inbox WHERE student_id = :student_id), 0),
+                   MAX(COALESCE((SELECT MAX(id) FROM announcements WHERE target_class_id = :class_id), 0),
+                       COALESCE((SELECT MAX(id) FROM announcements WHERE target_class_id IS NULL), 0))
+        ''', {'student_id': student_id, 'class_id': class_id})
+        last_seen, head = cursor.fetchone()
+        cursor.execute('''
+            SELECT (SELECT COUNT(*) FROM announcements WHERE target_class_id = :class_id AND id > :seen)
+                 + (SELECT COUNT(*) FROM announcements WHERE target_class_id IS NULL AND id > :seen)
+        ''', {'class_id': class_id, 'seen': last_seen})
+        return last_seen, head, cursor.fetchone()[0]
+    
+    @classmethod
+    def fetch_notifications(cls, cursor, student_id, limit=30):
+        """The student's class (or None), the newest page of their announcements and the inbox state."""
+        student_class = cls.fetch_student_class(cursor, student_id)
+        
+        # Without a class only the general announcements match
+        class_id = student_class[0] if student_class else None
+        rows, positions = cls.ANNOUNCEMENTS.page(cursor, {'class_id': class_id}, descending=True, limit=limit)
+        return student_class, rows, positions, cls.fetch_inbox_state(cursor, student_id, class_id)
+    
+    @classmethod
+    def fetch_new_announcements(cls, cursor, student_id, class_id, since):
+        """Poll for announcements newer than id since: (student class, new rows newest first, inbox state).
+        
+        new rows is None when the student's class changed, since the whole
+        feed must be read again then.
+        """
+        student_class = cls.fetch_student_class(cursor, student_id)
+        if (student_class[0] if student_class else None) != class_id:
+            return student_class, None, None
+        cursor.execute('''
+            SELECT id, title, content, priority, created_at
+            FROM announcements WHERE target_class_id = :class_id AND id > :since
+            UNION ALL
+            SELECT id, title, content, priority, created_at
+            FROM announcements WHERE target_class_id IS NULL AND id > :since
+            ORDER BY created_at DESC, id DESC
+        ''', {'class_id': class_id, 'since': since})
+        rows = cursor.fetchall()
+        return student_class, rows, cls.fetch_inbox_state(cursor, student_id, class_id)
+    
+    @staticmethod
+    def mark_announcements_read(cursor, student_id, last_id):
+        """Move the student's inbox cursor forward to last_id (never back)."""
+        cursor.execute('''
+            INSERT INTO announcement_inbox (student_id, last_seen_id) VALUES (?, ?)
+            ON CONFLICT (student_id) DO UPDATE SET
+                last_seen_id = MAX(last_seen_id, excluded.last_seen_id),
+                updated_at = CURRENT_TIMESTAMP
+        ''', (student_id, last_id))
+    
+    def load_notifications(self):
+        """Load announcements for the student's class."""
+        if not self.controller.current_user:
+            return
+        
+        student_id = self.controller.current_user['id']
+        page_size = self.feed.page_size
         
-        student_class = cursor.fetchone()
+        db_worker.submit('student.notifications',
+                         lambda cursor: self.fetch_notifications(cursor, student_id, page_size),
+                         lambda result: self._show_notifications(student_id, result),
+                         indicator=self.loading_label)
+    
+    def _show_notifications(self, student_id, result):
+        student_class, rows, positions, (last_seen, head, unread) = result
         
         if student_class:
             class_id, class_name = student_class
-            
-            # Show class info
-            class_info = tk.Frame(self.notifications_frame, bg="#3498db", relief="flat")
-            class_info.pack(fill="x", pady=(0, 20))
-            
-            tk.Label(class_info, text=f"Sua Turma: {class_name}", 
-                    font=("Arial", 14, "bold"), bg="#3498db", fg="white").pack(pady=15)
-            
-            # Get announcements for this class or all classes
-            cursor.execute('''
-                SELECT title, content, priority, created_at
-                FROM announcements
-                WHERE target_class_id = ? OR target_class_id IS NULL
-                ORDER BY created_at DESC
-            ''', (class_id,))
+            self.class_banner.config(text=f"Sua Turma: {class_name}", bg="#3498db", font=("Arial", 14, "bold"))
         else:
-            # No class assigned - show only general announcements
-            no_class_info = tk.Frame(self.notifications_frame, bg="#e67e22", relief="flat")
-            no_class_info.pack(fill="x", pady=(0, 20))
-            
-            tk.Label(no_class_info, text="⚠️ Você não está em nenhuma turma ainda", 
-                    font=("Arial", 12, "bold"), bg="#e67e22", fg="white").pack(pady=15)
-            
-            cursor.execute('''
-                SELECT title, content, priority, created_at
-                FROM announcements
-                WHERE target_class_id IS NULL
-                ORDER BY created_at DESC
-            ''')
-        
-        announcements = cursor.fetchall()
-        conn.close()
+            class_id = None
+            self.class_banner.config(text="⚠️ Você não está em nenhuma turma ainda", bg="#e67e22",
+                                     font=("Arial", 12, "bold"))
         
-        if announcements:
-            for title, content, priority, created_at in announcements:
-                # Create announcement card
-                card = tk.Frame(self.notifications_frame, bg="white", relief="solid", bd=1)
-                card.pack(fill="x", pady=8, padx=5)
-                
-                # Header with priority indicator
-                header = tk.Frame(card, bg="#ecf0f1")
-                header.pack(fill="x")
-                
-                priority_color = "#e74c3c" if priority == "high" else "#27ae60"
-                priority_text = "🔴 ALTA PRIORIDADE" if priority == "high" else "🟢 Normal"
-                
-                tk.Label(header, text=priority_text, font=("Arial", 9, "bold"),
-                        bg=priority_color, fg="white", padx=10, pady=3).pack(side="left")
-                
-                tk.Label(header, text=created_at, font=("Arial", 9),
-                        bg="#ecf0f1", fg="#7f8c8d").pack(side="right", padx=10, pady=3)
-                
-                # Title
-                tk.Label(card, text=title, font=("Arial", 13, "bold"),
-                        bg="white", fg="#2c3e50", anchor="w").pack(fill="x", padx=15, pady=(10, 5))
-                
-                # Content
-                content_label = tk.Label(card, text=content, font=("Arial", 11),
-                                        bg="white", fg="#34495e", anchor="w", justify="left", wraplength=800)
-                content_label.pack(fill="x", padx=15, pady=(0, 15))
-        else:
-            tk.Label(self.notifications_frame, text="📭 Nenhum aviso disponível no momento", 
-                    font=("Arial", 12), bg="white", fg="#7f8c8d").pack(pady=50)
+        self.feed.unread_after = last_seen
+        self.feed.load(self.ANNOUNCEMENTS, {'class_id': class_id}, (rows, positions))
+        self._inbox = {'student_id': student_id, 'class_id': class_id, 'since': head, 'last_seen': last_seen}
+        self._show_unread(unread)
+        self._schedule_inbox_poll()
     
-    def load_courses(self):
-        """Load student's enrolled courses and grades."""
-        if not self.controller.current_user:
+    def poll_inbox(self):
+        """Read only the announcements newer than the loaded feed, plus the unread count."""
+        inbox = self._inbox
+        user = self.controller.current_user
+        if inbox is None or not user or user['id'] != inbox['student_id']:
+            return  # logged out or another student; load_notifications starts a new inbox
+        
+        db_worker.submit('student.inbox',
+                         lambda cursor: self.fetch_new_announcements(cursor, inbox['student_id'],
+                                                                     inbox['class_id'], inbox['since']),
+                         lambda result: self._show_new_announcements(inbox, result),
+                         on_error=lambda e: self._schedule_inbox_poll())
+        self._schedule_inbox_poll()
+    
+    def _schedule_inbox_poll(self):
+        if self._poll_job is not None:
+            self.after_cancel(self._poll_job)
+        self._poll_job = self.after(self.INBOX_POLL_MS, self.poll_inbox)
+    
+    def _show_new_announcements(self, inbox, result):
+        if inbox is not self._inbox:
             return
-        
-        conn = sqlite3.connect('academic_system.db')
-        cursor = conn.cursor()
-        
+        student_class, rows, state = result
+        if rows is None:
+            self.load_notifications()  # moved to another class
+            return
+        if rows:
+            self.feed.prepend(rows, [(row[4], row[0]) for row in rows])
+            inbox['since'] = max(inbox['since'], max(row[0] for row in rows))
+        self._show_unread(state[2])
+    
+    def _show_unread(self, unread):
+        self.notebook.tab(self.notifications_tab,
+                          text=f"🔔 Notificações ({unread})" if unread else "🔔 Notificações")
+        if unread and self.notebook.select() == str(self.notifications_tab):
+            self._mark_inbox_read()
+    
+    def _mark_inbox_read(self):
+        """Mark everything up to the newest loaded announcement as seen, once the tab is open."""
+        inbox = self._inbox
+        if inbox is None or self.notebook.select() != str(self.notifications_tab):
+            return
+        if inbox['since'] > inbox['last_seen']:
+            since = inbox['since']
+            
+            def marked(_):
+                inbox['last_seen'] = max(inbox['last_seen'], since)
+            
+            # Off the Tk thread: another client may hold the write lock. If it
+            # fails, last_seen stays behind and the next tab change or poll retries.
+            db_worker.submit('student.inbox.read',
+                             lambda cursor: db.run_write(self.mark_announcements_read,
+                                                         inbox['student_id'], since),
+                             marked, on_error=lambda e: None)
+        self.notebook.tab(self.notifications_tab, text="🔔 Notificações")
+    
+    @staticmethod
+    def fetch_courses(cursor, student_id):
+        """Enrolled courses with teacher name and average grade."""
         cursor.execute('''
             SELECT c.name, u.first_name || ' ' || u.last_name as teacher_name,
-                   COALESCE(AVG(s.grade), 0) as avg_grade
+                   COALESCE(st.grade_avg, 0) as avg_grade, c.id
             FROM courses c
             JOIN enrollments e ON c.id = e.course_id
             JOIN users u ON c.teacher_id = u.id
-            LEFT JOIN assignments a ON c.id = a.course_id
-            LEFT JOIN submissions s ON a.id = s.assignment_id AND s.student_id = ?
+            LEFT JOIN student_course_stats st ON st.student_id = e.user_id AND st.course_id = c.id
             WHERE e.user_id = ?
-            GROUP BY c.id, c.name, u.first_name, u.last_name
-        ''', (self.controller.current_user['id'], self.controller.current_user['id']))
-        
-        courses = cursor.fetchall()
-        conn.close()
+        ''', (student_id,))
         
-        # Clear and populate treeview
-        for item in self.courses_tree.get_children():
-            self.courses_tree.delete(item)
-        
-        for course in courses:
-            self.courses_tree.insert("", "end", values=(
-                course[0], course[1], f"{course[2]:.1f}"
-            ))
+        return cursor.fetchall()
+    
+    def _show_courses(self, courses):
+        reconcile_tree(self.courses_tree, ((course[3], (course[0], course[1], f"{course[2]:.1f}"))
+                                           for course in courses))
     
     def load_deadlines(self):
         """Load upcoming assignments from the database."""
         self.load_assignments()
     
-    def load_assignments(self):
-        """Carregar atividades do banco de dados."""
-        if not self.controller.current_user:
-            return
-            
-        # Clear existing items
-        for item in self.assignments_tree.get_children():
-            self.assignments_tree.delete(item)
-        
-        conn = sqlite3.connect('academic_system.db')
-        cursor = conn.cursor()
-        
+    @staticmethod
+    def fetch_assignments(cursor, student_id):
+        """Assignments with a due date from the student's courses, with submission status."""
         # Get assignments for courses the student is enrolled in
         cursor.execute('''
             SELECT a.id, a.title, c.name, a.due_date, a.type,
@@ -2021,29 +5603,58 @@ class StudentFrame(tk.Frame):
             LEFT JOIN submissions s ON a.id = s.assignment_id AND s.student_id = ?
             WHERE e.user_id = ? AND a.due_date IS NOT NULL
             ORDER BY a.due_date
-        ''', (self.controller.current_user['id'], self.controller.current_user['id']))
+        ''', (student_id, student_id))
         
-        assignments = cursor.fetchall()
-        conn.close()
-        
-        for assignment in assignments:
-            # Translate assignment type to Portuguese
-            type_translations = {
-                'homework': 'Tarefa',
-                'quiz': 'Quiz',
-                'project': 'Projeto',
-                'exam': 'Prova',
-                'assignment': 'Atividade'
-            }
-            assignment_type = type_translations.get(assignment[4], assignment[4])
-            
-            self.assignments_tree.insert("", "end", values=(
-                assignment[2],  # Course name
-                assignment[1],  # Assignment title
-                assignment_type,  # Assignment type
-                assignment[3],  # Due date
-                assignment[5]   # Status
-            ), tags=(str(assignment[0]),))  # Store assignment ID in tags
+        return cursor.fetchall()
+    
+    def load_assignments(self):
+        """Carregar atividades do banco de dados."""
+        if not self.controller.current_user:
+            return
+        
+        student_id = self.controller.current_user['id']
+        
+        db_worker.submit('student.assignments', lambda cursor: self.fetch_assignments(cursor, student_id),
+                         self._show_assignments,
+                         indicator=self.loading_label)
+    
+    def _show_assignments(self, assignments):
+        # Translate assignment type to Portuguese
+        type_translations = {
+            'homework': 'Tarefa',
+            'quiz': 'Quiz',
+            'project': 'Projeto',
+            'exam': 'Prova',
+            'assignment': 'Atividade'
+        }
+        
+        # The item iid is the assignment ID
+        reconcile_tree(self.assignments_tree, ((assignment[0], (
+            assignment[2],  # Course name
+            assignment[1],  # Assignment title
+            type_translations.get(assignment[4], assignment[4]),  # Assignment type
+            assignment[3],  # Due date
+            assignment[5]   # Status
+        )) for assignment in assignments))
+    
+    @staticmethod
+    def save_submission(cursor, assignment_id, student_id, content, attachments):
+        """Insert a submission with its attachments, (sha256, size, filename) already in blob_store.
+        
+        Returns the submission id. A second submission for the same
+        assignment raises sqlite3.IntegrityError.
+        """
+        from datetime import datetime
+        submission_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        
+        cursor.execute('''
+            INSERT INTO submissions (assignment_id, student_id, submission_date, submitted_at, grade, feedback)
+            VALUES (?, ?, ?, ?, NULL, ?)
+        ''', (assignment_id, student_id, submission_date, submission_date, content))
+        submission_id = cursor.lastrowid
+        for sha256, size, filename in attachments:
+            add_submission_attachment(cursor, submission_id, (sha256, size), filename)
+        return submission_id
     
     def submit_assignment(self):
         """Entregar uma atividade."""
@@ -2053,7 +5664,7 @@ class StudentFrame(tk.Frame):
             return
         
         item = self.assignments_tree.item(selection[0])
-        assignment_id = item['tags'][0]
+        assignment_id = int(selection[0])
         assignment_title = item['values'][1]
         course_name = item['values'][0]
         assignment_type = item['values'][2]  # Get the type from the display
@@ -2089,54 +5700,116 @@ class StudentFrame(tk.Frame):
         submission_text = tk.Text(form_frame, height=15, font=("Arial", 10))
         submission_text.pack(fill="both", expand=True, pady=(5, 10))
         
-        # File attachment simulation
         tk.Label(form_frame, text="Notas Adicionais:", font=("Arial", 11, "bold")).pack(anchor='w')
         notes_text = tk.Text(form_frame, height=4, font=("Arial", 10))
         notes_text.pack(fill="x", pady=(5, 10))
         
+        # Files are only read when the work is submitted, streamed into blob_store
+        attachments = []
+        attachments_frame = tk.Frame(form_frame)
+        attachments_frame.pack(fill="x")
+        attachments_label = tk.Label(attachments_frame, text="Nenhum arquivo anexado", fg="#7f8c8d",
+                                     wraplength=400, justify="left")
+        
+        def choose_files():
+            paths = filedialog.askopenfilenames(parent=submit_window, title="Anexar arquivos")
+            attachments.extend(path for path in paths if path not in attachments)
+            if attachments:
+                total = sum(os.path.getsize(path) for path in attachments)
+                attachments_label.config(text=", ".join(os.path.basename(path) for path in attachments)
+                                         + f" ({format_size(total)})", fg="black")
+        
+        tk.Button(attachments_frame, text="Anexar Arquivos...", command=choose_files).pack(side="left")
+        attachments_label.pack(side="left", padx=10)
+        
+        student_id = self.controller.current_user['id']
+        
+        def submitted(submission_id, progress=None):
+            if progress is not None:
+                progress.stop()
+            messagebox.showinfo("Sucesso", "Atividade entregue com sucesso!")
+            submit_window.destroy()
+            
+            # Refresh the assignments list
+            self.load_deadlines()
+        
+        def already_submitted():
+            messagebox.showinfo("Info", "Você já entregou esta atividade.")
+            submit_window.destroy()
+            self.load_deadlines()
+        
+        def submit_failed(error, progress):
+            progress.stop()
+            submit_window.protocol("WM_DELETE_WINDOW", submit_window.destroy)
+            submit_button.config(state="normal")
+            cancel_button.config(state="normal")
+            if isinstance(error, sqlite3.IntegrityError):
+                already_submitted()
+            else:
+                messagebox.showerror("Erro", f"Falha ao entregar atividade: {error}")
+        
         def submit_work():
             submission_content = submission_text.get(1.0, tk.END).strip()
             notes = notes_text.get(1.0, tk.END).strip()
             
-            if not submission_content:
-                messagebox.showerror("Erro", "Por favor, insira o conteúdo da sua entrega.")
+            if not submission_content and not attachments:
+                messagebox.showerror("Erro", "Por favor, insira o conteúdo da sua entrega ou anexe um arquivo.")
+                return
+            
+            # Submitted from another window or session: don't stream the files for nothing
+            with db.cursor() as cursor:
+                cursor.execute('SELECT 1 FROM submissions WHERE assignment_id = ? AND student_id = ?',
+                               (assignment_id, student_id))
+                if cursor.fetchone():
+                    already_submitted()
+                    return
+            
+            content = f"Submission: {submission_content}\n\nNotes: {notes}"
+            if not attachments:
+                try:
+                    submitted(db.run_write(self.save_submission, assignment_id, student_id, content, []))
+                except sqlite3.IntegrityError:
+                    already_submitted()
+                except Exception as e:
+                    messagebox.showerror("Erro", f"Falha ao entregar atividade: {str(e)}")
                 return
             
             try:
-                conn = sqlite3.connect('academic_system.db')
-                cursor = conn.cursor()
-                
-                from datetime import datetime
-                submission_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                
-                # Insert submission
-                cursor.execute('''
-                    INSERT INTO submissions (assignment_id, student_id, submission_date, grade, feedback)
-                    VALUES (?, ?, ?, NULL, ?)
-                ''', (assignment_id, self.controller.current_user['id'], submission_date, 
-                      f"Submission: {submission_content}\n\nNotes: {notes}"))
-                
-                conn.commit()
-                conn.close()
-                
-                messagebox.showinfo("Sucesso", "Atividade entregue com sucesso!")
-                submit_window.destroy()
-                
-                # Refresh the assignments list
-                self.load_deadlines()
-                
-            except Exception as e:
-                messagebox.showerror("Erro", f"Falha ao entregar atividade: {str(e)}")
+                sizes = [os.path.getsize(path) for path in attachments]
+            except OSError as e:
+                messagebox.showerror("Erro", f"Não foi possível ler o anexo: {e}")
+                return
+            paths = list(attachments)
+            progress = TransferProgress(form_frame, sum(sizes))
+            progress.frame.pack(pady=5)
+            submit_button.config(state="disabled")
+            cancel_button.config(state="disabled")
+            # The upload keeps running in the background; the window stays until it finishes
+            submit_window.protocol("WM_DELETE_WINDOW", lambda: None)
+            
+            def upload(cursor):
+                # If the insert fails, files no row refers to are left to blob_store.sweep()
+                blobs, offset = [], 0
+                for path, size in zip(paths, sizes):
+                    blobs.append(blob_store.put(path, progress.reporter(offset)) + (os.path.basename(path),))
+                    offset += size
+                return db.run_write(self.save_submission, assignment_id, student_id, content, blobs)
+            
+            transfer_worker.submit(f'student.submit.{assignment_id}', upload,
+                                   lambda submission_id: submitted(submission_id, progress),
+                                   on_error=lambda e: submit_failed(e, progress))
         
         # Buttons
         button_frame = tk.Frame(submit_window)
         button_frame.pack(pady=10)
         
-        tk.Button(button_frame, text="Entregar Atividade", command=submit_work,
-                 bg="#4CAF50", fg="white", font=("Arial", 11), width=15).pack(side="left", padx=5)
+        submit_button = tk.Button(button_frame, text="Entregar Atividade", command=submit_work,
+                                  bg="#4CAF50", fg="white", font=("Arial", 11), width=15)
+        submit_button.pack(side="left", padx=5)
         
-        tk.Button(button_frame, text="Cancelar", command=submit_window.destroy,
-                 bg="#f44336", fg="white", font=("Arial", 11), width=15).pack(side="left", padx=5)
+        cancel_button = tk.Button(button_frame, text="Cancelar", command=submit_window.destroy,
+                                  bg="#f44336", fg="white", font=("Arial", 11), width=15)
+        cancel_button.pack(side="left", padx=5)
     
     def view_assignment_details(self):
         """Visualizar detalhes da atividade."""
@@ -2145,38 +5818,35 @@ class StudentFrame(tk.Frame):
             messagebox.showwarning("Aviso", "Por favor, selecione uma atividade para visualizar.")
             return
         
-        item = self.assignments_tree.item(selection[0])
-        assignment_id = item['tags'][0]
+        assignment_id = int(selection[0])
         
         # Get assignment details
-        conn = sqlite3.connect('academic_system.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT title, description, due_date, max_points, type
-            FROM assignments WHERE id = ?
-        ''', (assignment_id,))
-        assignment = cursor.fetchone()
+        with db.cursor() as cursor:
+            cursor.execute('''
+                SELECT title, description, due_date, max_points, type
+                FROM assignments WHERE id = ?
+            ''', (assignment_id,))
+            assignment = cursor.fetchone()
+            
+            is_quiz = bool(assignment and assignment[4] and assignment[4].lower() == "quiz")
+            if is_quiz:
+                cursor.execute('''
+                    SELECT id, question_text, option_a, option_b, option_c, option_d, points
+                    FROM quiz_questions WHERE assignment_id = ? ORDER BY id
+                ''', (assignment_id,))
+                questions = cursor.fetchall()
         
         if not assignment:
-            conn.close()
             messagebox.showerror("Erro", "Atividade não encontrada.")
             return
         
         title, description, due_date, max_points, assignment_type = assignment
         
         # Check if it's a quiz and get questions
-        if assignment_type and assignment_type.lower() == "quiz":
-            cursor.execute('''
-                SELECT id, question_text, option_a, option_b, option_c, option_d, points
-                FROM quiz_questions WHERE assignment_id = ? ORDER BY id
-            ''', (assignment_id,))
-            questions = cursor.fetchall()
-            conn.close()
-            
+        if is_quiz:
             # Show quiz interface
             self.show_quiz_interface(assignment_id, title, description, due_date, max_points, questions)
         else:
-            conn.close()
             # Show regular assignment details
             self.show_regular_assignment_details(assignment_id, title, description, due_date, max_points)
     
@@ -2210,14 +5880,12 @@ class StudentFrame(tk.Frame):
                     font=("Arial", 10), wraplength=600).pack(anchor='w', pady=(5, 0))
         
         # Check if already submitted
-        conn = sqlite3.connect('academic_system.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT id, grade, submitted_at FROM submissions 
-            WHERE assignment_id = ? AND student_id = ?
-        ''', (assignment_id, self.controller.current_user['id']))
-        submission = cursor.fetchone()
-        conn.close()
+        with db.cursor() as cursor:
+            cursor.execute('''
+                SELECT id, grade, submitted_at FROM submissions 
+                WHERE assignment_id = ? AND student_id = ?
+            ''', (assignment_id, self.controller.current_user['id']))
+            submission = cursor.fetchone()
         
         if submission:
             tk.Label(quiz_window, text="✅ Você já respondeu este quiz!", 
@@ -2243,67 +5911,69 @@ class StudentFrame(tk.Frame):
         tk.Button(quiz_window, text="Fechar", command=quiz_window.destroy,
                  bg="#f44336", fg="white", font=("Arial", 11)).pack(pady=10)
     
+    @staticmethod
+    def grade_quiz(cursor, assignment_id, student_id, selected):
+        """Store a quiz submission with its answers and grade; return (score, possible, grade).
+        
+        selected maps question id to the chosen option; questions left out
+        count as wrong. The answers go in with one executemany that checks
+        each one against the key inside SQLite, and the grade is then
+        computed by one UPDATE the same way regrade_quiz does (points of the
+        correct answers over the points of every question of the quiz), so a
+        submission costs four statements whatever the number of questions. Runs inside the caller's transaction; a
+        second submission for the same quiz raises sqlite3.IntegrityError
+        from the unique (assignment_id, student_id) index.
+        """
+        cursor.execute('''
+            INSERT INTO submissions (assignment_id, student_id, content, submitted_at)
+            VALUES (?, ?, ?, datetime('now'))
+        ''', (assignment_id, student_id, "Quiz submission"))
+        submission_id = cursor.lastrowid
+        
+        cursor.executemany('''
+            INSERT INTO quiz_answers (submission_id, question_id, selected_answer, is_correct)
+            SELECT ?, id, ?, correct_answer = ? FROM quiz_questions WHERE id = ? AND assignment_id = ?
+        ''', [(submission_id, answer, answer, question_id, assignment_id)
+              for question_id, answer in selected.items()])
+        
+        cursor.execute('''
+            UPDATE submissions SET grade = (
+                SELECT CASE WHEN SUM(q.points) > 0
+                            THEN CAST(SUM(CASE WHEN qa.is_correct THEN q.points ELSE 0 END) AS REAL)
+                                 / SUM(q.points) * a.max_points
+                            ELSE 0 END
+                FROM quiz_questions q
+                JOIN assignments a ON a.id = q.assignment_id
+                LEFT JOIN quiz_answers qa ON qa.submission_id = submissions.id AND qa.question_id = q.id
+                WHERE q.assignment_id = submissions.assignment_id
+            )
+            WHERE id = ?
+        ''', (submission_id,))
+        
+        cursor.execute('''
+            SELECT COALESCE(SUM(CASE WHEN qa.is_correct THEN q.points ELSE 0 END), 0),
+                   COALESCE(SUM(q.points), 0), s.grade
+            FROM submissions s
+            LEFT JOIN quiz_questions q ON q.assignment_id = s.assignment_id
+            LEFT JOIN quiz_answers qa ON qa.submission_id = s.id AND qa.question_id = q.id
+            WHERE s.id = ?
+        ''', (submission_id,))
+        total_score, total_possible, final_grade = cursor.fetchone()
+        return total_score, total_possible, final_grade or 0
+    
     def show_quiz_questions(self, parent_window, assignment_id, questions, max_points):
         """Mostrar questões do quiz para responder."""
-        # Create a frame to hold canvas and submit button separately
         content_frame = tk.Frame(parent_window)
         content_frame.pack(fill="both", expand=True, padx=10, pady=10)
         
-        # Scrollable frame for questions
-        canvas = tk.Canvas(content_frame)
-        scrollbar = tk.Scrollbar(content_frame, orient="vertical", command=canvas.yview)
-        scrollable_frame = tk.Frame(canvas)
-        
-        scrollable_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-        )
-        
-        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
-        
-        # Mouse wheel scrolling support
-        def on_mousewheel(event):
-            canvas.yview_scroll(int(-1*(event.delta/120)), "units")
-        
-        canvas.bind_all("<MouseWheel>", on_mousewheel)
-        
-        canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
-        
-        # Store answers
-        answers = {}
-        
-        for i, question in enumerate(questions, 1):
-            q_id, q_text, opt_a, opt_b, opt_c, opt_d, points = question
-            
-            # Question frame with better spacing
-            q_frame = tk.LabelFrame(scrollable_frame, text=f"Questão {i} ({points} pontos)", 
-                                   font=("Arial", 11, "bold"), padx=10, pady=10)
-            q_frame.pack(fill="x", pady=10, padx=10)
-            
-            # Question text
-            tk.Label(q_frame, text=q_text, font=("Arial", 11), 
-                    wraplength=600, justify="left").pack(anchor='w', pady=(0, 10))
-            
-            # Answer options
-            answer_var = tk.StringVar()
-            answers[q_id] = answer_var
-            
-            for letter, option_text in [('A', opt_a), ('B', opt_b), ('C', opt_c), ('D', opt_d)]:
-                tk.Radiobutton(q_frame, text=f"{letter}) {option_text}", 
-                              variable=answer_var, value=letter,
-                              font=("Arial", 10), wraplength=550).pack(anchor='w', pady=2)
+        pager = QuizPager(content_frame, questions)
         
         # Submit button
         def submit_quiz():
             # Check if all questions are answered
-            unanswered = []
-            for q_id, answer_var in answers.items():
-                if not answer_var.get():
-                    unanswered.append(q_id)
-            
+            unanswered = pager.unanswered()
             if unanswered:
+                pager.show_question(unanswered[0])
                 messagebox.showwarning("Aviso", 
                                      f"Por favor, responda todas as questões antes de entregar.\n"
                                      f"Questões não respondidas: {len(unanswered)}")
@@ -2315,52 +5985,11 @@ class StudentFrame(tk.Frame):
                                      "Você não poderá alterar suas respostas depois."):
                 return
             
+            selected = pager.selected()
             try:
-                conn = sqlite3.connect('academic_system.db')
-                cursor = conn.cursor()
-                
-                # Create submission
-                cursor.execute('''
-                    INSERT INTO submissions (assignment_id, student_id, content, submitted_at)
-                    VALUES (?, ?, ?, datetime('now'))
-                ''', (assignment_id, self.controller.current_user['id'], "Quiz submission"))
-                
-                submission_id = cursor.lastrowid
-                
-                # Save answers and calculate score
-                total_score = 0
-                total_possible = 0
-                
-                for question in questions:
-                    q_id, q_text, opt_a, opt_b, opt_c, opt_d, points = question
-                    
-                    # Get correct answer
-                    cursor.execute('''
-                        SELECT correct_answer FROM quiz_questions WHERE id = ?
-                    ''', (q_id,))
-                    correct_answer = cursor.fetchone()[0]
-                    
-                    selected_answer = answers[q_id].get()
-                    is_correct = selected_answer == correct_answer
-                    
-                    if is_correct:
-                        total_score += points
-                    total_possible += points
-                    
-                    # Save answer
-                    cursor.execute('''
-                        INSERT INTO quiz_answers (submission_id, question_id, selected_answer, is_correct)
-                        VALUES (?, ?, ?, ?)
-                    ''', (submission_id, q_id, selected_answer, is_correct))
-                
-                # Update submission with grade
-                final_grade = (total_score / total_possible) * max_points if total_possible > 0 else 0
-                cursor.execute('''
-                    UPDATE submissions SET grade = ? WHERE id = ?
-                ''', (final_grade, submission_id))
-                
-                conn.commit()
-                conn.close()
+                with db.transaction() as cursor:
+                    total_score, total_possible, final_grade = self.grade_quiz(
+                        cursor, assignment_id, self.controller.current_user['id'], selected)
                 
                 messagebox.showinfo("Sucesso", 
                                   f"Quiz entregue com sucesso!\n\n"
@@ -2370,6 +5999,10 @@ class StudentFrame(tk.Frame):
                 parent_window.destroy()
                 self.load_assignments()  # Refresh assignments list
                 
+            except sqlite3.IntegrityError:
+                messagebox.showinfo("Info", "Você já entregou este quiz.")
+                parent_window.destroy()
+                self.load_assignments()
             except Exception as e:
                 messagebox.showerror("Erro", f"Falha ao entregar quiz: {str(e)}")
         
@@ -2420,31 +6053,28 @@ class StudentFrame(tk.Frame):
         results_window.grab_set()
         
         # Get user's answers
-        conn = sqlite3.connect('academic_system.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT qa.question_id, qa.selected_answer, qa.is_correct,
-                   qq.question_text, qq.option_a, qq.option_b, qq.option_c, qq.option_d, 
-                   qq.correct_answer, qq.points
-            FROM quiz_answers qa
-            JOIN quiz_questions qq ON qa.question_id = qq.id
-            WHERE qa.submission_id = ?
-            ORDER BY qq.id
-        ''', (submission_id,))
-        user_answers = cursor.fetchall()
-        
-        # Get overall grade
-        cursor.execute('''
-            SELECT grade FROM submissions WHERE id = ?
-        ''', (submission_id,))
-        grade = cursor.fetchone()[0]
+        with db.cursor() as cursor:
+            cursor.execute('''
+                SELECT qa.question_id, qa.selected_answer, qa.is_correct,
+                       qq.question_text, qq.option_a, qq.option_b, qq.option_c, qq.option_d, 
+                       qq.correct_answer, qq.points
+                FROM quiz_answers qa
+                JOIN quiz_questions qq ON qa.question_id = qq.id
+                WHERE qa.submission_id = ?
+                ORDER BY qq.id
+            ''', (submission_id,))
+            user_answers = cursor.fetchall()
         
-        cursor.execute('''
-            SELECT max_points FROM assignments WHERE id = ?
-        ''', (assignment_id,))
-        max_points = cursor.fetchone()[0]
+            # Get overall grade
+            cursor.execute('''
+                SELECT grade FROM submissions WHERE id = ?
+            ''', (submission_id,))
+            grade = cursor.fetchone()[0]
         
-        conn.close()
+            cursor.execute('''
+                SELECT max_points FROM assignments WHERE id = ?
+            ''', (assignment_id,))
+            max_points = cursor.fetchone()[0]
         
         # Header
         tk.Label(results_window, text="📊 Resultados do Quiz", 
@@ -2566,15 +6196,18 @@ class CoordinatorFrame(tk.Frame):
                 font=("Arial", 14, "bold")).pack(pady=20)
         
         functions = [
-            "Manage Academic Programs",
-            "Monitor Course Performance",
-            "Generate Reports",
-            "Coordinate with Teachers"
+            ("Manage Academic Programs", None),
+            ("Monitor Course Performance", self.monitor_course_performance),
+            ("Generate Reports", None),
+            ("Coordinate with Teachers", None)
         ]
         
-        for func in functions:
-            tk.Button(content_frame, text=func, font=("Arial", 11),
-                     width=25, height=2, command=lambda f=func: self.placeholder_action(f)).pack(pady=5)
+        for func, command in functions:
+            tk.Button(content_frame, text=func, font=("Arial", 11), width=25, height=2,
+                     command=command or (lambda f=func: self.placeholder_action(f))).pack(pady=5)
+        
+        self.loading_label = tk.Label(content_frame, text="", font=("Arial", 9, "italic"), fg="#7f8c8d")
+        self.loading_label.pack(pady=5)
     
     def refresh_data(self):
         """Refresh coordinator data when frame is shown."""
@@ -2586,6 +6219,56 @@ class CoordinatorFrame(tk.Frame):
     def placeholder_action(self, function_name):
         """Placeholder action for coordinator functions."""
         messagebox.showinfo("Function", f"{function_name} - Feature coming soon!")
+    
+    def monitor_course_performance(self):
+        """Institution-wide risk overview: courses by share of at-risk students, then their students."""
+        db_worker.submit('coordinator.risk',
+                         lambda cursor: (risk_engine.course_summary(cursor), risk_engine.at_risk(cursor)),
+                         self._show_course_performance, indicator=self.loading_label)
+    
+    def _show_course_performance(self, result):
+        summary, at_risk = result
+        
+        window = tk.Toplevel(self.controller)
+        window.title("Desempenho das Disciplinas")
+        window.geometry("850x650")
+        window.transient(self.controller)
+        
+        tk.Label(window, text="Desempenho das Disciplinas", font=("Arial", 14, "bold")).pack(pady=10)
+        tk.Label(window, text=f"{int(summary['at_risk'].sum())} estudante(s)-disciplina em risco "
+                              f"de {int(summary['students'].sum())} matrícula(s)",
+                 font=("Arial", 10), fg="#7f8c8d").pack()
+        
+        courses_frame = tk.LabelFrame(window, text="Disciplinas (mais estudantes em risco primeiro)",
+                                      font=("Arial", 11, "bold"))
+        courses_frame.pack(fill="both", expand=True, padx=20, pady=5)
+        columns = ("Disciplina", "Estudantes", "Em Risco", "% em Risco", "Nota Média")
+        courses_tree = ttk.Treeview(courses_frame, columns=columns, show="headings", height=10)
+        for col in columns:
+            courses_tree.heading(col, text=col)
+            courses_tree.column(col, width=220 if col == "Disciplina" else 110)
+        scrollbar = ttk.Scrollbar(courses_frame, orient="vertical", command=courses_tree.yview)
+        courses_tree.configure(yscrollcommand=scrollbar.set)
+        courses_tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+        
+        reconcile_tree(courses_tree, ((row.course_id, (
+            row.course_name, row.students, row.at_risk, f"{row.at_risk_share:.0%}",
+            "-" if pd.isna(row.grade_ratio) else f"{row.grade_ratio:.0%}",
+        )) for row in summary.itertuples(index=False)))
+        
+        students_frame = tk.LabelFrame(window, text="Estudantes em risco da disciplina selecionada",
+                                       font=("Arial", 11, "bold"))
+        students_frame.pack(fill="both", expand=True, padx=20, pady=5)
+        students_tree = risk_tree(students_frame, height=8)
+        
+        def on_course_selected(event):
+            # Filters the scores already in memory; no query
+            selection = courses_tree.selection()
+            if selection:
+                fill_risk_tree(students_tree, at_risk[at_risk['course_id'] == int(selection[0])])
+        
+        courses_tree.bind('<<TreeviewSelect>>', on_course_selected)
 
 
 class SecretaryFrame(tk.Frame):
@@ -2656,6 +6339,32 @@ class SecretaryFrame(tk.Frame):
         for widget in self.content_area.winfo_children():
             widget.destroy()
     
+    @staticmethod
+    def fetch_dashboard(cursor):
+        """Counts for the stat cards and students per class."""
+        cursor.execute("SELECT COUNT(*) FROM users WHERE role='STUDENT'")
+        total_students = cursor.fetchone()[0]
+        
+        cursor.execute("SELECT COUNT(*) FROM courses")
+        total_courses = cursor.fetchone()[0]
+        
+        cursor.execute("SELECT COUNT(*) FROM classes")
+        total_classes = cursor.fetchone()[0]
+        
+        cursor.execute("SELECT COUNT(*) FROM announcements")
+        total_announcements = cursor.fetchone()[0]
+        
+        cursor.execute('''
+            SELECT c.name, COUNT(sc.student_id) as count
+            FROM classes c
+            LEFT JOIN student_classes sc ON c.id = sc.class_id
+            GROUP BY c.id, c.name
+            ORDER BY c.name
+        ''')
+        class_distribution = cursor.fetchall()
+        
+        return (total_students, total_courses, total_classes, total_announcements), class_distribution
+    
     def show_dashboard(self):
         """Show main dashboard with statistics."""
         self.clear_content()
@@ -2671,23 +6380,10 @@ class SecretaryFrame(tk.Frame):
         stats_frame = tk.Frame(self.content_area, bg="white")
         stats_frame.pack(fill="x", padx=30, pady=10)
         
-        # Get statistics
-        conn = sqlite3.connect('academic_system.db')
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT COUNT(*) FROM users WHERE role='STUDENT'")
-        total_students = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM courses")
-        total_courses = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM classes")
-        total_classes = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM announcements")
-        total_announcements = cursor.fetchone()[0]
-        
-        conn.close()
+        # Get statistics and class distribution in one pass over the shared connection
+        with db.cursor() as cursor:
+            totals, class_distribution = self.fetch_dashboard(cursor)
+        total_students, total_courses, total_classes, total_announcements = totals
         
         # Create stat cards
         stats = [
@@ -2713,19 +6409,6 @@ class SecretaryFrame(tk.Frame):
                                       fg="#2c3e50", padx=20, pady=10)
         activity_frame.pack(fill="both", expand=True, padx=30, pady=20)
         
-        conn = sqlite3.connect('academic_system.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT c.name, COUNT(sc.student_id) as count
-            FROM classes c
-            LEFT JOIN student_classes sc ON c.id = sc.class_id
-            GROUP BY c.id, c.name
-            ORDER BY c.name
-        ''')
-        class_distribution = cursor.fetchall()
-        conn.close()
-        
         for class_name, count in class_distribution:
             row = tk.Frame(activity_frame, bg="white")
             row.pack(fill="x", pady=8)
@@ -2735,6 +6418,26 @@ class SecretaryFrame(tk.Frame):
             tk.Label(row, text=f"{count} estudante(s)", font=("Arial", 12),
                     bg="white", fg="#7f8c8d").pack(side="left", padx=10)
     
+    @staticmethod
+    def fetch_classes(cursor):
+        """All classes and, per class id, the students assigned to it."""
+        # Get classes
+        cursor.execute("SELECT id, name, description FROM classes ORDER BY name")
+        classes = cursor.fetchall()
+        
+        # Students in each class
+        class_students = {}
+        for class_id, _, _ in classes:
+            cursor.execute('''
+                SELECT u.id, u.first_name, u.last_name, u.username
+                FROM users u
+                JOIN student_classes sc ON u.id = sc.student_id
+                WHERE sc.class_id = ? AND u.role = 'STUDENT'
+                ORDER BY u.first_name, u.last_name
+            ''', (class_id,))
+            class_students[class_id] = cursor.fetchall()
+        return classes, class_students
+    
     def manage_classes(self):
         """Manage student classes/turmas."""
         self.clear_content()
@@ -2750,12 +6453,8 @@ class SecretaryFrame(tk.Frame):
         classes_container = tk.Frame(self.content_area, bg="white")
         classes_container.pack(fill="both", expand=True, padx=30, pady=10)
         
-        conn = sqlite3.connect('academic_system.db')
-        cursor = conn.cursor()
-        
-        # Get classes
-        cursor.execute("SELECT id, name, description FROM classes ORDER BY name")
-        classes = cursor.fetchall()
+        with db.cursor() as cursor:
+            classes, class_students = self.fetch_classes(cursor)
         
         for idx, (class_id, class_name, description) in enumerate(classes):
             class_frame = tk.LabelFrame(classes_container, text=class_name,
@@ -2765,15 +6464,7 @@ class SecretaryFrame(tk.Frame):
             classes_container.grid_columnconfigure(idx, weight=1)
             classes_container.grid_rowconfigure(0, weight=1)
             
-            # Students in this class
-            cursor.execute('''
-                SELECT u.id, u.first_name, u.last_name, u.username
-                FROM users u
-                JOIN student_classes sc ON u.id = sc.student_id
-                WHERE sc.class_id = ? AND u.role = 'STUDENT'
-                ORDER BY u.first_name, u.last_name
-            ''', (class_id,))
-            students_in_class = cursor.fetchall()
+            students_in_class = class_students[class_id]
             
             # Listbox with scrollbar
             list_frame = tk.Frame(class_frame, bg="#ecf0f1")
@@ -2804,8 +6495,6 @@ class SecretaryFrame(tk.Frame):
                      command=lambda lb=student_listbox, cid=class_id: self.remove_student_from_class(lb, cid),
                      bg="#e74c3c", fg="white", font=("Arial", 10, "bold"),
                      relief="flat", cursor="hand2").pack(side="left", padx=5)
-        
-        conn.close()
     
     def distribute_students(self):
         """Distribute students without class between Turma A and Turma B."""
@@ -2823,28 +6512,24 @@ class SecretaryFrame(tk.Frame):
                                   font=("Arial", 12, "bold"), bg="white", padx=20, pady=15)
         info_frame.pack(fill="x", padx=30, pady=10)
         
-        conn = sqlite3.connect('academic_system.db')
-        cursor = conn.cursor()
-        
-        # Count students without class
-        cursor.execute('''
-            SELECT COUNT(*) FROM users u
-            WHERE u.role = 'STUDENT'
-            AND u.id NOT IN (SELECT student_id FROM student_classes)
-        ''')
-        students_without_class = cursor.fetchone()[0]
-        
-        # Count students in each class
-        cursor.execute('''
-            SELECT c.name, COUNT(sc.student_id)
-            FROM classes c
-            LEFT JOIN student_classes sc ON c.id = sc.class_id
-            GROUP BY c.id, c.name
-            ORDER BY c.name
-        ''')
-        class_counts = cursor.fetchall()
+        with db.cursor() as cursor:
+            # Count students without class
+            cursor.execute('''
+                SELECT COUNT(*) FROM users u
+                WHERE u.role = 'STUDENT'
+                AND u.id NOT IN (SELECT student_id FROM student_classes)
+            ''')
+            students_without_class = cursor.fetchone()[0]
         
-        conn.close()
+            # Count students in each class
+            cursor.execute('''
+                SELECT c.name, COUNT(sc.student_id)
+                FROM classes c
+                LEFT JOIN student_classes sc ON c.id = sc.class_id
+                GROUP BY c.id, c.name
+                ORDER BY c.name
+            ''')
+            class_counts = cursor.fetchall()
         
         # Display info
         tk.Label(info_frame, text=f"👥 Alunos sem turma: {students_without_class}", 
@@ -2873,17 +6558,15 @@ class SecretaryFrame(tk.Frame):
             scrollbar.config(command=students_listbox.yview)
             
             # Load students
-            conn = sqlite3.connect('academic_system.db')
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT u.id, u.first_name, u.last_name, u.username
-                FROM users u
-                WHERE u.role = 'STUDENT'
-                AND u.id NOT IN (SELECT student_id FROM student_classes)
-                ORDER BY u.first_name, u.last_name
-            ''')
-            unassigned_students = cursor.fetchall()
-            conn.close()
+            with db.cursor() as cursor:
+                cursor.execute('''
+                    SELECT u.id, u.first_name, u.last_name, u.username
+                    FROM users u
+                    WHERE u.role = 'STUDENT'
+                    AND u.id NOT IN (SELECT student_id FROM student_classes)
+                    ORDER BY u.first_name, u.last_name
+                ''')
+                unassigned_students = cursor.fetchall()
             
             for student_id, first_name, last_name, username in unassigned_students:
                 students_listbox.insert(tk.END, f"{first_name} {last_name} ({username})")
@@ -2902,32 +6585,27 @@ class SecretaryFrame(tk.Frame):
                                           f"Distribuir {students_without_class} aluno(s) automaticamente entre as turmas?"):
                     return
                 
-                conn = sqlite3.connect('academic_system.db')
-                cursor = conn.cursor()
-                
-                # Get class IDs
-                cursor.execute('SELECT id FROM classes ORDER BY name')
-                class_ids = [row[0] for row in cursor.fetchall()]
+                with db.transaction() as cursor:
+                    # Get class IDs
+                    cursor.execute('SELECT id FROM classes ORDER BY name')
+                    class_ids = [row[0] for row in cursor.fetchall()]
                 
-                # Get unassigned students
-                cursor.execute('''
-                    SELECT id FROM users
-                    WHERE role = 'STUDENT'
-                    AND id NOT IN (SELECT student_id FROM student_classes)
-                    ORDER BY id
-                ''')
-                student_ids = [row[0] for row in cursor.fetchall()]
-                
-                # Distribute evenly
-                for idx, student_id in enumerate(student_ids):
-                    class_id = class_ids[idx % len(class_ids)]
+                    # Get unassigned students
                     cursor.execute('''
-                        INSERT OR IGNORE INTO student_classes (student_id, class_id)
-                        VALUES (?, ?)
-                    ''', (student_id, class_id))
+                        SELECT id FROM users
+                        WHERE role = 'STUDENT'
+                        AND id NOT IN (SELECT student_id FROM student_classes)
+                        ORDER BY id
+                    ''')
+                    student_ids = [row[0] for row in cursor.fetchall()]
                 
-                conn.commit()
-                conn.close()
+                    # Distribute evenly
+                    for idx, student_id in enumerate(student_ids):
+                        class_id = class_ids[idx % len(class_ids)]
+                        cursor.execute('''
+                            INSERT OR IGNORE INTO student_classes (student_id, class_id)
+                            VALUES (?, ?)
+                        ''', (student_id, class_id))
                 
                 messagebox.showinfo("Sucesso", 
                                   f"{len(student_ids)} aluno(s) distribuído(s) entre as turmas!")
@@ -2940,27 +6618,23 @@ class SecretaryFrame(tk.Frame):
                     messagebox.showwarning("Aviso", "Selecione pelo menos um aluno.")
                     return
                 
-                conn = sqlite3.connect('academic_system.db')
-                cursor = conn.cursor()
-                cursor.execute("SELECT id FROM classes WHERE name = 'Turma A'")
-                class_id = cursor.fetchone()[0]
+                with db.transaction() as cursor:
+                    cursor.execute("SELECT id FROM classes WHERE name = 'Turma A'")
+                    class_id = cursor.fetchone()[0]
                 
-                count = 0
-                for idx in selection:
-                    student_text = students_listbox.get(idx)
-                    username = student_text.split("(")[1].rstrip(")")
-                    
-                    cursor.execute("SELECT id FROM users WHERE username = ?", (username,))
-                    student_id = cursor.fetchone()[0]
+                    count = 0
+                    for idx in selection:
+                        student_text = students_listbox.get(idx)
+                        username = student_text.split("(")[1].rstrip(")")
                     
-                    cursor.execute('''
-                        INSERT OR IGNORE INTO student_classes (student_id, class_id)
-                        VALUES (?, ?)
-                    ''', (student_id, class_id))
-                    count += 1
-                
-                conn.commit()
-                conn.close()
+                        cursor.execute("SELECT id FROM users WHERE username = ?", (username,))
+                        student_id = cursor.fetchone()[0]
+                    
+                        cursor.execute('''
+                            INSERT OR IGNORE INTO student_classes (student_id, class_id)
+                            VALUES (?, ?)
+                        ''', (student_id, class_id))
+                        count += 1
                 
                 messagebox.showinfo("Sucesso", f"{count} aluno(s) movido(s) para Turma A!")
                 self.distribute_students()  # Refresh
@@ -2972,27 +6646,23 @@ class SecretaryFrame(tk.Frame):
                     messagebox.showwarning("Aviso", "Selecione pelo menos um aluno.")
                     return
                 
-                conn = sqlite3.connect('academic_system.db')
-                cursor = conn.cursor()
-                cursor.execute("SELECT id FROM classes WHERE name = 'Turma B'")
-                class_id = cursor.fetchone()[0]
+                with db.transaction() as cursor:
+                    cursor.execute("SELECT id FROM classes WHERE name = 'Turma B'")
+                    class_id = cursor.fetchone()[0]
                 
-                count = 0
-                for idx in selection:
-                    student_text = students_listbox.get(idx)
-                    username = student_text.split("(")[1].rstrip(")")
+                    count = 0
+                    for idx in selection:
+                        student_text = students_listbox.get(idx)
+                        username = student_text.split("(")[1].rstrip(")")
                     
-                    cursor.execute("SELECT id FROM users WHERE username = ?", (username,))
-                    student_id = cursor.fetchone()[0]
+                        cursor.execute("SELECT id FROM users WHERE username = ?", (username,))
+                        student_id = cursor.fetchone()[0]
                     
-                    cursor.execute('''
-                        INSERT OR IGNORE INTO student_classes (student_id, class_id)
-                        VALUES (?, ?)
-                    ''', (student_id, class_id))
-                    count += 1
-                
-                conn.commit()
-                conn.close()
+                        cursor.execute('''
+                            INSERT OR IGNORE INTO student_classes (student_id, class_id)
+                            VALUES (?, ?)
+                        ''', (student_id, class_id))
+                        count += 1
                 
                 messagebox.showinfo("Sucesso", f"{count} aluno(s) movido(s) para Turma B!")
                 self.distribute_students()  # Refresh
@@ -3028,20 +6698,17 @@ class SecretaryFrame(tk.Frame):
                 font=("Arial", 14, "bold")).pack(pady=20)
         
         # Get students not in this class
-        conn = sqlite3.connect('academic_system.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT u.id, u.first_name, u.last_name, u.username
-            FROM users u
-            WHERE u.role = 'STUDENT' 
-            AND u.id NOT IN (
-                SELECT student_id FROM student_classes WHERE class_id = ?
-            )
-            ORDER BY u.first_name, u.last_name
-        ''', (class_id,))
-        available_students = cursor.fetchall()
-        conn.close()
+        with db.cursor() as cursor:
+            cursor.execute('''
+                SELECT u.id, u.first_name, u.last_name, u.username
+                FROM users u
+                WHERE u.role = 'STUDENT' 
+                AND u.id NOT IN (
+                    SELECT student_id FROM student_classes WHERE class_id = ?
+                )
+                ORDER BY u.first_name, u.last_name
+            ''', (class_id,))
+            available_students = cursor.fetchall()
         
         if not available_students:
             messagebox.showinfo("Info", "Todos os estudantes já estão nesta turma.")
@@ -3071,14 +6738,11 @@ class SecretaryFrame(tk.Frame):
             
             student_id = available_students[selection[0]][0]
             
-            conn = sqlite3.connect('academic_system.db')
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT OR IGNORE INTO student_classes (student_id, class_id)
-                VALUES (?, ?)
-            ''', (student_id, class_id))
-            conn.commit()
-            conn.close()
+            with db.transaction() as cursor:
+                cursor.execute('''
+                    INSERT OR IGNORE INTO student_classes (student_id, class_id)
+                    VALUES (?, ?)
+                ''', (student_id, class_id))
             
             messagebox.showinfo("Sucesso", "Estudante adicionado à turma!")
             select_window.destroy()
@@ -3102,18 +6766,14 @@ class SecretaryFrame(tk.Frame):
                                    f"Remover {student_text} da turma?"):
             return
         
-        conn = sqlite3.connect('academic_system.db')
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT id FROM users WHERE username = ?", (username,))
-        student_id = cursor.fetchone()[0]
+        with db.transaction() as cursor:
+            cursor.execute("SELECT id FROM users WHERE username = ?", (username,))
+            student_id = cursor.fetchone()[0]
         
-        cursor.execute('''
-            DELETE FROM student_classes 
-            WHERE student_id = ? AND class_id = ?
-        ''', (student_id, class_id))
-        conn.commit()
-        conn.close()
+            cursor.execute('''
+                DELETE FROM student_classes 
+                WHERE student_id = ? AND class_id = ?
+            ''', (student_id, class_id))
         
         messagebox.showinfo("Sucesso", "Estudante removido da turma!")
         self.manage_classes()  # Refresh
@@ -3185,19 +6845,14 @@ class SecretaryFrame(tk.Frame):
                 messagebox.showerror("Erro", "Por favor, preencha título e conteúdo.")
                 return
             
-            conn = sqlite3.connect('academic_system.db')
-            cursor = conn.cursor()
-            
-            target_class_id = None if target == "all" else int(target)
-            user_id = self.controller.current_user['id']
+            with db.transaction() as cursor:
+                target_class_id = None if target == "all" else int(target)
+                user_id = self.controller.current_user['id']
             
-            cursor.execute('''
-                INSERT INTO announcements (title, content, target_class_id, created_by, priority)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (title, content, target_class_id, user_id, priority))
-            
-            conn.commit()
-            conn.close()
+                cursor.execute('''
+                    INSERT INTO announcements (title, content, target_class_id, created_by, priority)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (title, content, target_class_id, user_id, priority))
             
             target_text = "todas as turmas" if target == "all" else f"Turma {'A' if target == '1' else 'B'}"
             messagebox.showinfo("Sucesso", f"Aviso enviado para {target_text}!")
@@ -3215,18 +6870,15 @@ class SecretaryFrame(tk.Frame):
                                     fg="#2c3e50", padx=20, pady=10)
         recent_frame.pack(fill="x", padx=30, pady=(0, 20))
         
-        conn = sqlite3.connect('academic_system.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT a.title, a.created_at, c.name as class_name, a.priority
-            FROM announcements a
-            LEFT JOIN classes c ON a.target_class_id = c.id
-            ORDER BY a.created_at DESC
-            LIMIT 5
-        ''')
-        recent_announcements = cursor.fetchall()
-        conn.close()
+        with db.cursor() as cursor:
+            cursor.execute('''
+                SELECT a.title, a.created_at, c.name as class_name, a.priority
+                FROM announcements a
+                LEFT JOIN classes c ON a.target_class_id = c.id
+                ORDER BY a.created_at DESC
+                LIMIT 5
+            ''')
+            recent_announcements = cursor.fetchall()
         
         if recent_announcements:
             for title, created_at, class_name, priority in recent_announcements:
@@ -3278,34 +6930,38 @@ class SecretaryFrame(tk.Frame):
                 return
             
             # Connect to database
-            conn = sqlite3.connect('academic_system.db')
-            cursor = conn.cursor()
+            with db.transaction() as cursor:
+                imported_count = 0
+                errors = []
             
-            imported_count = 0
-            errors = []
-            
-            for row_num, row in df.iterrows():
-                try:
-                    # Insert or update student record
-                    cursor.execute('''
-                        INSERT OR REPLACE INTO users 
-                        (username, password, first_name, last_name, email, role)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    ''', (
-                        row['username'],
-                        row.get('password', 'default123'),  # Default password if not provided
-                        row['first_name'],
-                        row['last_name'],
-                        row['email'],
-                        'STUDENT'
-                    ))
-                    imported_count += 1
+                for row_num, row in df.iterrows():
+                    try:
+                        # Insert or update student record; updating in place keeps the
+                        # user id (and its enrollments) and fires the users_fts triggers
+                        cursor.execute('''
+                            INSERT INTO users
+                            (username, password, first_name, last_name, email, role)
+                            VALUES (:username, COALESCE(:password, 'default123'),
+                                    :first_name, :last_name, :email, 'STUDENT')
+                            ON CONFLICT (username) DO UPDATE SET
+                                password = COALESCE(:password, users.password),
+                                first_name = excluded.first_name,
+                                last_name = excluded.last_name,
+                                email = excluded.email,
+                                role = excluded.role
+                        ''', {
+                            'username': row['username'],
+                            # Without a password column new students get the default one
+                            # and existing ones keep theirs
+                            'password': row.get('password'),
+                            'first_name': row['first_name'],
+                            'last_name': row['last_name'],
+                            'email': row['email'],
+                        })
+                        imported_count += 1
                     
-                except Exception as e:
-                    errors.append(f"Row {imported_count + 1}: {str(e)}")
-            
-            conn.commit()
-            conn.close()
+                    except Exception as e:
+                        errors.append(f"Row {imported_count + 1}: {str(e)}")
             
             # Show result
             message = f"Importados {imported_count} estudantes com sucesso."
@@ -3358,11 +7014,13 @@ class SecretaryFrame(tk.Frame):
         class_frame = tk.Frame(register_window)
         class_frame.pack(pady=5)
         
-        # Get available classes
-        conn = sqlite3.connect('academic_system.db')
-        cursor = conn.cursor()
-        cursor.execute('SELECT id, name FROM classes ORDER BY name')
-        available_classes = cursor.fetchall()
+        # Get available classes and courses
+        with db.cursor() as cursor:
+            cursor.execute('SELECT id, name FROM classes ORDER BY name')
+            available_classes = cursor.fetchall()
+            
+            cursor.execute('SELECT id, name FROM courses ORDER BY name')
+            available_courses = cursor.fetchall()
         
         class_var = tk.StringVar()
         if available_classes:
@@ -3393,11 +7051,6 @@ class SecretaryFrame(tk.Frame):
         canvas.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
         
-        # Get available courses
-        cursor.execute('SELECT id, name FROM courses ORDER BY name')
-        available_courses = cursor.fetchall()
-        conn.close()
-        
         # Create checkboxes for courses
         course_vars = {}
         if available_courses:
@@ -3432,14 +7085,11 @@ class SecretaryFrame(tk.Frame):
                     student_id = result['student_id']
                     
                     # Assign to class
-                    conn = sqlite3.connect('academic_system.db')
-                    cursor = conn.cursor()
-                    cursor.execute('''
-                        INSERT OR IGNORE INTO student_classes (student_id, class_id)
-                        VALUES (?, ?)
-                    ''', (student_id, int(selected_class)))
-                    conn.commit()
-                    conn.close()
+                    with db.transaction() as cursor:
+                        cursor.execute('''
+                            INSERT OR IGNORE INTO student_classes (student_id, class_id)
+                            VALUES (?, ?)
+                        ''', (student_id, int(selected_class)))
                     
                     # Enroll student in selected courses
                     selected_courses = [course_id for course_id, var in course_vars.items() if var.get()]
@@ -3447,11 +7097,9 @@ class SecretaryFrame(tk.Frame):
                         self.enroll_student_in_courses(student_id, selected_courses)
                     
                     # Get class name
-                    conn = sqlite3.connect('academic_system.db')
-                    cursor = conn.cursor()
-                    cursor.execute('SELECT name FROM classes WHERE id = ?', (int(selected_class),))
-                    class_name = cursor.fetchone()[0]
-                    conn.close()
+                    with db.cursor() as cursor:
+                        cursor.execute('SELECT name FROM classes WHERE id = ?', (int(selected_class),))
+                        class_name = cursor.fetchone()[0]
                     
                     course_info = f"\nMatriculado em {len(selected_courses)} disciplina(s)" if selected_courses else "\nSem matrículas em disciplinas"
                     
@@ -3486,12 +7134,8 @@ class SecretaryFrame(tk.Frame):
                 return {'success': False, 'error': 'Módulo C não encontrado. Execute compile.bat para compilar.'}
             
             # Chamar o executável C com o comando register
-            result = subprocess.run(
-                [exe_path, 'register', username, password, first_name, last_name, email],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
+            result = run_c_module([exe_path, 'register', username, password, first_name, last_name, email],
+                                  timeout=10)
             
             # Processar a saída do programa C
             output = result.stdout.strip()
@@ -3524,27 +7168,17 @@ class SecretaryFrame(tk.Frame):
             exe_path = os.path.join(os.path.dirname(__file__), 'academic_module.exe')
             if not os.path.exists(exe_path):
                 # Fallback para Python se o módulo C não existir
-                conn = sqlite3.connect('academic_system.db')
-                cursor = conn.cursor()
-                
-                for course_id in course_ids:
-                    cursor.execute('''
-                        INSERT OR IGNORE INTO enrollments (user_id, course_id)
-                        VALUES (?, ?)
-                    ''', (student_id, course_id))
-                
-                conn.commit()
-                conn.close()
+                with db.transaction() as cursor:
+                    for course_id in course_ids:
+                        cursor.execute('''
+                            INSERT OR IGNORE INTO enrollments (user_id, course_id)
+                            VALUES (?, ?)
+                        ''', (student_id, course_id))
                 return
             
             # Usar o módulo C para matricular
             for course_id in course_ids:
-                result = subprocess.run(
-                    [exe_path, 'enroll', str(student_id), str(course_id)],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
+                result = run_c_module([exe_path, 'enroll', str(student_id), str(course_id)], timeout=5)
                 
                 if result.returncode != 0:
                     print(f"Aviso: Falha ao matricular em curso {course_id}")
@@ -3583,15 +7217,13 @@ class SecretaryFrame(tk.Frame):
         scrollbar.pack(side="right", fill="y")
         
         # Load students
-        conn = sqlite3.connect('academic_system.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT id, username, first_name || ' ' || last_name, email 
-            FROM users WHERE role = 'STUDENT'
-            ORDER BY first_name, last_name
-        ''')
-        students = cursor.fetchall()
-        conn.close()
+        with db.cursor() as cursor:
+            cursor.execute('''
+                SELECT id, username, first_name || ' ' || last_name, email 
+                FROM users WHERE role = 'STUDENT'
+                ORDER BY first_name, last_name
+            ''')
+            students = cursor.fetchall()
         
         for student in students:
             tree.insert("", "end", values=student)
@@ -3634,70 +7266,64 @@ class SecretaryFrame(tk.Frame):
         scrollbar.pack(side="right", fill="y")
         
         # Load students with course information
-        conn = sqlite3.connect('academic_system.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT u.id, u.username, u.first_name, u.last_name, u.email,
-                   GROUP_CONCAT(c.name, ', ') as courses
-            FROM users u
-            LEFT JOIN enrollments e ON u.id = e.user_id
-            LEFT JOIN courses c ON e.course_id = c.id
-            WHERE u.role = 'STUDENT'
-            GROUP BY u.id, u.username, u.first_name, u.last_name, u.email
-            ORDER BY u.first_name, u.last_name
-        ''')
+        with db.cursor() as cursor:
+            cursor.execute('''
+                SELECT u.id, u.username, u.first_name, u.last_name, u.email,
+                       GROUP_CONCAT(c.name, ', ') as courses
+                FROM users u
+                LEFT JOIN enrollments e ON u.id = e.user_id
+                LEFT JOIN courses c ON e.course_id = c.id
+                WHERE u.role = 'STUDENT'
+                GROUP BY u.id, u.username, u.first_name, u.last_name, u.email
+                ORDER BY u.first_name, u.last_name
+            ''')
         
-        students = cursor.fetchall()
-        conn.close()
+            students = cursor.fetchall()
         
-        for student in students:
-            courses = student[5] if student[5] else "Sem matrículas"
-            tree.insert("", "end", values=(
-                student[0], student[1], student[2], student[3], student[4], courses
-            ))
+        self._show_student_list(tree, students)
         
         # Button frame
         button_frame = tk.Frame(students_window)
         button_frame.pack(pady=10)
         
-        tk.Button(button_frame, text="Atualizar", command=lambda: self.refresh_student_list(tree),
+        tk.Button(button_frame, text="Atualizar", command=lambda: self.refresh_student_list(tree, loading_label),
                  bg="#4CAF50", fg="white").pack(side="left", padx=5)
         
         tk.Button(button_frame, text="Fechar", command=students_window.destroy,
                  bg="#f44336", fg="white").pack(side="left", padx=5)
+        
+        loading_label = tk.Label(button_frame, text="", font=("Arial", 9, "italic"), fg="#7f8c8d")
+        loading_label.pack(side="left", padx=5)
     
-    def refresh_student_list(self, tree):
+    def refresh_student_list(self, tree, indicator=None):
         """Refresh the student list in the treeview."""
-        # Clear existing items
-        for item in tree.get_children():
-            tree.delete(item)
-        
-        # Reload students
-        conn = sqlite3.connect('academic_system.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT u.id, u.username, u.first_name, u.last_name, u.email,
-                   GROUP_CONCAT(c.name, ', ') as courses
-            FROM users u
-            LEFT JOIN enrollments e ON u.id = e.user_id
-            LEFT JOIN courses c ON e.course_id = c.id
-            WHERE u.role = 'STUDENT'
-            GROUP BY u.id, u.username, u.first_name, u.last_name, u.email
-            ORDER BY u.first_name, u.last_name
-        ''')
+        def query(cursor):
+            cursor.execute('''
+                SELECT u.id, u.username, u.first_name, u.last_name, u.email,
+                       GROUP_CONCAT(c.name, ', ') as courses
+                FROM users u
+                LEFT JOIN enrollments e ON u.id = e.user_id
+                LEFT JOIN courses c ON e.course_id = c.id
+                WHERE u.role = 'STUDENT'
+                GROUP BY u.id, u.username, u.first_name, u.last_name, u.email
+                ORDER BY u.first_name, u.last_name
+            ''')
         
-        students = cursor.fetchall()
-        conn.close()
+            return cursor.fetchall()
         
-        for student in students:
-            courses = student[5] if student[5] else "Sem matrículas"
-            tree.insert("", "end", values=(
-                student[0], student[1], student[2], student[3], student[4], courses
-            ))
+        def show(students):
+            self._show_student_list(tree, students)
+            messagebox.showinfo("Atualizado", "Lista de estudantes foi atualizada.")
         
-        messagebox.showinfo("Atualizado", "Lista de estudantes foi atualizada.")
+        db_worker.submit('secretary.students', query, show, indicator=indicator)
+    
+    @staticmethod
+    def _show_student_list(tree, students):
+        # Keyed by user ID, so a refresh only touches students that changed
+        reconcile_tree(tree, ((student[0], (
+            student[0], student[1], student[2], student[3], student[4],
+            student[5] if student[5] else "Sem matrículas"
+        )) for student in students))
     
     def process_enrollments(self):
         """Process student enrollments in courses."""
@@ -3723,14 +7349,12 @@ class SecretaryFrame(tk.Frame):
         student_combo.pack(side="left", padx=5, pady=10)
         
         # Load students
-        conn = sqlite3.connect('academic_system.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT id, first_name || ' ' || last_name || ' (' || username || ')' as display_name
-            FROM users WHERE role = 'STUDENT' ORDER BY first_name, last_name
-        ''')
-        students = cursor.fetchall()
-        conn.close()
+        with db.cursor() as cursor:
+            cursor.execute('''
+                SELECT id, first_name || ' ' || last_name || ' (' || username || ')' as display_name
+                FROM users WHERE role = 'STUDENT' ORDER BY first_name, last_name
+            ''')
+            students = cursor.fetchall()
         
         student_list = [f"{student[1]} (ID: {student[0]})" for student in students]
         student_combo['values'] = student_list
@@ -3744,11 +7368,9 @@ class SecretaryFrame(tk.Frame):
         courses_scroll_frame.pack(fill="both", expand=True, padx=10, pady=10)
         
         # Get courses
-        conn = sqlite3.connect('academic_system.db')
-        cursor = conn.cursor()
-        cursor.execute('SELECT id, name FROM courses ORDER BY name')
-        courses = cursor.fetchall()
-        conn.close()
+        with db.cursor() as cursor:
+            cursor.execute('SELECT id, name FROM courses ORDER BY name')
+            courses = cursor.fetchall()
         
         course_vars = {}
         for course_id, course_name in courses:
@@ -3773,15 +7395,13 @@ class SecretaryFrame(tk.Frame):
             
             student_id = int(selection.split("ID: ")[1].rstrip(")"))
             
-            conn = sqlite3.connect('academic_system.db')
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT c.name FROM courses c
-                JOIN enrollments e ON c.id = e.course_id
-                WHERE e.user_id = ?
-            ''', (student_id,))
-            enrolled_courses = cursor.fetchall()
-            conn.close()
+            with db.cursor() as cursor:
+                cursor.execute('''
+                    SELECT c.name FROM courses c
+                    JOIN enrollments e ON c.id = e.course_id
+                    WHERE e.user_id = ?
+                ''', (student_id,))
+                enrolled_courses = cursor.fetchall()
             
             current_text.delete(1.0, tk.END)
             if enrolled_courses:
@@ -3808,20 +7428,15 @@ class SecretaryFrame(tk.Frame):
                 return
             
             try:
-                conn = sqlite3.connect('academic_system.db')
-                cursor = conn.cursor()
-                
-                enrolled_count = 0
-                for course_id in selected_courses:
-                    cursor.execute('''
-                        INSERT OR IGNORE INTO enrollments (user_id, course_id)
-                        VALUES (?, ?)
-                    ''', (student_id, course_id))
-                    if cursor.rowcount > 0:
-                        enrolled_count += 1
-                
-                conn.commit()
-                conn.close()
+                with db.transaction() as cursor:
+                    enrolled_count = 0
+                    for course_id in selected_courses:
+                        cursor.execute('''
+                            INSERT OR IGNORE INTO enrollments (user_id, course_id)
+                            VALUES (?, ?)
+                        ''', (student_id, course_id))
+                        if cursor.rowcount > 0:
+                            enrolled_count += 1
                 
                 messagebox.showinfo("Sucesso", 
                                   f"Estudante matriculado com sucesso em {enrolled_count} nova(s) disciplina(s).")
@@ -3845,6 +7460,59 @@ class SecretaryFrame(tk.Frame):
         tk.Button(button_frame, text="Fechar", command=enrollment_window.destroy,
                  bg="#f44336", fg="white", font=("Arial", 11), width=15).pack(side="left", padx=5)
     
+    @staticmethod
+    def fetch_student_report(cursor, report_type):
+        """(columns, rows) for one of the enrollment/academic/contact/summary reports."""
+        if report_type == "enrollment":
+            cursor.execute('''
+                SELECT u.first_name || ' ' || u.last_name as name, u.email,
+                       GROUP_CONCAT(c.name, ', ') as courses
+                FROM users u
+                LEFT JOIN enrollments e ON u.id = e.user_id
+                LEFT JOIN courses c ON e.course_id = c.id
+                WHERE u.role = 'STUDENT'
+                GROUP BY u.id, u.first_name, u.last_name, u.email
+                ORDER BY u.first_name, u.last_name
+            ''')
+            columns = ["Nome do Estudante", "Email", "Disciplinas Matriculadas"]
+        
+        elif report_type == "academic":
+            cursor.execute('''
+                SELECT u.first_name || ' ' || u.last_name as name,
+                       c.name as course, COALESCE(st.grade_avg, 0) as avg_grade
+                FROM users u
+                JOIN enrollments e ON u.id = e.user_id
+                JOIN courses c ON e.course_id = c.id
+                LEFT JOIN student_course_stats st ON st.student_id = u.id AND st.course_id = c.id
+                WHERE u.role = 'STUDENT'
+                ORDER BY u.first_name, u.last_name, c.name
+            ''')
+            columns = ["Nome do Estudante", "Disciplina", "Média de Notas"]
+        
+        elif report_type == "contact":
+            cursor.execute('''
+                SELECT first_name || ' ' || last_name as name, 
+                       username, email
+                FROM users WHERE role = 'STUDENT'
+                ORDER BY first_name, last_name
+            ''')
+            columns = ["Nome do Estudante", "Usuário", "Email"]
+        
+        else:  # summary
+            cursor.execute('''
+                SELECT u.first_name || ' ' || u.last_name as name,
+                       u.username, u.email,
+                       (SELECT COUNT(*) FROM enrollments e WHERE e.user_id = u.id) as course_count,
+                       COALESCE((SELECT SUM(st.grade_sum) / SUM(st.graded_count)
+                                 FROM student_course_stats st WHERE st.student_id = u.id), 0) as overall_avg
+                FROM users u
+                WHERE u.role = 'STUDENT'
+                ORDER BY u.first_name, u.last_name
+            ''')
+            columns = ["Nome do Estudante", "Usuário", "Email", "Disciplinas Matriculadas", "Média Geral"]
+        
+        return columns, cursor.fetchall()
+    
     def generate_student_reports(self):
         """Generate various student reports."""
         reports_window = tk.Toplevel(self.controller)
@@ -3891,72 +7559,22 @@ class SecretaryFrame(tk.Frame):
             report_type = report_var.get()
             output_format = format_var.get()
             
-            try:
-                conn = sqlite3.connect('academic_system.db')
-                cursor = conn.cursor()
-                
-                if report_type == "enrollment":
-                    cursor.execute('''
-                        SELECT u.first_name || ' ' || u.last_name as name, u.email,
-                               GROUP_CONCAT(c.name, ', ') as courses
-                        FROM users u
-                        LEFT JOIN enrollments e ON u.id = e.user_id
-                        LEFT JOIN courses c ON e.course_id = c.id
-                        WHERE u.role = 'STUDENT'
-                        GROUP BY u.id, u.first_name, u.last_name, u.email
-                        ORDER BY u.first_name, u.last_name
-                    ''')
-                    columns = ["Nome do Estudante", "Email", "Disciplinas Matriculadas"]
-                    
-                elif report_type == "academic":
-                    cursor.execute('''
-                        SELECT u.first_name || ' ' || u.last_name as name,
-                               c.name as course, COALESCE(AVG(s.grade), 0) as avg_grade
-                        FROM users u
-                        JOIN enrollments e ON u.id = e.user_id
-                        JOIN courses c ON e.course_id = c.id
-                        LEFT JOIN submissions s ON u.id = s.student_id
-                        LEFT JOIN assignments a ON s.assignment_id = a.id AND a.course_id = c.id
-                        WHERE u.role = 'STUDENT'
-                        GROUP BY u.id, c.id
-                        ORDER BY u.first_name, u.last_name, c.name
-                    ''')
-                    columns = ["Nome do Estudante", "Disciplina", "Média de Notas"]
-                    
-                elif report_type == "contact":
-                    cursor.execute('''
-                        SELECT first_name || ' ' || last_name as name, 
-                               username, email
-                        FROM users WHERE role = 'STUDENT'
-                        ORDER BY first_name, last_name
-                    ''')
-                    columns = ["Nome do Estudante", "Usuário", "Email"]
-                    
-                else:  # summary
-                    cursor.execute('''
-                        SELECT u.first_name || ' ' || u.last_name as name,
-                               u.username, u.email,
-                               COUNT(DISTINCT e.course_id) as course_count,
-                               COALESCE(AVG(s.grade), 0) as overall_avg
-                        FROM users u
-                        LEFT JOIN enrollments e ON u.id = e.user_id
-                        LEFT JOIN submissions s ON u.id = s.student_id
-                        WHERE u.role = 'STUDENT'
-                        GROUP BY u.id
-                        ORDER BY u.first_name, u.last_name
-                    ''')
-                    columns = ["Nome do Estudante", "Usuário", "Email", "Disciplinas Matriculadas", "Média Geral"]
-                
-                data = cursor.fetchall()
-                conn.close()
-                
+            def show(result):
+                columns, data = result
                 if output_format == "display":
                     self.display_report(data, columns, report_type)
                 else:
                     self.export_report_csv(data, columns, report_type)
-                    
-            except Exception as e:
-                messagebox.showerror("Erro", f"Falha ao gerar relatório: {str(e)}")
+            
+            # The summary report aggregates every student; keep the window responsive
+            db_worker.submit('secretary.report',
+                             lambda cursor: self.fetch_student_report(cursor, report_type),
+                             show, indicator=loading_label,
+                             on_error=lambda e: messagebox.showerror(
+                                 "Erro", f"Falha ao gerar relatório: {str(e)}", parent=reports_window))
+        
+        loading_label = tk.Label(reports_window, text="", font=("Arial", 9, "italic"), fg="#7f8c8d")
+        loading_label.pack()
         
         # Buttons
         button_frame = tk.Frame(reports_window)
@@ -4084,6 +7702,11 @@ class DirectorFrame(tk.Frame):
                  bg="#2196F3", fg="white",
                  command=self.generate_reports_c_module).pack(pady=10)
         
+        tk.Button(content_frame, text="Painel de Desempenho", 
+                 font=("Arial", 11), width=35, height=2,
+                 bg="#607D8B", fg="white",
+                 command=self.show_performance_panel).pack(pady=10)
+        
         # Other director functions
         other_functions = [
             "View Institution Analytics",
@@ -4141,19 +7764,858 @@ class DirectorFrame(tk.Frame):
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
+    def show_performance_panel(self):
+        """Live view of query_monitor: time spent per screen query and recent slow queries."""
+        panel = tk.Toplevel(self.controller)
+        panel.title("Painel de Desempenho")
+        panel.geometry("1100x650")
+        
+        # Controls
+        controls = tk.Frame(panel)
+        controls.pack(fill="x", padx=10, pady=10)
+        
+        tk.Label(controls, text="Consulta lenta a partir de (ms):", font=("Arial", 10)).pack(side="left")
+        slow_var = tk.StringVar(value=f"{query_monitor.slow_ms:g}")
+        slow_entry = tk.Entry(controls, textvariable=slow_var, width=8)
+        slow_entry.pack(side="left", padx=5)
+        
+        def apply_threshold(event=None):
+            try:
+                query_monitor.slow_ms = float(slow_var.get())
+            except ValueError:
+                slow_var.set(f"{query_monitor.slow_ms:g}")
+        
+        slow_entry.bind('<Return>', apply_threshold)
+        slow_entry.bind('<FocusOut>', apply_threshold)
+        
+        explain_var = tk.BooleanVar(value=query_monitor.explain)
+        tk.Checkbutton(controls, text="Capturar EXPLAIN QUERY PLAN", variable=explain_var,
+                      command=lambda: setattr(query_monitor, 'explain', explain_var.get())).pack(side="left", padx=15)
+        
+        tk.Button(controls, text="Zerar Estatísticas", bg="#f44336", fg="white",
+                 command=lambda: [query_monitor.reset(), refresh()]).pack(side="right")
+        tk.Label(controls, text=f"Log: {os.path.abspath(query_monitor.log_path)}",
+                font=("Arial", 9), fg="#7f8c8d").pack(side="right", padx=10)
+        
+        # Totals per caller and statement
+        totals_frame = tk.LabelFrame(panel, text="Tempo por Consulta", font=("Arial", 11, "bold"))
+        totals_frame.pack(fill="both", expand=True, padx=10, pady=5)
+        
+        columns = ("Origem", "Tipo", "Execuções", "Total (ms)", "Média (ms)", "Máx (ms)", "Linhas", "Comando")
+        widths = (230, 60, 80, 90, 90, 90, 70, 380)
+        totals_tree = ttk.Treeview(totals_frame, columns=columns, show="headings", height=12)
+        for col, width in zip(columns, widths):
+            totals_tree.heading(col, text=col)
+            totals_tree.column(col, width=width, anchor="w" if col in ("Origem", "Comando") else "e")
+        totals_scroll = ttk.Scrollbar(totals_frame, orient="vertical", command=totals_tree.yview)
+        totals_tree.configure(yscrollcommand=totals_scroll.set)
+        totals_tree.pack(side="left", fill="both", expand=True)
+        totals_scroll.pack(side="right", fill="y")
+        
+        # Recent slow statements
+        slow_frame = tk.LabelFrame(panel, text="Consultas Lentas Recentes", font=("Arial", 11, "bold"))
+        slow_frame.pack(fill="both", expand=True, padx=10, pady=5)
+        
+        slow_columns = ("Horário", "Origem", "Tempo (ms)", "Linhas", "Comando", "Plano")
+        slow_widths = (130, 230, 90, 70, 330, 250)
+        slow_tree = ttk.Treeview(slow_frame, columns=slow_columns, show="headings", height=8)
+        for col, width in zip(slow_columns, slow_widths):
+            slow_tree.heading(col, text=col)
+            slow_tree.column(col, width=width, anchor="e" if col in ("Tempo (ms)", "Linhas") else "w")
+        slow_scroll = ttk.Scrollbar(slow_frame, orient="vertical", command=slow_tree.yview)
+        slow_tree.configure(yscrollcommand=slow_scroll.set)
+        slow_tree.pack(side="left", fill="both", expand=True)
+        slow_scroll.pack(side="right", fill="y")
+        
+        # Short stable iids for the (caller, kind, statement) keys of summary()
+        totals_iids = {}
+        
+        def refresh():
+            if not panel.winfo_exists():
+                return
+            # Reconciled, so selection and scroll survive the periodic refresh
+            reconcile_tree(totals_tree, ((
+                totals_iids.setdefault((row['caller'], row['kind'], row['statement']), len(totals_iids)), (
+                    row['caller'], row['kind'], row['count'], f"{row['total_ms']:.1f}",
+                    f"{row['total_ms'] / row['count']:.2f}", f"{row['max_ms']:.1f}",
+                    row['rows'], row['statement']
+                )) for row in query_monitor.summary()))
+            # A record is one execution; it keeps its identity while it stays in the deque
+            reconcile_tree(slow_tree, ((id(record), (
+                record['at'], record['caller'], f"{record['elapsed'] * 1000:.1f}",
+                record['rows'], record['statement'], record['plan'] or ""
+            )) for record in query_monitor.slow_queries()))
+        
+        def tick():
+            if panel.winfo_exists():
+                refresh()
+                panel.after(1000, tick)
+        
+        tick()
+    
     def placeholder_action(self, function_name):
         """Placeholder action for director functions."""
         messagebox.showinfo("Function", f"{function_name} - Feature coming soon!")
 
 
-def main():
+def _literal_queries(source_path: str, wanted) -> List[tuple]:
+    """Return (location, sql) for the literal SQL in the top-level classes and functions wanted(name) accepts.
+    
+    SQL counts as literal when it is passed to execute/executemany (or any
+    call, if it starts with a DML keyword) or assigned to a class attribute,
+    as a string or an f-string whose fields are module-level names, such as
+    QUIZ_BANK_FIELDS. f-strings built from local values and str.format
+    templates (TeacherFrame.GRADE_GRID_PIVOT) are skipped.
+    location is "Class.method" or "function", extended with the names of
+    nested functions (e.g. "TeacherFrame.view_submissions.load_submissions").
+    """
+    import ast
+    import re
+    
+    with open(source_path, encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    
+    statement = re.compile(r'\s*(SELECT|WITH|INSERT|REPLACE|UPDATE|DELETE)\s')
+    found = []
+    
+    def text(node):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            return node.value
+        if not isinstance(node, ast.JoinedStr):
+            return None
+        parts = []
+        for value in node.values:
+            if isinstance(value, ast.Constant):
+                parts.append(value.value)
+                continue
+            try:
+                parts.append(str(eval(compile(ast.Expression(value.value), source_path, 'eval'), globals())))
+            except NameError:
+                return None
+        return ''.join(parts)
+    
+    def visit(node, location):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, ast.FunctionDef):
+                visit(child, f"{location}.{child.name}")
+                continue
+            if isinstance(child, ast.Call) and child.args:
+                sql = text(child.args[0])
+                executed = isinstance(child.func, ast.Attribute) and child.func.attr in ('execute', 'executemany')
+                if sql is not None and (executed or statement.match(sql)):
+                    found.append((location, ' '.join(sql.split())))
+            visit(child, location)
+    
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef) and wanted(node.name):
+            visit(node, node.name)
+        elif isinstance(node, ast.ClassDef) and wanted(node.name):
+            for member in node.body:
+                if isinstance(member, ast.FunctionDef):
+                    visit(member, f"{node.name}.{member.name}")
+                elif isinstance(member, ast.Assign) and len(member.targets) == 1:
+                    sql = text(member.value)
+                    if sql is not None and statement.match(sql) and not re.search(r'\{\w*\}', sql):
+                        found.append((f"{node.name}.{member.targets[0].id}", ' '.join(sql.split())))
+    return found
+
+
+def frame_queries(source_path: str = __file__):
+    """Return (location, sql) for every literal SQL statement run inside a *Frame class."""
+    return _literal_queries(source_path, lambda name: name.endswith('Frame'))
+
+
+def helper_queries(source_path: str = __file__):
+    """Return (location, sql) for the literal SQL of every PLAN_CHECKED_HELPERS class and function."""
+    return _literal_queries(source_path, PLAN_CHECKED_HELPERS.__contains__)
+
+
+def keyset_queries():
+    """Return (location, sql) for every KeysetQuery a *Frame class defines, per sort and direction.
+    
+    Both the first page and a following page are rendered, since the keyset
+    condition can change the plan.
+    """
+    found = []
+    for cls in (LoginFrame, TeacherFrame, StudentFrame, CoordinatorFrame, SecretaryFrame, DirectorFrame):
+        for name, query in vars(cls).items():
+            if not isinstance(query, KeysetQuery):
+                continue
+            for sort in query.sorts:
+                for descending in (False, True):
+                    for after in (False, True):
+                        sql = query.render(sort, descending, after)
+                        found.append((f"{cls.__name__}.{name}[{sort}]", ' '.join(sql.split())))
+    return found
+
+
+def check_query_plans(path: Optional[str] = None):
+    """Run EXPLAIN QUERY PLAN on every frame and helper query and report full table scans.
+    
+    Without a path the check builds a scratch database with the current
+    schema and indexes. Returns a list of (location, sql, plan detail) for
+    each scan of a table outside REFERENCE_TABLES and the tables the
+    location's PLAN_CHECKED_HELPERS entry reads whole; an empty list means pass.
+    """
+    import re
+    import shutil
+    import tempfile
+    
+    work_dir = None
+    if path is None:
+        work_dir = tempfile.mkdtemp(prefix='academic_plans_')
+        path = os.path.join(work_dir, 'academic_system.db')
+    database = Database(path)
+    failures = []
+    try:
+        if work_dir:
+            migrate(database)
+        
+        alias_pattern = re.compile(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', re.IGNORECASE)
+        with database.cursor() as cursor:
+            # Scans of subquery results (FROM (...) g) are not table scans
+            cursor.execute("SELECT lower(name) FROM sqlite_master WHERE type = 'table'")
+            tables = {row[0] for row in cursor.fetchall()}
+            for location, sql in frame_queries() + keyset_queries() + helper_queries():
+                if not sql.upper().startswith(('SELECT', 'UPDATE', 'DELETE', 'WITH', 'INSERT', 'REPLACE')):
+                    continue
+                allowed = REFERENCE_TABLES.union(PLAN_CHECKED_HELPERS.get(location.split('.')[0], ()))
+
+                aliases = {}
+                for table, alias in alias_pattern.findall(sql):
+                    aliases[table.lower()] = table.lower()
+                    if alias and alias.upper() not in ('ON', 'WHERE', 'LEFT', 'JOIN', 'GROUP', 'ORDER', 'SET'):
+                        aliases[alias.lower()] = table.lower()
+                
+                named = set(re.findall(r':(\w+)', sql))
+                params = dict.fromkeys(named) if named else (None,) * sql.count('?')
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                for row in cursor.fetchall():
+                    detail = row[3]
+                    match = re.match(r'SCAN (\w+)$', detail)
+                    table = match and aliases.get(match.group(1).lower(), match.group(1).lower())
+                    if table in tables and table not in allowed:
+                        failures.append((location, sql, detail))
+    finally:
+        database.close()
+        if work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return failures
+
+
+def check_keyset_paging(path: str, page_size: int = 100):
+    """Page through the student lists of a database under every sort and compare with one read.
+    
+    Rows whose sort value made the keyset comparison unknown (NULL) would go
+    missing from later pages. Returns (location, rows paged, rows in total)
+    for each sort and direction where the two differ.
+    """
+    database = Database(path)
+    failures = []
+    try:
+        with database.cursor() as cursor:
+            cursor.execute('''
+                SELECT course_id FROM enrollments GROUP BY course_id ORDER BY COUNT(*) DESC LIMIT 1
+            ''')
+            busiest = cursor.fetchone()
+            cases = [("TeacherFrame.ALL_STUDENTS", TeacherFrame.ALL_STUDENTS, {})]
+            if busiest:
+                cases.append(("TeacherFrame.COURSE_STUDENTS", TeacherFrame.COURSE_STUDENTS,
+                              {'course_id': busiest[0], 'class_filter': 'Todas'}))
+            for name, query, params in cases:
+                total = len(query.page(cursor, params, limit=-1)[0])
+                for sort in query.sorts:
+                    for descending in (False, True):
+                        paged, after = 0, None
+                        while True:
+                            rows, positions = query.page(cursor, params, sort, descending, after,
+                                                         limit=page_size)
+                            paged += len(rows)
+                            if len(rows) < page_size:
+                                break
+                            after = positions[-1]
+                        if paged != total:
+                            direction = 'desc' if descending else 'asc'
+                            failures.append((f"{name}[{sort}, {direction}]", paged, total))
+    finally:
+        database.close()
+    return failures
+
+
+def _insert_stress_announcement(cursor, title):
+    """Write used by the concurrency check."""
+    cursor.execute('''
+        INSERT INTO announcements (title, content, priority)
+        VALUES (?, 'concurrency check', 'normal')
+    ''', (title,))
+
+
+def _concurrency_reader(path, storage_mode, worker_id, iterations, results):
+    """Child process: run the teacher course query repeatedly and time each read."""
+    database = Database(path, storage_mode)
+    read_times, errors = [], []
+    for i in range(iterations):
+        try:
+            start = time.perf_counter()
+            with database.cursor() as cursor:
+                cursor.execute('''
+                    SELECT u.id, u.first_name || ' ' || u.last_name, COUNT(s.id)
+                    FROM users u
+                    JOIN enrollments e ON u.id = e.user_id
+                    LEFT JOIN submissions s ON u.id = s.student_id
+                    WHERE e.course_id = 1 AND u.role = 'STUDENT'
+                    GROUP BY u.id
+                ''')
+                cursor.fetchall()
+                cursor.execute('SELECT COUNT(*) FROM announcements')
+                cursor.fetchone()
+            read_times.append(time.perf_counter() - start)
+            if i % 5 == 0:
+                database.run_write(_insert_stress_announcement, f'reader {worker_id}-{i}')
+        except sqlite3.Error as e:
+            errors.append(str(e))
+    database.close()
+    results.put({'role': 'reader', 'read_times': read_times, 'errors': errors,
+                 'writes': len(range(0, iterations, 5))})
+
+
+def _concurrency_bulk_writer(path, storage_mode, rounds, hold_seconds, results):
+    """Child process: hold long write transactions, like a large Excel import."""
+    database = Database(path, storage_mode)
+    errors = []
+    for r in range(rounds):
+        try:
+            def bulk_import(cursor):
+                for i in range(50):
+                    _insert_stress_announcement(cursor, f'bulk {r}-{i}')
+                time.sleep(hold_seconds)
+            database.run_write(bulk_import)
+        except sqlite3.Error as e:
+            errors.append(str(e))
+    database.close()
+    results.put({'role': 'writer', 'read_times': [], 'errors': errors, 'writes': rounds * 50})
+
+
+def run_concurrency_check(storage_mode: str = DEFAULT_STORAGE_MODE, processes: int = 4,
+                          iterations: int = 40, hold_seconds: float = 0.3) -> Dict[str, Any]:
+    """Run several client processes reading and writing one database at once.
+    
+    One process repeatedly holds long write transactions while the others read
+    and write small rows. The check passes when no process hits an error,
+    every write lands and, in WAL mode, no read waited for a writer.
+    """
+    import multiprocessing
+    import shutil
+    import tempfile
+    
+    work_dir = tempfile.mkdtemp(prefix='academic_concurrency_')
+    path = os.path.join(work_dir, 'academic_system.db')
+    try:
+        database = Database(path, storage_mode)
+        migrate(database)
+        database.close()
+        
+        results = multiprocessing.Queue()
+        workers = [multiprocessing.Process(target=_concurrency_bulk_writer,
+                                           args=(path, storage_mode, 3, hold_seconds, results))]
+        workers += [multiprocessing.Process(target=_concurrency_reader,
+                                            args=(path, storage_mode, n, iterations, results))
+                    for n in range(processes - 1)]
+        for worker in workers:
+            worker.start()
+        reports = [results.get(timeout=120) for _ in workers]
+        for worker in workers:
+            worker.join()
+        
+        database = Database(path, storage_mode)
+        with database.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM announcements WHERE content = 'concurrency check'")
+            stored = cursor.fetchone()[0]
+        database.close()
+        
+        read_times = [t for report in reports for t in report['read_times']]
+        errors = [e for report in reports for e in report['errors']]
+        expected = sum(report['writes'] for report in reports)
+        max_read = max(read_times) if read_times else 0.0
+        passed = not errors and stored == expected
+        if storage_mode == 'wal':
+            passed = passed and max_read < hold_seconds
+        return {
+            'storage_mode': storage_mode,
+            'processes': len(workers),
+            'reads': len(read_times),
+            'max_read_seconds': max_read,
+            'writes_expected': expected,
+            'writes_stored': stored,
+            'errors': errors,
+            'passed': passed,
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def benchmark_cases(cursor) -> List[tuple]:
+    """(name, run) pairs for the frames' data-loading paths against the open database.
+    
+    Each run(cursor) executes the same fetch_* / KeysetQuery / grade_quiz
+    code the frame uses and returns the number of rows it produced. Parameters are picked
+    from the data: the busiest course, a class with students, a student of
+    that course and a quiz with questions the student has not taken yet.
+    """
+    cursor.execute('''
+        SELECT course_id FROM enrollments GROUP BY course_id ORDER BY COUNT(*) DESC LIMIT 1
+    ''')
+    course_id = cursor.fetchone()[0]
+    cursor.execute('''
+        SELECT c.name FROM classes c WHERE EXISTS (SELECT 1 FROM student_classes sc WHERE sc.class_id = c.id)
+        ORDER BY c.id LIMIT 1
+    ''')
+    class_name = cursor.fetchone()[0]
+    cursor.execute('''
+        SELECT e.user_id FROM enrollments e JOIN users u ON u.id = e.user_id
+        WHERE e.course_id = ? AND u.role = 'STUDENT' ORDER BY e.user_id LIMIT 1
+    ''', (course_id,))
+    student_id = cursor.fetchone()[0]
+    cursor.execute('''
+        SELECT a.id FROM assignments a
+        WHERE a.type = 'quiz' AND EXISTS (SELECT 1 FROM quiz_questions q WHERE q.assignment_id = a.id)
+          AND NOT EXISTS (SELECT 1 FROM submissions s WHERE s.assignment_id = a.id AND s.student_id = ?)
+        ORDER BY a.id LIMIT 1
+    ''', (student_id,))
+    quiz = cursor.fetchone()
+    
+    def grade(cursor):
+        quiz_id = quiz[0]
+        cursor.execute('''
+            SELECT id, question_text, option_a, option_b, option_c, option_d, points
+            FROM quiz_questions WHERE assignment_id = ? ORDER BY id
+        ''', (quiz_id,))
+        questions = cursor.fetchall()
+        selected = {question[0]: 'A' for question in questions}
+        StudentFrame.grade_quiz(cursor, quiz_id, student_id, selected)
+        return len(questions)
+    
+    def scroll(cursor, pages=10):
+        # What students_tree reads while the user scrolls: consecutive keyset pages
+        rows, after = 0, None
+        for _ in range(pages):
+            page, positions = TeacherFrame.ALL_STUDENTS.page(cursor, {}, after=after)
+            rows += len(page)
+            if not positions:
+                break
+            after = positions[-1]
+        return rows
+    
+    def poll_inbox(cursor):
+        # One background poll of a dashboard that is 10 announcements behind
+        student_class = StudentFrame.fetch_student_class(cursor, student_id)
+        class_id = student_class[0] if student_class else None
+        head = StudentFrame.fetch_inbox_state(cursor, student_id, class_id)[1]
+        return len(StudentFrame.fetch_new_announcements(cursor, student_id, class_id, head - 10)[1])
+    
+    engine = RiskEngine()
+    
+    cases = [
+        (f"TeacherFrame.on_course_selected[{class_filter}]",
+         lambda c, f=class_filter: len(TeacherFrame.COURSE_STUDENTS.page(
+             c, {'course_id': course_id, 'class_filter': f})[0]))
+        for class_filter in ('Todas', 'Sem Turma', class_name)
+    ]
+    cases += [
+        ("TeacherFrame.show_all_students", lambda c: len(TeacherFrame.ALL_STUDENTS.page(c, {})[0])),
+        ("TeacherFrame.students_tree[10 páginas]", scroll),
+        ("TeacherFrame.enter_grades", lambda c: len(TeacherFrame.fetch_grade_grid(c, course_id)[1])),
+        ("TeacherFrame.search_students",
+         lambda c: len(TeacherFrame.fetch_student_matches(c, 'ana', TeacherFrame.SEARCH_LIMIT + 1))),
+        # The shared risk_engine caches for db only, so each dataset gets its own engine
+        ("RiskEngine.compute", lambda c: len(RiskEngine.compute(*RiskEngine.load(c)))),
+        ("TeacherFrame.view_at_risk_students", lambda c: len(engine.at_risk(c, course_id))),
+        ("StudentFrame.load_courses", lambda c: len(StudentFrame.fetch_courses(c, student_id))),
+        ("StudentFrame.load_assignments", lambda c: len(StudentFrame.fetch_assignments(c, student_id))),
+        ("StudentFrame.load_notifications",
+         lambda c: len(StudentFrame.fetch_notifications(c, student_id)[1])),
+        ("StudentFrame.poll_inbox", poll_inbox),
+        ("StudentFrame.load_dashboard", lambda c: len(StudentDashboard.load(c, student_id)[2]['assignments'])),
+        # A dashboard raised again with nothing changed: the warm-up round fills the cache
+        ("StudentFrame.load_dashboard (cache)",
+         lambda c, cache=StudentDashboard(): len(cache.get(c, student_id)['assignments'])),
+        ("SecretaryFrame.show_dashboard", lambda c: len(SecretaryFrame.fetch_dashboard(c)[1])),
+        ("SecretaryFrame.manage_classes",
+         lambda c: sum(len(rows) for rows in SecretaryFrame.fetch_classes(c)[1].values())),
+    ]
+    cases += [
+        (f"SecretaryFrame.generate_student_reports[{report_type}]",
+         lambda c, r=report_type: len(SecretaryFrame.fetch_student_report(c, r)[1]))
+        for report_type in ('enrollment', 'academic', 'contact', 'summary')
+    ]
+    if quiz is not None:
+        cases.append(("TeacherFrame.view_submissions", lambda c: len(SubmissionListing.load(c, quiz[0])[2])))
+        cases.append(("StudentFrame.submit_quiz", grade))
+    return cases
+
+
+def _time_case(database: Database, run, rounds: int, rollback: bool) -> Dict[str, Any]:
+    """Run one case rounds times (after a warm-up) and summarize the timings in ms."""
+    import statistics
+    
+    conn = database.connection()
+    timings = []
+    rows = 0
+    for attempt in range(rounds + 1):
+        cursor = conn.cursor(InstrumentedCursor)
+        try:
+            if rollback:
+                cursor.execute('BEGIN IMMEDIATE')
+            started = time.perf_counter()
+            rows = run(cursor)
+            elapsed = (time.perf_counter() - started) * 1000
+        finally:
+            if rollback:
+                conn.rollback()
+            cursor.close()
+        if attempt:  # the first pass only warms the page cache
+            timings.append(elapsed)
+    return {
+        'rows': rows,
+        'rounds': rounds,
+        'min_ms': min(timings),
+        'max_ms': max(timings),
+        'mean_ms': statistics.mean(timings),
+        'median_ms': statistics.median(timings),
+        'stddev_ms': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+    }
+
+
+def run_benchmarks(presets=('small', 'medium'), rounds: int = 5, data_dir: Optional[str] = None,
+                   seed: int = 42) -> List[Dict[str, Any]]:
+    """Time every benchmark case against generated datasets of increasing size.
+    
+    Datasets are generated once per preset and seed into data_dir (a temp
+    directory by default) and reused on later runs. Writes (the quiz
+    grading) run inside a transaction that is rolled back, so every round
+    sees the same data.
+    """
+    import tempfile
+    
+    data_dir = data_dir or os.path.join(tempfile.gettempdir(), 'academic_benchmarks')
+    os.makedirs(data_dir, exist_ok=True)
+    
+    # Keep benchmark statements out of the slow query log
+    slow_ms, query_monitor.slow_ms = query_monitor.slow_ms, float('inf')
+    results = []
+    try:
+        for preset in presets:
+            path = os.path.join(data_dir, f"bench_{preset}_{seed}.db")
+            if not os.path.exists(path):
+                generate_institution(path, seed=seed, **DATASET_PRESETS[preset])
+            database = Database(path)
+            try:
+                migrate(database)
+                with database.cursor() as cursor:
+                    cases = benchmark_cases(cursor)
+                    cursor.execute("SELECT COUNT(*) FROM users WHERE role = 'STUDENT'")
+                    students = cursor.fetchone()[0]
+                for name, run in cases:
+                    stats = _time_case(database, run, rounds, rollback=name == "StudentFrame.submit_quiz")
+                    results.append(dict(case=name, dataset=preset, students=students, **stats))
+            finally:
+                database.close()
+    finally:
+        query_monitor.slow_ms = slow_ms
+    return results
+
+
+def write_benchmark_report(results: List[Dict[str, Any]], output: str):
+    """Write results to output.json and output.csv."""
+    import csv
+    import json
+    import platform
+    
+    with open(f"{output}.json", 'w', encoding='utf-8') as f:
+        json.dump({
+            'generated_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'results': results,
+        }, f, indent=2, ensure_ascii=False)
+    
+    with open(f"{output}.csv", 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(results[0]) if results else ['case'])
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def compare_benchmarks(results: List[Dict[str, Any]], baseline_path: str,
+                       tolerance: float = 0.25) -> List[str]:
+    """Describe every case whose median is more than tolerance slower than in the baseline report."""
+    import json
+    
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {(row['case'], row['dataset']): row for row in json.load(f)['results']}
+    
+    regressions = []
+    for row in results:
+        before = baseline.get((row['case'], row['dataset']))
+        if before and row['median_ms'] > before['median_ms'] * (1 + tolerance):
+            regressions.append(f"{row['case']} [{row['dataset']}]: "
+                               f"{before['median_ms']:.1f}ms -> {row['median_ms']:.1f}ms")
+    return regressions
+
+
+def benchmark_tree_refresh(rows: int = 5000, rounds: int = 5) -> List[Dict[str, Any]]:
+    """Time a Treeview refresh done by clear-and-insert against reconcile_tree.
+    
+    The tree starts with rows items before every round; each scenario is the
+    result set the refresh brings back. Needs a display, since Treeview is a
+    real Tk widget; the idle redraw is included in the time.
+    """
+    import statistics
+    
+    root = tk.Tk()
+    root.withdraw()
+    try:
+        tree = ttk.Treeview(root, columns=("ID", "Nome", "Nota"), show="headings")
+        tree.pack()
+        base = [(i, (i, f"Estudante {i}", f"{i % 100 / 10:.1f}")) for i in range(rows)]
+        scenarios = {
+            'sem mudanças': base,
+            '1% alterado': [(i, (i, name, "0.0" if i % 100 == 0 else grade)) for i, (_, name, grade) in base],
+            '1% entra/sai': [item for item in base if item[0] % 100]
+                            + [(rows + i, (rows + i, f"Novo {i}", "0.0")) for i in range(rows // 100)],
+        }
+        
+        def clear_and_insert(items):
+            # What the refresh methods did before reconcile_tree
+            for item in tree.get_children():
+                tree.delete(item)
+            for iid, values in items:
+                tree.insert("", "end", iid=iid, values=values)
+        
+        methods = {'limpar e inserir': clear_and_insert, 'reconcile_tree': lambda items: reconcile_tree(tree, items)}
+        results = []
+        for scenario, items in scenarios.items():
+            for method, refresh in methods.items():
+                timings = []
+                for _ in range(rounds):
+                    tree.delete(*tree.get_children())
+                    reconcile_tree(tree, base)
+                    root.update_idletasks()
+                    started = time.perf_counter()
+                    refresh(items)
+                    root.update_idletasks()
+                    timings.append((time.perf_counter() - started) * 1000)
+                results.append({'case': scenario, 'method': method, 'rows': rows,
+                                'median_ms': statistics.median(timings)})
+        return results
+    finally:
+        root.destroy()
+
+
+def main(argv=None):
     """Main function to run the application."""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Sistema de Colaboração Acadêmica")
+    parser.add_argument('--storage-mode', choices=sorted(STORAGE_MODES), default=DEFAULT_STORAGE_MODE,
+                        help="journaling do banco ('wal' só com todos os clientes na mesma máquina do banco)")
+    parser.add_argument('--slow-ms', type=float, default=query_monitor.slow_ms,
+                        help="tempo (ms) a partir do qual uma consulta vai para o slow_queries.log")
+    subcommands = parser.add_subparsers(dest='command')
+    
+    check = subcommands.add_parser('check-concurrency',
+                                   help="executa vários processos lendo e escrevendo ao mesmo tempo")
+    check.add_argument('--processes', type=int, default=4)
+    check.add_argument('--iterations', type=int, default=40)
+    
+    plans = subcommands.add_parser('check-query-plans',
+                                   help="falha se alguma consulta das telas fizer varredura completa de tabela "
+                                        "ou, com --db, se a paginação das listas perder linhas")
+    plans.add_argument('--db', help="banco a verificar (padrão: banco temporário com o esquema atual)")
+    
+    generate = subcommands.add_parser('generate-data',
+                                      help="gera uma instituição sintética grande para testes de escala")
+    generate.add_argument('--db', required=True, help="arquivo do banco a criar ou ampliar")
+    generate.add_argument('--preset', choices=sorted(DATASET_PRESETS), default='small')
+    generate.add_argument('--seed', type=int, default=42)
+    for option in ('students', 'teachers', 'courses', 'classes', 'courses-per-student',
+                   'assignments-per-course', 'quizzes-per-course', 'questions-per-quiz', 'announcements'):
+        generate.add_argument(f'--{option}', type=int, help="sobrepõe o valor do preset")
+    generate.add_argument('--submission-rate', type=float, help="fração de atividades entregues (0-1)")
+    
+    bench = subcommands.add_parser('benchmark',
+                                   help="mede o carregamento de dados das telas em bancos gerados")
+    bench.add_argument('--presets', nargs='+', choices=list(DATASET_PRESETS), default=['small', 'medium'])
+    bench.add_argument('--rounds', type=int, default=5)
+    bench.add_argument('--seed', type=int, default=42)
+    bench.add_argument('--data-dir', help="onde guardar os bancos gerados (reutilizados entre execuções)")
+    bench.add_argument('--output', default='benchmark_report', help="prefixo dos arquivos .json e .csv")
+    bench.add_argument('--baseline', help="relatório .json anterior para detectar regressões")
+    bench.add_argument('--tolerance', type=float, default=0.25,
+                       help="quanto a mediana pode piorar em relação ao baseline (0.25 = 25%%)")
+    
+    tree_bench = subcommands.add_parser('benchmark-treeview',
+                                        help="compara limpar e reinserir uma Treeview com reconcile_tree")
+    tree_bench.add_argument('--rows', type=int, default=5000)
+    tree_bench.add_argument('--rounds', type=int, default=5)
+    
+    bank = subcommands.add_parser('quiz-bank',
+                                  help="importa, exporta ou cria quizzes a partir de um banco de questões")
+    bank.add_argument('action', choices=['import', 'export', 'create-quiz'])
+    bank.add_argument('--db', default=DB_PATH)
+    bank.add_argument('--course', type=int, help="disciplina dona do banco (import)")
+    bank.add_argument('--pool', help="nome do banco (import) ou id (export, create-quiz)")
+    bank.add_argument('--file', help="arquivo .json ou .csv de questões")
+    bank.add_argument('--courses', type=int, nargs='+', help="disciplinas que recebem o quiz")
+    bank.add_argument('--title')
+    bank.add_argument('--due', default='', help="data de entrega (AAAA-MM-DD)")
+    bank.add_argument('--count', type=int, help="sorteia este número de questões")
+    bank.add_argument('--seed', type=int)
+    
+    regrade = subcommands.add_parser('regrade',
+                                     help="corrige o gabarito de um quiz e recalcula as notas das entregas")
+    regrade.add_argument('--db', default=DB_PATH)
+    regrade.add_argument('--assignment', type=int, required=True, help="id do quiz")
+    regrade.add_argument('--key', action='append', default=[], metavar='QUESTAO=RESPOSTA[:PONTOS]',
+                         help="nova resposta e/ou pontuação de uma questão, ex.: 12=B, 13=C:2 ou 14=:3")
+    
+    rebuild = subcommands.add_parser('rebuild-stats',
+                                     help="recalcula a tabela student_course_stats a partir das entregas")
+    rebuild.add_argument('--db', default=DB_PATH)
+    
+    args = parser.parse_args(argv)
+    query_monitor.slow_ms = args.slow_ms
+    
+    if args.command == 'generate-data':
+        sizes = dict(DATASET_PRESETS[args.preset])
+        for name in ('students', 'teachers', 'courses', 'classes', 'courses_per_student',
+                     'assignments_per_course', 'quizzes_per_course', 'questions_per_quiz',
+                     'announcements', 'submission_rate'):
+            if getattr(args, name) is not None:
+                sizes[name] = getattr(args, name)
+        started = time.perf_counter()
+        counts = generate_institution(args.db, seed=args.seed, **sizes)
+        for table, count in counts.items():
+            print(f"{table}: {count}")
+        print(f"Gerado em {time.perf_counter() - started:.1f}s: {args.db}")
+        return 0
+    
+    if args.command == 'benchmark':
+        results = run_benchmarks(args.presets, args.rounds, args.data_dir, args.seed)
+        write_benchmark_report(results, args.output)
+        for row in results:
+            print(f"{row['dataset']:>7} {row['case']:<58} {row['median_ms']:>10.2f}ms  {row['rows']:>7} linhas")
+        print(f"Relatório: {args.output}.json, {args.output}.csv")
+        if args.baseline:
+            regressions = compare_benchmarks(results, args.baseline, args.tolerance)
+            for line in regressions:
+                print(f"REGRESSÃO {line}")
+            return 1 if regressions else 0
+        return 0
+    
+    if args.command == 'benchmark-treeview':
+        try:
+            results = benchmark_tree_refresh(args.rows, args.rounds)
+        except tk.TclError as e:
+            print(f"Não foi possível abrir o Tk (é preciso um display): {e}")
+            return 1
+        for row in results:
+            print(f"{row['case']:<14} {row['method']:<18} {row['median_ms']:>10.2f}ms  {row['rows']:>7} linhas")
+        return 0
+    
+    if args.command == 'quiz-bank':
+        database = Database(args.db, args.storage_mode)
+        try:
+            migrate(database)
+            if args.action == 'import':
+                if args.course is None or not args.pool or not args.file:
+                    parser.error("import requer --course, --pool e --file")
+                questions = read_question_file(args.file)
+                pool_id = database.run_write(import_question_pool, args.course, args.pool, questions)
+                print(f"{len(questions)} questão(ões) importada(s) no banco {pool_id}")
+            elif args.action == 'export':
+                if not args.pool or not args.file:
+                    parser.error("export requer --pool e --file")
+                with database.cursor() as cursor:
+                    questions = export_question_pool(cursor, int(args.pool))
+                write_question_file(args.file, questions)
+                print(f"{len(questions)} questão(ões) exportada(s) para {args.file}")
+            else:
+                if not args.pool or not args.courses or not args.title:
+                    parser.error("create-quiz requer --pool, --courses e --title")
+                created = database.run_write(create_quiz_from_pool, int(args.pool), args.courses, args.title,
+                                             args.due, '', args.count, args.seed)
+                print(f"Quiz criado: atividade(s) {', '.join(map(str, created))}")
+        except (OSError, ValueError) as e:
+            print(f"Erro: {e}")
+            return 1
+        finally:
+            database.close()
+        return 0
+    
+    if args.command == 'regrade':
+        key_changes = {}
+        for spec in args.key:
+            question_id, _, change = spec.partition('=')
+            answer, _, points = change.partition(':')
+            if not question_id.isdigit() or not (answer or points):
+                parser.error(f"--key inválido: {spec}")
+            key_changes[int(question_id)] = {'correct_answer': answer or None,
+                                             'points': int(points) if points else None}
+        database = Database(args.db, args.storage_mode)
+        try:
+            migrate(database)
+            started = time.perf_counter()
+            result = database.run_write(regrade_quiz, args.assignment, key_changes)
+        except ValueError as e:
+            print(f"Erro: {e}")
+            return 1
+        finally:
+            database.close()
+        print(f"{result['questions']} questão(ões), {result['answers']} resposta(s) e {result['grades']} nota(s) "
+              f"alterada(s) em {time.perf_counter() - started:.2f}s")
+        return 0
+    
+    if args.command == 'rebuild-stats':
+        database = Database(args.db, args.storage_mode)
+        try:
+            migrate(database)
+            rows = rebuild_student_course_stats(database)
+        finally:
+            database.close()
+        print(f"student_course_stats: {rows} linha(s) recalculada(s)")
+        return 0
+    
+    if args.command == 'check-concurrency':
+        report = run_concurrency_check(args.storage_mode, args.processes, args.iterations)
+        for key, value in report.items():
+            print(f"{key}: {value}")
+        return 0 if report['passed'] else 1
+    
+    if args.command == 'check-query-plans':
+        failures = check_query_plans(args.db)
+        for location, sql, detail in failures:
+            print(f"{location}: {detail}\n    {sql}")
+        print(f"{len(failures)} consulta(s) com varredura completa de tabela")
+        if args.db:
+            # A real database also has data to page through
+            paging = check_keyset_paging(args.db)
+            for location, paged, total in paging:
+                print(f"{location}: {paged} de {total} linhas lidas página a página")
+            print(f"{len(paging)} ordenação(ões) com linhas perdidas na paginação")
+            failures += paging
+        return 1 if failures else 0
+    
     try:
-        app = App()
+        app = App(storage_mode=args.storage_mode)
         app.mainloop()
     except Exception as e:
         messagebox.showerror("Application Error", f"An error occurred: {str(e)}")
+    finally:
+        db_worker.close()
+        transfer_worker.close()
+        db.close()
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    raise SystemExit(main())